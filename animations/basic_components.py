@@ -1,8 +1,11 @@
 from manim import *
 
-class BasicComponents(Scene):
+from components import CreateDiagram, NetworkDiagram, SectionedScene
+
+class BasicComponents(SectionedScene):
     def construct(self):
         # Title sequence
+        self.section("neurons")
         title = Text("Basic Components of Neural Networks", font_size=40)
         title.to_edge(UP)
         self.play(Write(title))
@@ -28,66 +31,21 @@ class BasicComponents(Scene):
         )
 
         # Section 2: Layers
+        self.section("explain_layers")
         self.explain_layers(network, title)  # Pass title as parameter
         
         # Section 3: Connections
+        self.section("explain_connections")
         self.explain_connections(network, title)  # Pass title as parameter
         
         self.wait(2)
 
     def create_network(self):
-        # Create layers first
-        input_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=BLUE)
-            for _ in range(3)
-        ]).arrange(DOWN, buff=0.8)
-        
-        hidden_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=GREEN)
-            for _ in range(4)
-        ]).arrange(DOWN, buff=0.8)
-        
-        output_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=RED)
-            for _ in range(2)
-        ]).arrange(DOWN, buff=0.8)
-
-        # Position all layers first
-        all_layers = VGroup(input_layer, hidden_layer, output_layer).arrange(RIGHT, buff=3)
-        
-        # Add labels after layers are positioned
-        input_label = Text("Input Layer", font_size=24).next_to(input_layer, UP, buff=0.5)
-        hidden_label = Text("Hidden Layer", font_size=24).next_to(hidden_layer, UP, buff=0.5)
-        output_label = Text("Output Layer", font_size=24).next_to(output_layer, UP, buff=0.5)
-        labels = VGroup(input_label, hidden_label, output_label)
-
-        # Create connections after layers are in final position
-        connections = VGroup()
-        
-        # Connect input to hidden with better spacing
-        for i in input_layer:
-            for h in hidden_layer:
-                conn = Line(
-                    start=i.get_right(),
-                    end=h.get_left(),
-                    stroke_opacity=0.2,
-                    stroke_width=1
-                )
-                connections.add(conn)
-        
-        # Connect hidden to output with better spacing
-        for h in hidden_layer:
-            for o in output_layer:
-                conn = Line(
-                    start=h.get_right(),
-                    end=o.get_left(),
-                    stroke_opacity=0.2,
-                    stroke_width=1
-                )
-                connections.add(conn)
-
-        # Return everything grouped together
-        return VGroup(all_layers, connections, labels)
+        # Input, hidden and output layers with labels above each one
+        return NetworkDiagram(
+            layer_sizes=(3, 4, 2),
+            labels=("Input Layer", "Hidden Layer", "Output Layer"),
+        )
 
     def explain_layers(self, network, title):
         layer_text = Text("Layers: Organized Information Flow", font_size=32, color=YELLOW)
@@ -97,7 +55,7 @@ class BasicComponents(Scene):
         layers = network[0]  # This gets [input_layer, hidden_layer, output_layer]
         
         self.play(Write(layer_text))
-        self.play(Create(network))
+        self.play(CreateDiagram(network))
         
         # Highlight each layer individually
         for i, layer in enumerate(layers):
@@ -0,0 +1,12 @@
+from .assets import cached_image
+from .flow import SignalFlow, edge_endpoints
+from .network import (
+    ConnectionMesh,
+    CreateDiagram,
+    CreateEdges,
+    EdgeBatch,
+    EdgeDensity,
+    LargeNetworkDiagram,
+    NetworkDiagram,
+)
+from .sections import SectionedScene
@@ -0,0 +1,70 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+from manim import ImageMobject, config
+from manim.constants import DEFAULT_QUALITY, QUALITIES
+
+# Decoded, resized images, one .npy per source and displayed size
+CACHE_DIR = Path(config.media_dir) / '.render' / 'images'
+
+
+def source_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def display_size(size, scale=1.0, scale_to_resolution=None):
+    # (width, height) in pixels an image of this size covers in the frame
+    # once ImageMobject has placed it and it is scaled by `scale`; never
+    # larger than the source, which resampling could not make sharper
+    width, height = size
+    resolution = scale_to_resolution or QUALITIES[DEFAULT_QUALITY]['pixel_height']
+    shown = height * scale * config.pixel_height / resolution
+    factor = min(shown / height, 1.0)
+    return max(round(width * factor), 1), max(round(height * factor), 1)
+
+
+def cached_pixels(path, size, mode='RGBA'):
+    # The image decoded and resized to `size`, read from the cache when an
+    # earlier render already made it. Written to a temporary file first,
+    # so workers rendering at the same time never read half a file.
+    from PIL import Image
+
+    cache = CACHE_DIR / f"{source_hash(path)}-{size[0]}x{size[1]}-{mode}.npy"
+    try:
+        return np.load(cache, mmap_mode='r')
+    except (FileNotFoundError, ValueError):
+        pass
+    with Image.open(path) as image:
+        image = image.convert(mode)
+        if image.size != size:
+            image = image.resize(size, resample=Image.Resampling.LANCZOS)
+        pixels = np.asarray(image)
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_name(f".{cache.stem}.{os.getpid()}.tmp")
+    with open(tmp, 'wb') as f:
+        np.save(f, pixels)
+    os.replace(tmp, cache)
+    return pixels
+
+
+def cached_image(path, scale=1.0, **kwargs):
+    # ImageMobject(path).scale(scale), but holding only the pixels it is
+    # displayed with at the configured resolution. The camera resamples an
+    # image's full pixel array every frame; with the array already at its
+    # on-screen size, that and the decode of the original are skipped.
+    # Moving the camera closer would show the lower resolution.
+    from PIL import Image
+
+    mode = kwargs.pop('image_mode', 'RGBA')
+    resolution = kwargs.pop('scale_to_resolution', None)
+    with Image.open(path) as image:
+        # Only reads the header
+        size = image.size
+    pixels = cached_pixels(path, display_size(size, scale, resolution), mode)
+    image = ImageMobject(pixels, image_mode=mode, **kwargs)
+    # The same height ImageMobject(path) would have, scaled
+    height = size[1] / (resolution or QUALITIES[DEFAULT_QUALITY]['pixel_height']) * config.frame_height
+    image.height = height * scale
+    return image
@@ -0,0 +1,395 @@
+import numpy as np
+from manim import *
+
+# A straight cubic segment from start to end has its handles at 1/3 and 2/3
+LINE_WEIGHTS = np.array([0, 1 / 3, 2 / 3, 1])
+
+
+def line_points(starts, ends):
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    points = starts[:, None, :] + LINE_WEIGHTS[None, :, None] * (ends - starts)[:, None, :]
+    return points.reshape(-1, 3)
+
+
+def lagged_alphas(alpha, count, lag_ratio):
+    # Same timing manim uses for lag_ratio over a group of submobjects
+    full_length = (count - 1) * lag_ratio + 1
+    return np.clip(alpha * full_length - np.arange(count) * lag_ratio, 0, 1)
+
+
+class EdgeBatch(VMobject):
+    # Every edge between two layers as one VMobject. Each edge is its own
+    # subpath, so Cairo strokes the whole layer pair in a single call, while
+    # batch[i] still hands out a regular Line for highlighting one edge.
+    def __init__(self, starts, ends, **kwargs):
+        super().__init__(**kwargs)
+        self.set_edges(starts, ends)
+
+    def set_edges(self, starts, ends):
+        self.set_points(line_points(starts, ends))
+        return self
+
+    def get_endpoints(self):
+        points = self.points.reshape(-1, 4, 3)
+        return points[:, 0], points[:, 3]
+
+    def edge(self, index):
+        starts, ends = self.get_endpoints()
+        return Line(
+            starts[index],
+            ends[index],
+            color=self.get_stroke_color(),
+            stroke_width=self.get_stroke_width(),
+            stroke_opacity=self.get_stroke_opacity(),
+        )
+
+    def __len__(self):
+        return len(self.points) // 4
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        return (self.edge(i) for i in range(len(self)))
+
+    def __getitem__(self, value):
+        if isinstance(value, slice):
+            return VGroup(*[self.edge(i) for i in range(len(self))[value]])
+        return self.edge(range(len(self))[value])
+
+
+class ConnectionMesh(VGroup):
+    # All edge batches of a network. Indexing runs over the edges in the same
+    # order the old nested loops added Lines, layer pair by layer pair.
+    @property
+    def batches(self):
+        return self.submobjects
+
+    def __len__(self):
+        return sum(len(batch) for batch in self.batches)
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        for batch in self.batches:
+            yield from batch
+
+    def __getitem__(self, value):
+        if isinstance(value, slice):
+            return VGroup(*[self[i] for i in range(len(self))[value]])
+        index = range(len(self))[value]
+        for batch in self.batches:
+            if index < len(batch):
+                return batch.edge(index)
+            index -= len(batch)
+
+
+class CreateEdges(Animation):
+    # Grows every edge of one or more EdgeBatches from its start, with the same
+    # timing as Create on a VGroup of Lines, in one vectorized update per batch
+    # and frame: rate_func paces the animation as a whole, and each edge eases
+    # with edge_rate_func over its own lagged stretch of it
+    def __init__(self, mobject, lag_ratio=1.0, edge_rate_func=smooth, rate_func=linear, **kwargs):
+        self.edge_rate_func = edge_rate_func
+        super().__init__(mobject, lag_ratio=lag_ratio, rate_func=rate_func, introducer=True, **kwargs)
+
+    def begin(self):
+        self.batches = [m for m in self.mobject.get_family() if isinstance(m, EdgeBatch)]
+        self.endpoints = [batch.get_endpoints() for batch in self.batches]
+        super().begin()
+
+    def interpolate_mobject(self, alpha):
+        count = sum(len(starts) for starts, _ in self.endpoints)
+        alphas = lagged_alphas(self.rate_func(alpha), count, self.lag_ratio)
+        if self.edge_rate_func is not None:
+            # smooth and friends return an int at 0 and 1, and vectorize
+            # would otherwise take its output type from the first edge
+            alphas = np.vectorize(self.edge_rate_func, otypes=[float])(alphas)
+
+        offset = 0
+        for batch, (starts, ends) in zip(self.batches, self.endpoints):
+            sub_alphas = alphas[offset:offset + len(starts), None]
+            batch.set_edges(starts, starts + sub_alphas * (ends - starts))
+            offset += len(starts)
+
+
+class CreateDiagram(AnimationGroup):
+    # Create(network) as it ran when every edge was its own Line: nodes, edges,
+    # labels and ellipses drawn one member after another, each eased with
+    # rate_func over an equal share of the run time
+    def __init__(self, network, rate_func=smooth, run_time=1, **kwargs):
+        parts = [
+            Create(network.layers, rate_func=rate_func, run_time=len(network.layers.family_members_with_points())),
+            CreateEdges(network.connections, edge_rate_func=rate_func, run_time=len(network.connections)),
+        ]
+        for group in (network.labels, network.ellipses):
+            members = len(group.family_members_with_points())
+            if members:
+                parts.append(Create(group, rate_func=rate_func, run_time=members))
+        super().__init__(*parts, lag_ratio=1, run_time=run_time, **kwargs)
+
+
+def representative_nodes(size, max_nodes):
+    # Indices of the nodes drawn for a layer. A layer past max_nodes keeps its
+    # first and last nodes and an ellipsis stands in for the ones between
+    if max_nodes is None or size <= max_nodes:
+        return list(range(size))
+    head = (max_nodes + 1) // 2
+    return list(range(head)) + list(range(size - (max_nodes - head), size))
+
+
+def layer_colors(colors, count):
+    # Input and output layers keep the first and last color, extra hidden
+    # layers cycle through the ones between
+    if len(colors) >= count:
+        return list(colors[:count])
+    middle = list(colors[1:-1]) or [colors[0]]
+    return [colors[0]] + [middle[i % len(middle)] for i in range(count - 2)] + [colors[-1]]
+
+
+def build_layers(
+    layer_sizes,
+    colors,
+    node_radius,
+    node_fill_opacity,
+    node_stroke_width,
+    node_buff,
+    layer_buff,
+    max_nodes,
+):
+    # Returns the laid out layers of node circles, the ellipses of collapsed
+    # layers and, per layer, the original index of every drawn node
+    node_buffs = node_buff if isinstance(node_buff, (list, tuple)) else [node_buff] * len(layer_sizes)
+    node_style = {} if node_stroke_width is None else {'stroke_width': node_stroke_width}
+
+    layers, ellipses, columns, shown = VGroup(), VGroup(), [], []
+    for size, color, buff in zip(layer_sizes, layer_colors(colors, len(layer_sizes)), node_buffs):
+        indices = representative_nodes(size, max_nodes)
+        nodes = [
+            Circle(radius=node_radius, fill_opacity=node_fill_opacity, color=color, **node_style)
+            for _ in indices
+        ]
+        column = VGroup(*nodes)
+        if len(indices) < size:
+            head = (max_nodes + 1) // 2
+            dots = VGroup(*[
+                Dot(radius=node_radius * 0.2, color=color) for _ in range(3)
+            ]).arrange(DOWN, buff=node_radius * 0.3)
+            column = VGroup(*nodes[:head], dots, *nodes[head:])
+            ellipses.add(dots)
+        columns.append(column.arrange(DOWN, buff=buff))
+        layers.add(VGroup(*nodes))
+        shown.append(indices)
+
+    VGroup(*columns).arrange(RIGHT, buff=layer_buff)
+    return layers, ellipses, shown
+
+
+def layer_endpoints(left, right):
+    # Edges run from each node's right edge to the next node's left edge,
+    # ordered left node by left node like the original nested loops
+    rights = np.array([node.get_right() for node in left])
+    lefts = np.array([node.get_left() for node in right])
+    return np.repeat(rights, len(lefts), axis=0), np.tile(lefts, (len(rights), 1))
+
+
+def layer_labels(labels, layers, font_size, buff):
+    return VGroup(*[
+        Text(text, font_size=font_size).next_to(layer, UP, buff=buff)
+        for text, layer in zip(labels or [], layers)
+    ])
+
+
+class NetworkDiagram(VGroup):
+    # A layered network laid out left to right. Submobjects keep the shape the
+    # scenes index into: [0] the layers of node circles, [1] the connections,
+    # [2] the layer labels (empty when no labels are given), [3] the ellipses
+    # of layers collapsed by max_nodes.
+    def __init__(
+        self,
+        layer_sizes=(3, 4, 2),
+        colors=(BLUE, GREEN, RED),
+        node_radius=0.3,
+        node_fill_opacity=0.4,
+        node_stroke_width=None,
+        node_buff=0.8,
+        layer_buff=3,
+        edge_color=WHITE,
+        edge_opacity=0.2,
+        edge_width=1,
+        labels=None,
+        label_font_size=24,
+        label_buff=0.5,
+        max_nodes=None,
+        **kwargs,
+    ):
+        # Create and position all layers first
+        layers, ellipses, shown = build_layers(
+            layer_sizes, colors, node_radius, node_fill_opacity,
+            node_stroke_width, node_buff, layer_buff, max_nodes,
+        )
+
+        # Connect every drawn node to every drawn node of the next layer
+        connections = ConnectionMesh(*[
+            self.connect(left, right, edge_color, edge_opacity, edge_width)
+            for left, right in zip(layers, layers[1:])
+        ])
+
+        label_group = layer_labels(labels, layers, label_font_size, label_buff)
+
+        super().__init__(layers, connections, label_group, ellipses, **kwargs)
+        self.layers = layers
+        self.connections = connections
+        self.labels = label_group
+        self.ellipses = ellipses
+        self.layer_sizes = tuple(layer_sizes)
+        self.shown = shown
+
+    @staticmethod
+    def connect(left, right, color, opacity, width):
+        starts, ends = layer_endpoints(left, right)
+        return EdgeBatch(starts, ends, stroke_color=color, stroke_opacity=opacity, stroke_width=width)
+
+    def edge(self, layer, i, j):
+        # The edge from node i of a layer to node j of the next one
+        batch = self.connections.batches[layer]
+        return batch.edge(i * len(self.layers[layer + 1]) + j)
+
+
+class EdgeDensity(ImageMobject):
+    # Edges rasterized into one RGBA texture. Past a few thousand edges the
+    # strokes blur into a haze anyway, and drawing an image costs the same per
+    # frame however many edges went into it. Each pixel gets the opacity that
+    # stacking every edge crossing it would give.
+    def __init__(self, starts, ends, color=WHITE, opacity=0.2, width=1, resolution=None, **kwargs):
+        if resolution is None:
+            resolution = config.pixel_height / config.frame_height
+        starts = np.asarray(starts, dtype=float)[:, :2]
+        ends = np.asarray(ends, dtype=float)[:, :2]
+        low = np.minimum(starts.min(axis=0), ends.min(axis=0))
+        high = np.maximum(starts.max(axis=0), ends.max(axis=0))
+        size = np.ceil((high - low) * resolution).astype(int) + 1
+
+        counts = self.rasterize(
+            self.to_pixels(starts, low, size, resolution),
+            self.to_pixels(ends, low, size, resolution),
+            size,
+        )
+        # A stroke thinner than a pixel only covers part of it; Cairo strokes
+        # are stroke_width / 100 units wide
+        coverage = opacity * min(1, width * 0.01 * resolution)
+        pixels = np.zeros((size[1], size[0], 4), dtype=np.uint8)
+        pixels[..., :3] = color_to_int_rgb(color)
+        pixels[..., 3] = np.round(255 * (1 - (1 - coverage) ** counts))
+
+        super().__init__(pixels, **kwargs)
+        self.set_resampling_algorithm(RESAMPLING_ALGORITHMS['linear'])
+        self.stretch_to_fit_width(size[0] / resolution)
+        self.stretch_to_fit_height(size[1] / resolution)
+        self.move_to(np.append(low + (size - 1) / (2 * resolution), 0))
+
+        # Endpoints relative to the image corners, so they follow the texture
+        # through shifts and scales
+        extent = size / resolution
+        origin = low - 0.5 / resolution
+        self.edge_uv = [
+            np.column_stack([(p[:, 0] - origin[0]) / extent[0], 1 - (p[:, 1] - origin[1]) / extent[1]])
+            for p in (starts, ends)
+        ]
+        self.edge_count = len(starts)
+
+    @staticmethod
+    def to_pixels(points, low, size, resolution):
+        # Pixel coordinates with row 0 at the top of the image
+        pixels = (points - low) * resolution
+        pixels[:, 1] = size[1] - 1 - pixels[:, 1]
+        return pixels
+
+    @staticmethod
+    def rasterize(p0, p1, size):
+        # One sample per pixel step along each edge's longer axis, every edge
+        # at once. Consecutive samples of an edge landing on the same pixel are
+        # dropped so each edge counts once per pixel.
+        steps = np.maximum(np.ceil(np.abs(p1 - p0).max(axis=1)).astype(int), 1) + 1
+        edge = np.repeat(np.arange(len(steps)), steps)
+        first = np.repeat(np.cumsum(steps) - steps, steps)
+        t = (np.arange(len(edge)) - first) / (steps[edge] - 1)
+        points = p0[edge] + t[:, None] * (p1 - p0)[edge]
+
+        columns = np.clip(np.round(points[:, 0]).astype(int), 0, size[0] - 1)
+        rows = np.clip(np.round(points[:, 1]).astype(int), 0, size[1] - 1)
+        flat = rows * size[0] + columns
+        keep = np.ones(len(flat), dtype=bool)
+        keep[1:] = (flat[1:] != flat[:-1]) | (edge[1:] != edge[:-1])
+        return np.bincount(flat[keep], minlength=size[0] * size[1]).reshape(size[1], size[0])
+
+    def get_endpoints(self):
+        upper_left, upper_right, lower_left = self.points[:3]
+        return tuple(
+            upper_left + uv[:, :1] * (upper_right - upper_left) + uv[:, 1:] * (lower_left - upper_left)
+            for uv in self.edge_uv
+        )
+
+
+class LargeNetworkDiagram(Group):
+    # NetworkDiagram for realistic layer sizes (784-128-10 and up). Dense
+    # layers collapse to max_nodes representative nodes around an ellipsis,
+    # the diagram is fit to max_height, and a layer pair with more than
+    # edge_threshold edges is drawn as an EdgeDensity texture rather than
+    # strokes. Node count, edge count and texture size are all bounded, so
+    # build and frame time stay about flat as the layers grow. Submobjects
+    # follow NetworkDiagram: layers, connections, labels, ellipses.
+    def __init__(
+        self,
+        layer_sizes=(784, 128, 10),
+        colors=(BLUE, GREEN, RED),
+        node_radius=0.15,
+        node_fill_opacity=0.4,
+        node_stroke_width=None,
+        node_buff=0.15,
+        layer_buff=3,
+        edge_color=WHITE,
+        edge_opacity=0.2,
+        edge_width=1,
+        labels=None,
+        label_font_size=24,
+        label_buff=0.5,
+        max_nodes=16,
+        max_height=6,
+        edge_threshold=1000,
+        texture_resolution=None,
+        **kwargs,
+    ):
+        layers, ellipses, shown = build_layers(
+            layer_sizes, colors, node_radius, node_fill_opacity,
+            node_stroke_width, node_buff, layer_buff, max_nodes,
+        )
+        nodes = VGroup(layers, ellipses)
+        if max_height is not None and nodes.height > max_height:
+            nodes.scale(max_height / nodes.height)
+
+        connections = Group()
+        for left, right in zip(layers, layers[1:]):
+            starts, ends = layer_endpoints(left, right)
+            if len(starts) > edge_threshold:
+                connections.add(EdgeDensity(
+                    starts, ends, color=edge_color, opacity=edge_opacity,
+                    width=edge_width, resolution=texture_resolution,
+                ))
+            else:
+                connections.add(EdgeBatch(
+                    starts, ends, stroke_color=edge_color,
+                    stroke_opacity=edge_opacity, stroke_width=edge_width,
+                ))
+
+        label_group = layer_labels(labels, layers, label_font_size, label_buff)
+
+        super().__init__(layers, connections, label_group, ellipses, **kwargs)
+        self.layers = layers
+        self.connections = connections
+        self.labels = label_group
+        self.ellipses = ellipses
+        self.layer_sizes = tuple(layer_sizes)
+        self.shown = shown
@@ -0,0 +1,20 @@
+import os
+
+from manim import Scene
+
+# Set by render_animations.py to the comma separated sections it wants
+# rendered; when unset every section renders as usual
+SECTIONS_ENV = 'RENDER_SECTIONS'
+
+
+class SectionedScene(Scene):
+    # Scenes split construct() into named sections with self.section(name).
+    # The runner renders and caches each section on its own; a section's
+    # cache also depends on every section before it, whose scene state it
+    # starts from. The first section must start before the first play().
+    def section(self, name):
+        wanted = os.environ.get(SECTIONS_ENV)
+        skip = wanted is not None and name not in wanted.split(',')
+        # Skipped sections still run, so later sections start from the
+        # right scene state, but none of their frames are rasterized
+        self.next_section(name, skip_animations=skip)
@@ -1,9 +1,13 @@
 from manim import *
 from manim.utils.rate_functions import ease_out_bounce, smooth, ease_in_out_sine
+import numpy as np
 
-class LearningProcess(Scene):
+from components import CreateDiagram, NetworkDiagram, SectionedScene, SignalFlow, cached_image
+
+class LearningProcess(SectionedScene):
     def construct(self):
         # Title
+        self.section("intro")
         title = Text("How Do Neural Networks Learn?", font_size=40)
         title.to_edge(UP)
         self.play(Write(title), run_time=1.5, rate_func=smooth)
@@ -13,10 +17,13 @@ class LearningProcess(Scene):
         network.scale(0.7).shift(DOWN)
         
         # Show sections with smooth transitions
+        self.section("show_training_process")
         self.show_training_process(network, title)
         self.wait(0.5)  # Brief pause between sections
+        self.section("show_data_input")
         self.show_data_input(network, title)
         self.wait(0.5)  # Brief pause between sections
+        self.section("show_feedback_loop")
         self.show_feedback_loop(network, title)
         
         # Smooth fade out at the end
@@ -29,53 +36,15 @@ class LearningProcess(Scene):
         self.wait(1)
 
     def create_network(self):
-        # Similar network creation as before but with unfilled circles
-        input_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0, color=BLUE, stroke_width=2)
-            for _ in range(3)
-        ]).arrange(DOWN, buff=0.8)
-        
-        hidden_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0, color=GREEN, stroke_width=2)
-            for _ in range(4)
-        ]).arrange(DOWN, buff=0.8)
-        
-        output_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0, color=RED, stroke_width=2)
-            for _ in range(2)
-        ]).arrange(DOWN, buff=0.8)
-
-        all_layers = VGroup(input_layer, hidden_layer, output_layer).arrange(RIGHT, buff=3)
-        
-        # Create connections
-        connections = VGroup()
-        for i in input_layer:
-            for h in hidden_layer:
-                conn = Line(
-                    start=i.get_right(),
-                    end=h.get_left(),
-                    stroke_opacity=0.2,
-                    stroke_width=1
-                )
-                connections.add(conn)
-        
-        for h in hidden_layer:
-            for o in output_layer:
-                conn = Line(
-                    start=h.get_right(),
-                    end=o.get_left(),
-                    stroke_opacity=0.2,
-                    stroke_width=1
-                )
-                connections.add(conn)
-
-        labels = VGroup(
-            Text("Input", font_size=20).next_to(input_layer, UP),
-            Text("Hidden", font_size=20).next_to(hidden_layer, UP),
-            Text("Output", font_size=20).next_to(output_layer, UP)
+        # Same network as before but with unfilled circles
+        return NetworkDiagram(
+            layer_sizes=(3, 4, 2),
+            node_fill_opacity=0,
+            node_stroke_width=2,
+            labels=("Input", "Hidden", "Output"),
+            label_font_size=20,
+            label_buff=MED_SMALL_BUFF,
         )
-        
-        return VGroup(all_layers, connections, labels)
 
     def show_training_process(self, network, title):
         training_text = Text("Training Process", font_size=32, color=YELLOW)
@@ -84,7 +53,7 @@ class LearningProcess(Scene):
         # Smooth fade in of elements
         self.play(
             Write(training_text, run_time=1, rate_func=smooth),
-            Create(network, run_time=2, rate_func=smooth)
+            CreateDiagram(network, run_time=2, rate_func=smooth)
         )
         
         # Gentle pulse for hidden layer
@@ -124,13 +93,9 @@ class LearningProcess(Scene):
         data_text = Text("Data Input", font_size=32, color=YELLOW)
         data_text.next_to(title, DOWN, buff=0.5)
         
-        # Load and scale images
-        cat_img = ImageMobject("media/images/learning_process/cat.png")
-        dog_img = ImageMobject("media/images/learning_process/dog.jpg")
-        
-        # Scale and position images
-        for img in [cat_img, dog_img]:
-            img.scale(0.4)  # Make images smaller
+        # Load images, already resized to the smaller size they are shown at
+        cat_img = cached_image("media/images/learning_process/cat.png", scale=0.4)
+        dog_img = cached_image("media/images/learning_process/dog.jpg", scale=0.4)
         
         # Position images on the left side
         image_group = Group(cat_img, dog_img).arrange(DOWN, buff=1)
@@ -173,17 +138,18 @@ class LearningProcess(Scene):
                 rate_func=smooth
             )
             
-            # Smoother fan-out animation
-            hidden_dots = VGroup()
-            for node in network[0][1]:
-                new_packet = packet.copy()
-                new_packet.set_color(GREEN)
-                new_packet.move_to(node)
-                hidden_dots.add(new_packet)
-            
+            # Fan out from the input node to every hidden node; the packet
+            # becomes the particles, so it leaves the scene here
+            hidden_nodes = np.array([node.get_center() for node in network[0][1]])
+            self.remove(packet)
             self.play(
-                Transform(packet, hidden_dots[0]),
-                *[FadeIn(dot, rate_func=smooth) for dot in hidden_dots[1:]],
+                SignalFlow(
+                    [input_node.get_center()] * len(hidden_nodes),
+                    hidden_nodes,
+                    particle_size=0.2,
+                    color=color,
+                    target_color=GREEN,
+                ),
                 run_time=1
             )
             
@@ -195,15 +161,13 @@ class LearningProcess(Scene):
             ).move_to(network[0][2][i])
             
             self.play(
-                *[
-                    Transform(
-                        dot,
-                        output_packet.copy(),
-                        remover=True,
-                        rate_func=smooth
-                    )
-                    for dot in hidden_dots
-                ],
+                SignalFlow(
+                    hidden_nodes,
+                    [output_packet.get_center()] * len(hidden_nodes),
+                    particle_size=0.2,
+                    color=GREEN,
+                    target_color=RED,
+                ),
                 run_time=1
             )
             
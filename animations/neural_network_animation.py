@@ -1,6 +1,8 @@
 from manim import *
 import numpy as np
 
+from components import CreateEdges, NetworkDiagram, SignalFlow
+
 class NeuralNetworkScene(Scene):
     def construct(self):
         # Create title text
@@ -8,50 +10,15 @@ class NeuralNetworkScene(Scene):
         title.to_edge(UP, buff=0.3)
         self.play(Write(title))
 
-        # Create layers using circles with different colors
-        input_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=BLUE) 
-            for _ in range(3)
-        ]).arrange(DOWN, buff=0.8)
-        
-        hidden_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=GREEN) 
-            for _ in range(4)
-        ]).arrange(DOWN, buff=0.8)
-        
-        output_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=RED) 
-            for _ in range(2)
-        ]).arrange(DOWN, buff=0.8)
-
-        # Position layers
-        layers = VGroup(input_layer, hidden_layer, output_layer).arrange(RIGHT, buff=2.5)
-        
-        # Add connections between layers
-        connections1 = VGroup()
-        connections2 = VGroup()
-
-        # Connect input to hidden layer with straight lines
-        for i in input_layer:
-            for h in hidden_layer:
-                line = Line(
-                    start=i.get_right(),  # Fixed typo: changed from gFet_right to get_right
-                    end=h.get_left(),
-                    stroke_opacity=0.3,
-                    stroke_width=2
-                )
-                connections1.add(line)
-
-        # Connect hidden to output layer with straight lines
-        for h in hidden_layer:
-            for o in output_layer:
-                line = Line(
-                    start=h.get_right(),
-                    end=o.get_left(),
-                    stroke_opacity=0.3,
-                    stroke_width=2
-                )
-                connections2.add(line)
+        # Create the layers and their connections
+        network = NetworkDiagram(
+            layer_sizes=(3, 4, 2),
+            layer_buff=2.5,
+            edge_opacity=0.3,
+            edge_width=2,
+        )
+        input_layer, hidden_layer, output_layer = network.layers
+        connections1, connections2 = network.connections.batches
 
         # Smoother animation sequence
         self.play(
@@ -73,19 +40,14 @@ class NeuralNetworkScene(Scene):
             )
         )
         
-        # Animate connections with smooth fade in
-        self.play(
-            AnimationGroup(
-                *[Create(conn) for conn in connections1],
-                lag_ratio=0.05
-            )
-        )
-        self.play(
-            AnimationGroup(
-                *[Create(conn) for conn in connections2],
-                lag_ratio=0.05
+        # Animate connections with smooth fade in, each edge lagging the
+        # previous one by 5% like a lagged group of Create animations
+        for connections in (connections1, connections2):
+            self.play(
+                CreateEdges(connections, lag_ratio=0.05, edge_rate_func=smooth),
+                rate_func=linear,
+                run_time=1 + 0.05 * (len(connections) - 1)
             )
-        )
 
         # Add smoother data flow animation
         self.add_data_flow_animation(connections1, connections2)
@@ -93,42 +55,11 @@ class NeuralNetworkScene(Scene):
         self.wait()
 
     def add_data_flow_animation(self, connections1, connections2):
-        # Run the animation twice for better effect
+        # Run the animation twice for better effect, one particle per
+        # connection flowing layer by layer
         for _ in range(2):
-            # First layer of connections
-            squares1 = VGroup(*[
-                Square(side_length=0.1, fill_opacity=0.8, color=BLUE).move_to(conn.points[0])
-                for conn in connections1
-            ])
-            self.add(squares1)
-            
-            self.play(
-                AnimationGroup(
-                    *[
-                        MoveAlongPath(square, conn)
-                        for square, conn in zip(squares1, connections1)
-                    ],
-                    lag_ratio=0.05
-                ),
-                run_time=2
-            )
-            self.remove(squares1)
-            
-            # Second layer of connections
-            squares2 = VGroup(*[
-                Square(side_length=0.1, fill_opacity=0.8, color=GREEN).move_to(conn.points[0])
-                for conn in connections2
-            ])
-            self.add(squares2)
-            
-            self.play(
-                AnimationGroup(
-                    *[
-                        MoveAlongPath(square, conn)
-                        for square, conn in zip(squares2, connections2)
-                    ],
-                    lag_ratio=0.05
-                ),
-                run_time=2
-            )
-            self.remove(squares2)
+            for connections, color in ((connections1, BLUE), (connections2, GREEN)):
+                self.play(
+                    SignalFlow.along(connections, color=color, lag_ratio=0.05),
+                    run_time=2
+                )
@@ -1,5 +1,7 @@
 from manim import *
 
+from components import CreateEdges, NetworkDiagram
+
 class WhatIsNeuralNetwork(Scene):
     def construct(self):
         # Title
@@ -23,10 +25,14 @@ class WhatIsNeuralNetwork(Scene):
         
         # Create neural network structure with good spacing
         input_text = ["Pointy Ears", "Fluffy Tail", "Wet Nose"]
-        input_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=BLUE)
-            for _ in range(3)
-        ]).arrange(DOWN, buff=0.8)
+        network = NetworkDiagram(
+            layer_sizes=(3, 4, 2),
+            node_buff=(0.8, 0.8, 1.2),
+            edge_opacity=0.3,
+            edge_width=DEFAULT_STROKE_WIDTH,
+        )
+        input_layer, hidden_layer, output_layer = network.layers
+        connections = network.connections
         
         # Create and position feature labels with more space
         input_labels = VGroup(*[
@@ -38,39 +44,8 @@ class WhatIsNeuralNetwork(Scene):
         for label, node in zip(input_labels, input_layer):
             label.next_to(node, LEFT, buff=0.5)  # Increased buffer space
 
-        # Create a group for input layer and its labels
-        input_group = VGroup(input_layer, input_labels)
-
-        # Position everything else
-        hidden_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=GREEN)
-            for _ in range(4)
-        ]).arrange(DOWN, buff=0.8)
-
-        output_layer = VGroup(*[
-            Circle(radius=0.3, fill_opacity=0.4, color=RED)
-            for _ in range(2)
-        ]).arrange(DOWN, buff=1.2)
-
-        # Position all layers with more space between them
-        layers = VGroup(input_group, hidden_layer, output_layer).arrange(RIGHT, buff=3)
-        
-        # Create connections
-        connections = VGroup()
-        for i in input_layer:
-            for h in hidden_layer:
-                connections.add(Line(
-                    start=i.get_right(),
-                    end=h.get_left(),
-                    stroke_opacity=0.3
-                ))
-        for h in hidden_layer:
-            for o in output_layer:
-                connections.add(Line(
-                    start=h.get_right(),
-                    end=o.get_left(),
-                    stroke_opacity=0.3
-                ))
+        # Center the network together with its feature labels
+        VGroup(network, input_labels).center()
 
         # Animation sequence
         self.play(Write(explanation))
@@ -85,7 +60,7 @@ class WhatIsNeuralNetwork(Scene):
         )
         # Slower connection animation with higher run_time
         self.play(
-            Create(connections, lag_ratio=0.1),  # Added lag_ratio for smoother animation
+            CreateEdges(connections, lag_ratio=0.1),  # Added lag_ratio for smoother animation
             run_time=3  # Increased from default to 3 seconds
         )
 
@@ -0,0 +1,164 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'animations'))
+
+from manim import *
+
+from components import LargeNetworkDiagram, NetworkDiagram
+
+QUALITIES = {
+    'l': 'low_quality',
+    'm': 'medium_quality',
+    'h': 'high_quality',
+    'p': 'production_quality',
+    'k': 'fourk_quality',
+}
+
+DEFAULT_SIZES = [
+    (3, 4, 2),
+    (16, 16, 4),
+    (64, 32, 10),
+    (256, 64, 10),
+    (784, 128, 10),
+    (784, 512, 256, 10),
+]
+
+
+def build_legacy(layer_sizes):
+    # What the scenes did before NetworkDiagram: one Circle per node and one
+    # Line per edge, connected with nested loops
+    colors = [BLUE] + [GREEN] * (len(layer_sizes) - 2) + [RED]
+    layers = VGroup(*[
+        VGroup(*[
+            Circle(radius=0.3, fill_opacity=0.4, color=color)
+            for _ in range(size)
+        ]).arrange(DOWN, buff=0.8)
+        for size, color in zip(layer_sizes, colors)
+    ]).arrange(RIGHT, buff=3)
+    connections = VGroup()
+    for left, right in zip(layers, layers[1:]):
+        for i in left:
+            for j in right:
+                connections.add(Line(i.get_right(), j.get_left(), stroke_opacity=0.2, stroke_width=1))
+    return VGroup(layers, connections).scale_to_fit_height(6)
+
+
+def build_batched(layer_sizes):
+    return NetworkDiagram(layer_sizes=layer_sizes).scale_to_fit_height(6)
+
+
+def build_collapsed(layer_sizes):
+    return NetworkDiagram(layer_sizes=layer_sizes, max_nodes=16).scale_to_fit_height(6)
+
+
+def build_lod(layer_sizes):
+    return LargeNetworkDiagram(layer_sizes=layer_sizes)
+
+
+# Modes that draw every node and edge are capped by --max-edges
+MODES = {
+    'legacy': (build_legacy, True),
+    'batched': (build_batched, True),
+    'collapsed': (build_collapsed, False),
+    'lod': (build_lod, False),
+}
+
+
+def edge_count(layer_sizes):
+    return sum(a * b for a, b in zip(layer_sizes, layer_sizes[1:]))
+
+
+def measure(build, layer_sizes, frames):
+    start = time.perf_counter()
+    diagram = build(layer_sizes)
+    build_time = time.perf_counter() - start
+
+    # Draw the diagram the way an animated frame does: nothing is cached as a
+    # static background, every mobject is rasterized again
+    camera = Camera()
+    camera.capture_mobjects([diagram])
+    start = time.perf_counter()
+    for _ in range(frames):
+        camera.reset()
+        camera.capture_mobjects([diagram])
+    frame_time = (time.perf_counter() - start) / frames
+
+    return {
+        'build_s': round(build_time, 4),
+        'frame_ms': round(frame_time * 1000, 2),
+        'mobjects': len(diagram.get_family()),
+    }
+
+
+def run(sizes, modes, frames, max_edges):
+    results = []
+    for layer_sizes in sizes:
+        for mode in modes:
+            build, full = MODES[mode]
+            row = {'layers': '-'.join(map(str, layer_sizes)), 'edges': edge_count(layer_sizes), 'mode': mode}
+            if full and row['edges'] > max_edges:
+                row['skipped'] = True
+            else:
+                row.update(measure(build, layer_sizes, frames))
+            results.append(row)
+            print_row(row)
+    return results
+
+
+def print_header():
+    print(f"{'layers':<18} {'edges':>8} {'mode':<10} {'build (s)':>10} {'frame (ms)':>11} {'mobjects':>9}")
+    print('-' * 71)
+
+
+def print_row(row):
+    if row.get('skipped'):
+        timings = f"{'skipped':>10} {'':>11} {'':>9}"
+    else:
+        timings = f"{row['build_s']:>10.3f} {row['frame_ms']:>11.1f} {row['mobjects']:>9}"
+    print(f"{row['layers']:<18} {row['edges']:>8} {row['mode']:<10} {timings}")
+
+
+def parse_sizes(value):
+    return [tuple(int(n) for n in sizes.split('-')) for sizes in value.split(',')]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure how network diagram build time and frame time scale with layer size."
+    )
+    parser.add_argument(
+        '--sizes', type=parse_sizes, default=DEFAULT_SIZES,
+        help="comma separated layer sizes, e.g. 3-4-2,784-128-10",
+    )
+    parser.add_argument(
+        '--modes', default=','.join(MODES),
+        help=f"comma separated subset of {', '.join(MODES)}",
+    )
+    parser.add_argument('-q', '--quality', choices=QUALITIES, default='l', help="camera resolution")
+    parser.add_argument('--frames', type=int, default=5, help="frames to average the frame time over")
+    parser.add_argument(
+        '--max-edges', type=int, default=20000,
+        help="skip modes that draw every edge above this many edges",
+    )
+    parser.add_argument('--json', type=Path, help="also write the results to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    modes = args.modes.split(',')
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        sys.exit(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+    with tempconfig({'quality': QUALITIES[args.quality], 'verbosity': 'WARNING'}):
+        print_header()
+        results = run(args.sizes, modes, args.frames, args.max_edges)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding='utf-8')
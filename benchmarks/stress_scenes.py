@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+from manim import *
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'animations'))
+
+from components import CreateEdges, LargeNetworkDiagram, NetworkDiagram, SignalFlow
+
+
+# Synthetic scenes for the benchmark suite: the same network, build and
+# animations at growing sizes, so a slowdown in the shared components shows
+# up as a curve rather than one number
+
+
+class StressNetworkSmall(Scene):
+    layer_sizes = (8, 16, 4)
+
+    def build_network(self):
+        return NetworkDiagram(layer_sizes=self.layer_sizes).scale_to_fit_height(6)
+
+    def show_edges(self, network):
+        self.play(CreateEdges(network.connections, lag_ratio=0.01), run_time=2)
+
+    def construct(self):
+        network = self.build_network()
+        self.play(FadeIn(network.layers), FadeIn(network.ellipses))
+        self.show_edges(network)
+        self.play(SignalFlow.along(network.connections, lag_ratio=0.01), run_time=2)
+        self.wait(0.5)
+
+
+class StressNetworkMedium(StressNetworkSmall):
+    layer_sizes = (32, 64, 10)
+
+
+class StressNetworkLarge(StressNetworkSmall):
+    layer_sizes = (128, 256, 10)
+
+
+class StressNetworkHuge(StressNetworkSmall):
+    layer_sizes = (784, 128, 10)
+
+    def build_network(self):
+        return LargeNetworkDiagram(layer_sizes=self.layer_sizes, max_nodes=None, edge_threshold=1000)
+
+    def show_edges(self, network):
+        # Density textures fade in rather than grow
+        self.play(FadeIn(network.connections), run_time=2)
@@ -0,0 +1,169 @@
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rendering.discovery import discover
+from rendering.jobs import QUALITY_DIRS, RenderJob
+from rendering.paths import ANIMATIONS_DIR, STATE_DIR
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASELINES_DIR = BENCHMARKS_DIR / 'baselines'
+RESULTS_DIR = STATE_DIR / 'benchmarks'
+STRESS_FILE = BENCHMARKS_DIR / 'stress_scenes.py'
+
+# Every preset renders every scene; they differ in resolution and frame rate
+PRESETS = {
+    'quick': 'l',
+    'standard': 'm',
+    'release': 'h',
+}
+
+# How much worse than the baseline a run may be before it counts as a
+# regression, as a share of the baseline value: time and memory may grow
+# by this share, frames/sec may drop by it
+DEFAULT_THRESHOLD = 0.25
+
+
+def targets():
+    return [(info.file, info.name) for info in discover(sorted(ANIMATIONS_DIR.glob('*.py')) + [STRESS_FILE])]
+
+
+def measure(file, scene, quality):
+    # One render from scratch, profiled for the frame count and peak memory
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        profile = tmp / 'profile.json'
+        job = RenderJob(
+            file,
+            quality=quality,
+            scene=scene,
+            run_args=['--disable_caching', '--media_dir', str(tmp / 'media')],
+            plugins=[f"profile={profile}"],
+        )
+        start = time.perf_counter()
+        result = subprocess.run(job.command(), capture_output=True, text=True, cwd=ROOT)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "render failed")
+
+        report = json.loads(profile.read_text(encoding='utf-8'))
+        plays = [play for s in report['scenes'] for play in s['plays']]
+        frames = sum(play['frames'] for play in plays)
+        video = tmp / 'media' / 'videos' / file.stem / QUALITY_DIRS[quality] / f"{scene}.mp4"
+        return {
+            'frames': frames,
+            'wall': round(wall, 3),
+            'fps': round(frames / wall, 2),
+            'peak_rss_mb': max((play['peak_rss_mb'] or 0 for play in plays), default=0),
+            'size_bytes': video.stat().st_size if video.exists() else 0,
+        }
+
+
+def best_of(runs):
+    # The fastest run is the least disturbed by whatever else the machine does
+    return min(runs, key=lambda run: run['wall'])
+
+
+def regressed(value, baseline, threshold, higher_is_better=False):
+    # Whether value moved the wrong way from baseline by more than
+    # threshold times the baseline
+    change = (value - baseline) / baseline
+    return (-change if higher_is_better else change) > threshold
+
+
+def compare(result, baseline, threshold):
+    # Returns a description of every metric that regressed past the threshold
+    problems = []
+    if regressed(result['wall'], baseline['wall'], threshold):
+        problems.append(f"wall {baseline['wall']:.1f}s -> {result['wall']:.1f}s")
+    if baseline['fps'] and regressed(result['fps'], baseline['fps'], threshold, higher_is_better=True):
+        problems.append(f"fps {baseline['fps']:.1f} -> {result['fps']:.1f}")
+    if baseline['peak_rss_mb'] and regressed(result['peak_rss_mb'], baseline['peak_rss_mb'], threshold):
+        problems.append(f"peak memory {baseline['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+    if result['frames'] != baseline['frames']:
+        problems.append(f"frame count {baseline['frames']} -> {result['frames']}")
+    return problems
+
+
+def key(file, scene):
+    return f"{file.relative_to(ROOT).as_posix()}:{scene}"
+
+
+def run(preset, repeat, threshold, update_baseline, select):
+    quality = PRESETS[preset]
+    baseline_file = BASELINES_DIR / f"{preset}.json"
+    baseline = json.loads(baseline_file.read_text(encoding='utf-8')) if baseline_file.exists() else {}
+
+    results, regressions, failures = {}, {}, []
+    print(f"{'scene':<54} {'frames':>7} {'wall':>8} {'fps':>7} {'rss MB':>7} {'size':>9}  vs baseline")
+    for file, scene in targets():
+        name = key(file, scene)
+        if select and not any(s in name for s in select):
+            continue
+        try:
+            result = best_of([measure(file, scene, quality) for _ in range(repeat)])
+        except Exception as e:
+            failures.append(name)
+            print(f"{name:<54} ✗ {e}")
+            continue
+        results[name] = result
+
+        status = 'no baseline'
+        if name in baseline:
+            problems = compare(result, baseline[name], threshold)
+            if problems:
+                regressions[name] = problems
+                status = '✗ ' + ', '.join(problems)
+            else:
+                change = result['wall'] / baseline[name]['wall'] - 1
+                status = f"✓ {change:+.0%}"
+        print(f"{name:<54} {result['frames']:>7} {result['wall']:>7.1f}s {result['fps']:>7.1f} "
+              f"{result['peak_rss_mb']:>7.0f} {result['size_bytes'] / 1e6:>8.1f}M  {status}")
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    (RESULTS_DIR / f"{preset}-{stamp}.json").write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+    if update_baseline:
+        BASELINES_DIR.mkdir(parents=True, exist_ok=True)
+        baseline.update(results)
+        baseline_file.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+        print(f"\nBaseline {baseline_file.relative_to(ROOT)} updated with {len(results)} scenes")
+        return not failures
+
+    if regressions:
+        print(f"\n{len(regressions)} scenes regressed more than {threshold:.0%} against {baseline_file.relative_to(ROOT)}")
+    if failures:
+        print(f"{len(failures)} scenes failed to render")
+    return not regressions and not failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark every scene and the stress scenes against stored baselines."
+    )
+    parser.add_argument('--preset', choices=PRESETS, default='quick', help="quality preset (default: quick)")
+    parser.add_argument('--repeat', type=int, default=1, help="renders per scene; the fastest one counts")
+    parser.add_argument(
+        '--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help=f"allowed regression of every metric as a share of its baseline (default: {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument(
+        '--update-baseline', action='store_true',
+        help="store this run as the preset's baseline instead of comparing",
+    )
+    parser.add_argument('scenes', nargs='*', help="only benchmark scenes whose file:Scene contains one of these")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ok = run(args.preset, args.repeat, args.threshold, args.update_baseline, args.scenes)
+    sys.exit(0 if ok else 1)
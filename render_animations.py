@@ -1,40 +1,588 @@
-import os
-import subprocess
+import argparse
+import contextlib
+import sys
+import time
 from pathlib import Path
 
-def render_animations():
-    # Get the animations folder path
-    animations_dir = Path(__file__).parent / 'animations'
-    
-    # Find all Python files in the animations directory
-    animation_files = list(animations_dir.glob('*.py'))
-    
-    if not animation_files:
-        print("No animation files found in the animations directory!")
-        return
-    
-    print(f"Found {len(animation_files)} animation files to render.")
-    
-    # Process each animation file
-    for file in animation_files:
-        print(f"\nRendering {file.name}...")
+from rendering import daemon
+from rendering.course import COURSE_FILE, CourseError, assemble_course, playlist_scenes
+from rendering.discovery import discover, scene_jobs, schedule
+from rendering.encoding import print_dedup_table
+from rendering.estimate import History, Progress, estimate_jobs, print_estimates, quality_format, rendered_in_full
+from rendering.farm import LocalNodes, parse_hosts, render_on_farm
+from rendering.ffmpeg import FFmpegError
+from rendering.fingerprint import Manifest, fingerprint_job
+from rendering.golden import check_golden
+from rendering.growth import print_growth_report
+from rendering.jobs import JobResult
+from rendering.journal import BatchJournal, animation_journal, first_missing, verify_partials
+from rendering.paths import ROOT, STATE_DIR
+from rendering.pipeline import parse_options, print_pipeline_table
+from rendering.pool import default_workers, print_summary, run_jobs, run_process
+from rendering.preflight import preflight
+from rendering.profiler import merge_reports, print_table
+from rendering.renditions import parse_renditions, render_renditions
+from rendering.sections import plan_sections
+from rendering.slices import prerender_slices
+from rendering.texts import prebuild_texts, print_text_table
+from rendering.watch import watch
+
+def report_paths(jobs, folder):
+    # One JSON report per job in media/.render/<folder>/, cleared so a
+    # failed render leaves none behind
+    paths = {job.name: STATE_DIR / folder / f"{job.slug}.json" for job in jobs}
+    for path in paths.values():
+        path.unlink(missing_ok=True)
+    return paths
+
+def rendered(paths, results):
+    return [paths[r.job.name] for r in results if not r.skipped]
+
+# Each use_* installs the worker plugin of one option on every job and
+# returns what prints its reports once the results are in
+
+def use_frame_rate_mode(jobs, mode):
+    # Identical frames are written once and held; installed before the
+    # profiler so its encode timer sees the deduplicating writer
+    holds = report_paths(jobs, 'vfr')
+    plugin = 'vfr-cfr' if mode == 'cfr' else 'vfr'
+    for job in jobs:
+        job.plugins.insert(0, f"{plugin}={holds[job.name]}")
+    return lambda results: print_dedup_table(rendered(holds, results))
+
+def use_pipeline(jobs, pipeline):
+    # Frames go through a shared memory ring to an encoder process; first,
+    # so every other plugin wraps the pipelined writer
+    reports = report_paths(jobs, 'pipeline')
+    for job in jobs:
+        settings = ','.join(filter(None, [pipeline, f"report={reports[job.name]}"]))
+        job.plugins.insert(0, f"pipeline={settings}")
+    return lambda results: print_pipeline_table({r.job.name: reports[r.job.name] for r in results if not r.skipped})
+
+def use_layers(jobs, layers):
+    # Static mobjects drawn above moving ones are rasterized once per play;
+    # nothing to report
+    for job in jobs:
+        job.plugins.append('layers=verify' if layers == 'verify' else 'layers')
+
+def use_text_report(jobs):
+    # How many of each render's texts came from the text cache
+    reports = report_paths(jobs, 'texts')
+    for job in jobs:
+        job.plugins.append(f"texts={reports[job.name]}")
+    return lambda results: print_text_table(rendered(reports, results))
+
+def use_growth(jobs, growth):
+    # The scene graph is sampled after every animation; pruning also takes
+    # out what cannot be seen
+    reports = report_paths(jobs, 'growth')
+    plugin = 'growth-prune' if growth == 'prune' else 'growth'
+    for job in jobs:
+        job.plugins.append(f"{plugin}={reports[job.name]}")
+    return lambda results: print_growth_report(rendered(reports, results))
+
+def use_profile(jobs, profile):
+    # Profiling times every animation, so nothing may come from a cache
+    profiles = report_paths(jobs, 'profile')
+    for job in jobs:
+        job.plugins.append(f"profile={profiles[job.name]}")
+        job.run_args.append('--disable_caching')
+
+    def report(results):
+        print_table(merge_reports([profiles[r.job.name] for r in results], profile))
+        print(f"\nProfile written to {profile}")
+    return report
+
+def batch_settings(quality):
+    # What a batch must have run with to be resumed
+    return {'quality': quality}
+
+def use_journal(jobs, quality, resume, resumable):
+    # Every finished scene is journaled, so a batch that dies can be resumed
+    # without the scenes it finished. With --resumable (and when resuming)
+    # every completely written animation is journaled too, so a resumed
+    # scene picks up at its first unfinished one.
+    journal = BatchJournal()
+    settings = batch_settings(quality)
+    resuming = resume and journal.resume(jobs, settings)
+    if resume and not resuming:
+        print("No --resumable batch to resume at this quality, starting a new one.")
+    elif not resume:
+        journal.start(jobs, settings, animations=resumable)
+    if resumable or resume:
+        for job in jobs:
+            job.plugins.append(f"journal={animation_journal(job)}")
+    return journal, resuming
+
+def split_stale(jobs, fingerprints, force, journal, resuming):
+    # Skip jobs whose sources, helpers, assets, config and manim version
+    # match the last successful render, or that this batch already finished
+    manifest = Manifest()
+    up_to_date, stale = [], []
+    for job in jobs:
+        if resuming and journal.completed(job):
+            print(f"✓ {job.name} was finished earlier in this batch")
+            up_to_date.append(JobResult(job, 0, 0.0, outputs=journal.outputs(job), skipped=True))
+        elif not force and manifest.is_fresh(job.name, fingerprints[job.name]):
+            print(f"✓ {job.name} is up to date")
+            up_to_date.append(JobResult(job, 0, 0.0, outputs=manifest.outputs(job.name), skipped=True))
+        else:
+            stale.append(job)
+
+    # manim reuses any partial movie file it finds, complete or not; only
+    # the ones journaled as complete survive, so a scene picks up at its
+    # first unfinished animation
+    if resuming:
+        for job in stale:
+            kept, removed = verify_partials(job)
+            if kept or removed:
+                print(f"{job.name}: resuming at animation {first_missing(kept)} "
+                      f"({len(kept)} finished animations kept, {removed} unfinished files removed)")
+    return manifest, up_to_date, stale
+
+def plan_stale_sections(stale, force, record):
+    # Scenes split into sections only re-render the sections that changed
+    # and are stitched back together from the cached segments. Returns the
+    # jobs left to render, the reassembled results, and the names of the
+    # jobs rendering only some of their sections.
+    to_render, reassembled, some_sections = [], [], set()
+    for job in stale:
+        plan = plan_sections(job)
+        if plan and force:
+            for section in plan.sections:
+                section.segment.unlink(missing_ok=True)
+        if plan and not plan.stale:
+            print(f"✓ {job.name}: all {len(plan.sections)} sections cached, reassembling")
+            result = JobResult(job, 0, 0.0, outputs=[plan.assemble(job)])
+            record(result)
+            reassembled.append(result)
+        elif plan:
+            print(f"{job.name}: rendering sections {', '.join(s.name for s in plan.stale)}")
+            plan.apply(job)
+            if len(plan.stale) < len(plan.sections):
+                some_sections.add(job.name)
+            to_render.append(job)
+        else:
+            to_render.append(job)
+    return to_render, reassembled, some_sections
+
+def executor(use_daemon):
+    # A warm daemon saves every job the interpreter start and manim import
+    if use_daemon:
         try:
-            # Run manim command for each file
-            result = subprocess.run([
-                'manim',
-                str(file),
-                '-qh'  # High quality render
-            ], capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"✓ Successfully rendered {file.name}")
-            else:
-                print(f"✗ Failed to render {file.name}")
-                print("Error:", result.stderr)
-        except Exception as e:
-            print(f"✗ Error processing {file.name}:", str(e))
+            status = daemon.check()
+            print(f"Rendering with the daemon (pid {status['pid']}, {status['workers']} workers)")
+            return daemon.execute
+        except daemon.DaemonError as e:
+            print(f"{e}; rendering without it")
+    return run_process
+
+def render_animations(
+    workers=None,
+    quality='h',
+    force=False,
+    farm=None,
+    slices=None,
+    profile=None,
+    check=True,
+    use_daemon=False,
+    renditions=None,
+    include=(),
+    exclude=(),
+    frame_rate_mode=None,
+    layers=None,
+    resume=False,
+    pipeline=None,
+    growth=None,
+    text_report=False,
+    resumable=False,
+):
+    # Every scene class is its own job, found without importing the files
+    scenes = discover(include=include, exclude=exclude)
+
+    if not scenes:
+        print("No scenes found in the animations directory!")
+        return []
+
+    print(f"Found {len(scenes)} scenes to render.")
+
+    jobs = scene_jobs(scenes, quality=quality)
+
+    # Only the options asked for put a plugin into the render; a job without
+    # any runs plain manim
+    reporters = []
+    if frame_rate_mode:
+        reporters.append(use_frame_rate_mode(jobs, frame_rate_mode))
+    if pipeline is not None:
+        reporters.append(use_pipeline(jobs, pipeline))
+    if layers:
+        use_layers(jobs, layers)
+    if text_report:
+        reporters.append(use_text_report(jobs))
+    if growth:
+        reporters.append(use_growth(jobs, growth))
+    if profile:
+        reporters.append(use_profile(jobs, profile))
+        force = True
+    journal, resuming = use_journal(jobs, quality, resume, resumable)
+
+    fingerprints = {job.name: fingerprint_job(job) for job in jobs}
+    manifest, up_to_date, stale = split_stale(jobs, fingerprints, force, journal, resuming)
+
+    # The texts the scenes spell out are laid out once, in parallel, before
+    # any scene needs them; farm nodes keep their own media folders
+    if stale and not farm:
+        prebuild_texts(sorted({job.file for job in stale}), workers)
+
+    # Run every stale scene with rendering skipped first, so a scene that
+    # breaks halfway fails in seconds instead of after minutes of rendering
+    probes = {}
+    if check and stale:
+        passed, checks = preflight(stale, workers)
+        if not passed:
+            print("\nPreflight failed, nothing was rendered.")
+            return up_to_date + [
+                JobResult(c.job, 1, c.seconds, '\n'.join(c.errors)) for c in checks if not c.ok
+            ]
+        # The preflight counted every frame, which beats guessing from the source
+        probes = {c.job.name: c.scenes[0] for c in checks if c.scenes}
+
+    # Independent jobs render side by side, the longest first, so no long
+    # scene starts when the others are almost done
+    history = History()
+    estimates = estimate_jobs(stale, probes, history)
+    costs = {name: e.seconds for name, e in estimates.items()}
+    if stale:
+        print()
+        print_estimates(estimates, len(farm) if farm else workers or default_workers())
+    progress = Progress(estimates, len(farm) if farm else workers or default_workers())
+
+    # Jobs rendering only their stale sections
+    some_sections = set()
+
+    def record(result):
+        if result.ok:
+            manifest.record(result.job.name, fingerprints[result.job.name], result.outputs)
+            if not result.skipped:
+                journal.record(result)
+            # Only a render of the whole scene tells what the whole scene
+            # costs; one that reused cached animations or sections would
+            # make it look cheaper than it is
+            since = time.time() - result.duration
+            if (not result.skipped and not profile and result.job.name not in some_sections
+                    and rendered_in_full(result.job, since)):
+                e = estimates[result.job.name]
+                history.record(result.job.name, result.duration, e.frames, quality_format(quality)[0])
+        progress.done(result)
+
+    start = time.monotonic()
+
+    # On a farm every stale scene is cut into animation ranges and spread
+    # over the nodes; sections are not cached separately there
+    if farm:
+        results = up_to_date + render_on_farm(schedule(stale, costs), farm, on_result=record)
+    else:
+        to_render, reassembled, partly = plan_stale_sections(stale, force, record)
+        some_sections.update(partly)
+        up_to_date += reassembled
+
+        # Long animations are rendered a slice of frames per process first,
+        # so manim finds them cached when it reaches them
+        if slices and slices > 1:
+            for job in to_render:
+                job.prepare = lambda job=job: prerender_slices(job, slices)
+
+        to_render = schedule(to_render, costs)
+        results = up_to_date + run_jobs(to_render, workers=workers, on_result=record, execute=executor(use_daemon))
+    order = {job.name: i for i, job in enumerate(jobs)}
+    results.sort(key=lambda r: order[r.job.name])
+    print_summary(results, time.monotonic() - start)
+
+    make_renditions(results, fingerprints, renditions, workers)
+
+    for report in reporters:
+        report(results)
+    return results
+
+def make_renditions(results, fingerprints, renditions, workers):
+    # Smaller variants are encoded from the rendered masters instead of
+    # rendering every scene again at each quality
+    if not renditions:
+        return
+    # Outputs of up-to-date jobs come from the manifest, relative to ROOT
+    owners = {
+        ROOT / path: result
+        for result in results if result.ok
+        for path in result.outputs if Path(path).suffix == '.mp4'
+    }
+    print(f"\nEncoding {', '.join(r.name for r in renditions)} from {len(owners)} masters...")
+    masters = {master: fingerprints[result.job.name] for master, result in owners.items()}
+    for master in render_renditions(masters, renditions, workers):
+        owners[master].returncode = 1
+
+def pipeline_settings(value):
+    # Checked here so a typo fails before any scene is rendered
+    parse_options(value)
+    return value
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render every scene in the animations directory.")
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=default_workers(),
+        help="number of scenes to render at the same time (default: number of CPU cores)",
+    )
+    parser.add_argument(
+        '-q', '--quality',
+        default='h',
+        choices=['l', 'm', 'h', 'p', 'k'],
+        help="manim quality flag (default: h)",
+    )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="re-render every scene even if its inputs have not changed",
+    )
+    parser.add_argument(
+        '--scene',
+        action='append',
+        default=[],
+        metavar='PATTERN',
+        help="only render scenes matching module:Class, Class or module (glob patterns, repeatable)",
+    )
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        default=[],
+        metavar='PATTERN',
+        help="leave out scenes matching these patterns",
+    )
+    parser.add_argument(
+        '--preflight',
+        action='store_true',
+        help="only run every scene with rendering skipped and report failures and durations",
+    )
+    parser.add_argument(
+        '--golden',
+        action='store_true',
+        help="only draw sampled frames of every scene at low resolution and compare them with the "
+             "golden frames in golden/, writing diff images for the ones that changed",
+    )
+    parser.add_argument(
+        '--update-golden',
+        action='store_true',
+        help="only draw the sampled frames and store them as the new golden frames",
+    )
+    parser.add_argument(
+        '--skip-preflight',
+        action='store_true',
+        help="start rendering without checking the scenes first",
+    )
+    parser.add_argument(
+        '--vfr',
+        dest='frame_rate_mode',
+        action='store_const',
+        const='vfr',
+        help="encode runs of identical frames once, as variable frame rate video",
+    )
+    parser.add_argument(
+        '--cfr',
+        dest='frame_rate_mode',
+        action='store_const',
+        const='cfr',
+        help="like --vfr, then convert each finished movie back to constant frame rate",
+    )
+    parser.add_argument(
+        '--pipeline',
+        nargs='?',
+        const='',
+        type=pipeline_settings,
+        metavar='SETTINGS',
+        help="rasterize and encode in separate processes, passing frames through a shared memory ring; "
+             "SETTINGS is depth=N,partial=CODEC[:PRESET[:CRF]],movie=CODEC[:PRESET[:CRF]], "
+             "e.g. partial=libx264rgb:ultrafast:0,movie=libx264:slow:18 (not with --vfr/--cfr)",
+    )
+    parser.add_argument(
+        '--layers',
+        action='store_const',
+        const='on',
+        help="draw static mobjects above moving ones from a cached layer instead of every frame",
+    )
+    parser.add_argument(
+        '--layers-verify',
+        dest='layers',
+        action='store_const',
+        const='verify',
+        help="like --layers, but also render every frame normally and report any pixel difference",
+    )
+    parser.add_argument(
+        '--growth',
+        action='store_const',
+        const='report',
+        help="sample each scene's mobjects, points and memory after every animation and flag the ones "
+             "drawn without being seen (reports in media/.render/growth/)",
+    )
+    parser.add_argument(
+        '--growth-prune',
+        dest='growth',
+        action='store_const',
+        const='prune',
+        help="like --growth, but also remove the fully transparent and off-screen mobjects it finds; "
+             "one that a later animation uses is put back where it was in the layering",
+    )
+    parser.add_argument(
+        '--text-report',
+        action='store_true',
+        help="report how many of each scene's texts came from the text cache",
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        type=Path,
+        const=STATE_DIR / 'profile.json',
+        metavar='REPORT',
+        help="time every animation of every scene and write a JSON report "
+             "(default: media/.render/profile.json); implies --force",
+    )
+    parser.add_argument(
+        '--slices',
+        type=int,
+        metavar='N',
+        help="render each long animation as N frame ranges in parallel processes",
+    )
+    parser.add_argument(
+        '--renditions',
+        type=parse_renditions,
+        metavar='HEIGHTpFPS[:CODEC[:CRF]],...',
+        help="after rendering, encode these variants from each rendered video in one pass, "
+             "e.g. 720p30,480p15",
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help="send the renders to the running render daemon "
+             "(start one with: python -m rendering.daemon start)",
+    )
+    parser.add_argument(
+        '--resumable',
+        action='store_true',
+        help="journal every animation as it is written completely, so --resume after a crash keeps them",
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="continue the last batch at this quality, which must have run with --resumable: skip the "
+             "scenes it finished and reuse every animation it wrote completely",
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help="keep running and re-render the scenes each saved change affects at preview quality (-ql) "
+             "in the render daemon, into media/preview/",
+    )
+    parser.add_argument(
+        '--course',
+        nargs='?',
+        type=Path,
+        const=COURSE_FILE,
+        metavar='PLAYLIST',
+        help="render the playlist's scenes (default: course.json) and join them, in order and without "
+             "re-encoding, into one video with a chapter per scene in media/course/",
+    )
+    parser.add_argument(
+        '--farm',
+        type=parse_hosts,
+        metavar='HOST:PORT,...',
+        help="split scenes into animation ranges and render them on these nodes "
+             "(start one with: python -m rendering.farm serve)",
+    )
+    parser.add_argument(
+        '--farm-local',
+        type=int,
+        metavar='N',
+        help="start N render nodes on this machine and use them as the farm",
+    )
+    args = parser.parse_args(argv)
+    if args.pipeline is not None and args.frame_rate_mode:
+        parser.error("--pipeline cannot be combined with --vfr or --cfr, which write frames their own way")
+    if args.slices and (args.frame_rate_mode or args.pipeline is not None):
+        # Slices are encoded by manim itself; such a render would not reuse them
+        parser.error("--slices cannot be combined with --vfr, --cfr or --pipeline")
+    if args.slices and args.profile:
+        # Profiling renders with --disable_caching, so manim would ignore
+        # the prerendered slices and render every animation again
+        parser.error("--slices cannot be combined with --profile")
+    if args.farm and args.farm_local:
+        parser.error("use either --farm or --farm-local")
+    if args.farm or args.farm_local:
+        # Nodes render animation ranges in their own processes and keep
+        # everything but the video to themselves
+        for flag, used in (
+            ('--slices', args.slices),
+            ('--profile', args.profile),
+            ('--daemon', args.daemon),
+            ('--growth', args.growth == 'report'),
+            ('--text-report', args.text_report),
+        ):
+            if used:
+                parser.error(f"{flag} cannot be combined with --farm or --farm-local")
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.preflight:
+        jobs = scene_jobs(discover(include=args.scene, exclude=args.exclude), quality=args.quality)
+        passed, _ = preflight(jobs, args.jobs)
+        sys.exit(0 if passed else 1)
+
+    if args.golden or args.update_golden:
+        jobs = scene_jobs(discover(include=args.scene, exclude=args.exclude))
+        sys.exit(0 if check_golden(jobs, args.jobs, update=args.update_golden) else 1)
+
+    if args.watch:
+        sys.exit(watch('l', args.scene, args.exclude, args.jobs))
+
+    if args.resume and BatchJournal().last(batch_settings(args.quality)) is None:
+        # Without the journal of its animations, resuming could not tell a
+        # complete partial movie from an unfinished one and would delete them
+        sys.exit(f"✗ Nothing to resume: the last batch at quality {args.quality} was not run with --resumable")
+
+    if args.course and not args.scene:
+        try:
+            args.scene = playlist_scenes(args.course)
+        except CourseError as e:
+            sys.exit(f"✗ {e}")
+
     print("Starting animation rendering process...")
-    render_animations()
+    nodes = LocalNodes(args.farm_local) if args.farm_local else contextlib.nullcontext(args.farm)
+    with nodes as farm:
+        results = render_animations(
+            workers=args.jobs,
+            quality=args.quality,
+            force=args.force,
+            farm=farm,
+            slices=args.slices,
+            profile=args.profile,
+            check=not args.skip_preflight,
+            use_daemon=args.daemon,
+            renditions=args.renditions,
+            include=args.scene,
+            exclude=args.exclude,
+            frame_rate_mode=args.frame_rate_mode,
+            layers=args.layers,
+            resume=args.resume,
+            pipeline=args.pipeline,
+            growth=args.growth,
+            text_report=args.text_report,
+            resumable=args.resumable,
+        )
     print("\nRendering process completed!")
+    if args.course and all(r.ok for r in results):
+        print("\nAssembling the course...")
+        try:
+            assemble_course(args.course, args.quality)
+        except (CourseError, FFmpegError) as e:
+            print(f"✗ Course assembly failed: {e}")
+            sys.exit(1)
+    sys.exit(0 if all(r.ok for r in results) else 1)
@@ -0,0 +1 @@
+# Helpers used by render_animations.py to schedule and run manim render jobs.
@@ -0,0 +1,265 @@
+import argparse
+import ast
+import json
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .discovery import scene_classes
+from .ffmpeg import FFmpegError, concat_copy, probe_media, run_ffmpeg
+from .fingerprint import hash_file, hash_payload
+from .jobs import QUALITY_DIRS
+from .paths import ANIMATIONS_DIR, MEDIA_DIR, ROOT, STATE_DIR, VIDEO_DIR
+from .pool import log
+
+# The scenes of the course, in order: {"title": ..., "scenes": [KEY or
+# {"scene": KEY, "title": ...}, ...]} with KEY as module:Class
+COURSE_FILE = ROOT / 'course.json'
+COURSE_DIR = MEDIA_DIR / 'course'
+# Scene videos re-encoded to match the rest of the course, named after the
+# source video and the parameters they were matched to
+MATCHED_DIR = STATE_DIR / 'course'
+
+# Stream parameters every segment of a stream-copied file must share
+VIDEO_PARAMS = ('codec_name', 'profile', 'width', 'height', 'pix_fmt', 'r_frame_rate', 'time_base')
+AUDIO_PARAMS = ('codec_name', 'sample_rate', 'channels')
+ENCODERS = {
+    'h264': 'libx264',
+    'hevc': 'libx265',
+    'vp9': 'libvpx-vp9',
+    'aac': 'aac',
+    'opus': 'libopus',
+    'mp3': 'libmp3lame',
+}
+H264_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+    'High 4:4:4 Predictive': 'high444',
+}
+# Quality of the re-encoded segments; only the odd one out is re-encoded
+MATCH_CRF = 18
+
+
+class CourseError(Exception):
+    pass
+
+
+def load_playlist(path=COURSE_FILE):
+    try:
+        playlist = json.loads(Path(path).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        raise CourseError(f"no playlist at {path}") from None
+    entries = []
+    for entry in playlist['scenes']:
+        entry = {'scene': entry} if isinstance(entry, str) else dict(entry)
+        if entry['scene'].count(':') != 1:
+            raise CourseError(f"bad scene {entry['scene']!r} in {path}; expected module:Class")
+        entries.append(entry)
+    return playlist.get('title', Path(path).stem), entries
+
+
+def scene_title(file, scene):
+    # What the scene shows as its title: the Text assigned to `title` in
+    # construct(), else its first Text, else the class name in words
+    tree = ast.parse(file.read_text(encoding='utf-8'), filename=str(file))
+    cls = scene_classes(tree).get(scene)
+    construct = next(
+        (node for node in (cls.body if cls else []) if isinstance(node, ast.FunctionDef) and node.name == 'construct'),
+        None,
+    )
+    texts = []
+    for node in ast.walk(construct) if construct else ():
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            call = node.value
+            name = getattr(call.func, 'id', getattr(call.func, 'attr', None))
+            if name in ('Text', 'MarkupText') and call.args and isinstance(call.args[0], ast.Constant):
+                named = any(getattr(target, 'id', None) == 'title' for target in node.targets)
+                texts.append((not named, node.lineno, call.args[0].value))
+    if texts:
+        return ' '.join(str(min(texts)[2]).split())
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])', ' ', scene)
+
+
+def stream_params(info):
+    video = next((s for s in info['streams'] if s['codec_type'] == 'video'), None)
+    audio = [s for s in info['streams'] if s['codec_type'] == 'audio']
+    return {
+        'video': {key: video.get(key) for key in VIDEO_PARAMS} if video else None,
+        'audio': [{key: stream.get(key) for key in AUDIO_PARAMS} for stream in audio[:1]],
+    }
+
+
+def reference_params(segments):
+    # The parameters most of the course's running time already has, so the
+    # least video is re-encoded
+    durations = {}
+    for segment in segments:
+        key = json.dumps(segment['params'], sort_keys=True)
+        durations[key] = durations.get(key, 0) + segment['duration']
+    return json.loads(max(durations, key=durations.get))
+
+
+def differences(params, reference):
+    # What keeps a segment from being stream copied with the others
+    found = []
+    for kind in ('video', 'audio'):
+        ours, theirs = params[kind], reference[kind]
+        if kind == 'audio':
+            if bool(ours) != bool(theirs):
+                found.append('audio' if ours else 'no audio')
+                continue
+            ours, theirs = (ours or [None])[0], (theirs or [None])[0]
+        if ours is None or theirs is None:
+            continue
+        found += [f"{key} {ours[key]} vs {theirs[key]}" for key in ours if ours[key] != theirs.get(key)]
+    return ', '.join(found)
+
+
+def match_args(params):
+    # ffmpeg output options giving a segment these stream parameters
+    video = params['video']
+    codec = ENCODERS.get(video['codec_name'])
+    if codec is None:
+        raise CourseError(f"cannot encode {video['codec_name']} to match the other scenes")
+    width, height = video['width'], video['height']
+    args = [
+        '-map', '0:v:0',
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+               f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1",
+        '-c:v', codec, '-crf', str(MATCH_CRF), '-pix_fmt', video['pix_fmt'], '-r', video['r_frame_rate'],
+        '-video_track_timescale', video['time_base'].split('/')[1],
+    ]
+    if codec == 'libx264' and video['profile'] in H264_PROFILES:
+        args += ['-profile:v', H264_PROFILES[video['profile']]]
+    if params['audio']:
+        audio = params['audio'][0]
+        args += ['-c:a', ENCODERS.get(audio['codec_name'], 'aac'), '-ar', str(audio['sample_rate']),
+                 '-ac', str(audio['channels'])]
+    else:
+        args += ['-an']
+    return args
+
+
+def match_segment(segment, params):
+    # The segment re-encoded with the course's parameters, reused while
+    # neither the source nor the parameters change
+    source = segment['path']
+    name = f"{source.stem}.{hash_payload({'source': hash_file(source), 'params': params})[:16]}.mp4"
+    output = MATCHED_DIR / name
+    if output.exists():
+        log(f"  {source.name}: reusing its copy matched to the other scenes")
+        return output
+    log(f"  {source.name}: re-encoding to match the other scenes ({differences(segment['params'], params)})")
+    MATCHED_DIR.mkdir(parents=True, exist_ok=True)
+    inputs = ['-i', str(source)]
+    audio_map = []
+    if params['audio']:
+        if segment['params']['audio']:
+            audio_map = ['-map', '0:a:0']
+        else:
+            # Silence, so the audio track runs through the whole course
+            audio = params['audio'][0]
+            layout = 'mono' if audio['channels'] == 1 else 'stereo'
+            inputs += ['-f', 'lavfi', '-t', f"{segment['duration']:.6f}",
+                       '-i', f"anullsrc=r={audio['sample_rate']}:cl={layout}"]
+            audio_map = ['-map', '1:a:0']
+    tmp = output.with_name(f".{output.stem}.tmp.mp4")
+    try:
+        run_ffmpeg([*inputs, *match_args(params), *audio_map, str(tmp)])
+        tmp.replace(output)
+    finally:
+        tmp.unlink(missing_ok=True)
+    matched = stream_params(probe_media(output))
+    if matched != params:
+        output.unlink()
+        raise CourseError(f"{source.name} still differs from the other scenes after re-encoding: {matched}")
+    return output
+
+
+def escape_metadata(value):
+    return re.sub(r'([=;#\\\n])', r'\\\1', value)
+
+
+def chapters_metadata(title, chapters):
+    # ffmetadata with one chapter per scene; times in milliseconds
+    lines = [';FFMETADATA1', f"title={escape_metadata(title)}"]
+    start = 0
+    for name, duration in chapters:
+        end = start + round(duration * 1000)
+        lines += ['', '[CHAPTER]', 'TIMEBASE=1/1000', f"START={start}", f"END={end}",
+                  f"title={escape_metadata(name)}"]
+        start = end
+    return '\n'.join(lines) + '\n'
+
+
+def assemble_course(playlist=COURSE_FILE, quality='h', output=None):
+    # One video of the playlist's rendered scenes, stream copied, with a
+    # chapter per scene. Scenes whose streams differ from the rest are
+    # re-encoded to match first, the rest are copied untouched.
+    start = time.monotonic()
+    title, entries = load_playlist(playlist)
+    output = Path(output) if output else COURSE_DIR / f"{Path(playlist).stem}_{QUALITY_DIRS[quality]}.mp4"
+    segments = []
+    for entry in entries:
+        module, scene = entry['scene'].split(':')
+        path = VIDEO_DIR / module / QUALITY_DIRS[quality] / f"{scene}.mp4"
+        if not path.exists():
+            raise CourseError(f"{entry['scene']} has not been rendered at -q{quality} ({path.relative_to(ROOT)})")
+        info = probe_media(path)
+        segments.append({
+            'path': path,
+            'title': entry.get('title') or scene_title(ANIMATIONS_DIR / f"{module}.py", scene),
+            'params': stream_params(info),
+            'duration': float(info['format']['duration']),
+        })
+
+    params = reference_params(segments)
+    inputs = []
+    for segment in segments:
+        if segment['params'] == params:
+            inputs.append(segment['path'])
+            continue
+        inputs.append(match_segment(segment, params))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        metadata = Path(tmp) / 'chapters.txt'
+        metadata.write_text(
+            chapters_metadata(title, [(segment['title'], segment['duration']) for segment in segments]),
+            encoding='utf-8',
+        )
+        concat_copy(inputs, output, [
+            '-f', 'ffmetadata', '-i', str(metadata),
+            '-map', '0', '-map_metadata', '1', '-map_chapters', '1',
+        ])
+    reencoded = sum(1 for path, segment in zip(inputs, segments) if path != segment['path'])
+    log(f"✓ Course: {output.relative_to(ROOT) if output.is_relative_to(ROOT) else output}, "
+        f"{len(segments)} chapters, {sum(s['duration'] for s in segments):.1f}s, "
+        f"{reencoded} scenes re-encoded, assembled in {time.monotonic() - start:.1f}s")
+    for segment in segments:
+        log(f"    {segment['title']}")
+    return output
+
+
+def playlist_scenes(playlist=COURSE_FILE):
+    return [entry['scene'] for entry in load_playlist(playlist)[1]]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Join the rendered scenes of a playlist into one chaptered video.")
+    parser.add_argument('playlist', nargs='?', type=Path, default=COURSE_FILE)
+    parser.add_argument('-q', '--quality', default='h', choices=list(QUALITY_DIRS))
+    parser.add_argument('-o', '--output', type=Path, help="default: media/course/<playlist>_<resolution>.mp4")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        assemble_course(args.playlist, args.quality, args.output)
+    except (CourseError, FFmpegError) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,608 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from .discovery import discover
+from .farm import read_message, send_message
+from .fingerprint import hash_bytes, manim_version
+from .jobs import RenderJob
+from .paths import CONFIG_FILE, ROOT, STATE_DIR
+from .pool import STDERR_TAIL_LINES, OutputFilter, log
+from .texts import build_text, collect_texts
+from .worker import plugin_command, run_manim
+
+# A running daemon writes its address here so the runner and the CLI find it
+DAEMON_FILE = STATE_DIR / 'daemon.json'
+HOST = '127.0.0.1'
+CONNECT_TIMEOUT = 5
+# Largest job the zygote accepts in one message
+ZYGOTE_MESSAGE_SIZE = 1 << 20
+# The worker plugins and everything else the daemon imports from here
+RENDERING_DIR = Path(__file__).resolve().parent
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+class RenderCancelled(DaemonError):
+    pass
+
+
+def loaded_state():
+    # Hashes of what a daemon reads once, when it starts, and every fork
+    # inherits: manim.cfg, and the rendering package its plugins come from
+    config = CONFIG_FILE.read_bytes() if CONFIG_FILE.exists() else b''
+    code = b''.join(
+        path.name.encode() + b'\0' + path.read_bytes() for path in sorted(RENDERING_DIR.glob('*.py'))
+    )
+    return {'config': hash_bytes(config), 'rendering': hash_bytes(code)}
+
+
+def stale(loaded, current):
+    # Why a daemon that loaded `loaded` cannot render what is on disk now,
+    # or None
+    names = {'config': CONFIG_FILE.name, 'rendering': 'rendering/*.py'}
+    changed = [name for key, name in names.items() if loaded.get(key) != current.get(key)]
+    if changed:
+        return f"render daemon loaded {' and '.join(changed)} before the last edit; restart it"
+    return None
+
+
+# Daemon side
+
+def warm_up():
+    # Everything a render imports or sets up before it reaches the scene:
+    # manim itself, its CLI, Pango's font list and the texts the scenes
+    # spell out. Project code is left out on purpose, so every job sees
+    # the files as they are on disk.
+    import manim
+    from manim.__main__ import main  # noqa: F401
+
+    try:
+        manim.Text("warm up")
+    except Exception as e:
+        log(f"Font warm-up failed, renders will load fonts themselves: {e}")
+        return
+    # The scenes' own texts, parsed once here, are copied from manim's SVG
+    # cache in every fork
+    texts = collect_texts(sorted({info.file for info in discover()}))
+    for spec in texts.values():
+        try:
+            build_text(spec)
+        except Exception as e:
+            log(f"Could not build {spec['text']!r}: {e}")
+
+
+def run_job(job, stdout, stderr, status):
+    # In a fork of the zygote: the render runs in a fork of this process,
+    # which waits for it and writes its exit code to the status pipe
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(status)
+        os.dup2(stdout, 1)
+        os.dup2(stderr, 2)
+        os.close(stdout)
+        os.close(stderr)
+        code = 1
+        try:
+            os.environ.update(job['env'])
+            sys.argv = ['manim', *job['args']]
+            run_manim(job['args'], job['plugins'])
+            code = 0
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    os.close(stdout)
+    os.close(stderr)
+    _, wait_status = os.waitpid(pid, 0)
+    os.write(status, str(os.waitstatus_to_exitcode(wait_status)).encode())
+    os._exit(0)
+
+
+def zygote_loop(control):
+    # The zygote's whole life: one fork per job until the daemon hangs up.
+    # Finished jobs are reaped by the kernel; they reset that for their own
+    # children, or waiting on ffmpeg and LaTeX would fail.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        data, fds, _, _ = socket.recv_fds(control, ZYGOTE_MESSAGE_SIZE, 3)
+        if not data:
+            return
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            control.close()
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            os.setpgid(0, 0)
+            run_job(json.loads(data), *fds)
+        # Set here as well, so the job can be killed as soon as we answer
+        try:
+            os.setpgid(pid, pid)
+        except OSError:
+            pass
+        for fd in fds:
+            os.close(fd)
+        control.send(json.dumps({'pid': pid}).encode())
+
+
+class Zygote:
+    # A fork of the daemon taken right after the warm-up, before the server
+    # starts a single thread. Forking in a handler thread would copy whatever
+    # lock another thread holds at that moment (printing, logging, imports)
+    # into the render, locked for good. Handler threads send their job and the
+    # write ends of its pipes here instead, and this single-threaded process
+    # forks it.
+    def __init__(self):
+        self.control, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.lock = threading.Lock()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.pid = os.fork()
+        if self.pid == 0:
+            self.control.close()
+            code = 0
+            try:
+                zygote_loop(child_end)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        child_end.close()
+
+    def fork(self, job, fds):
+        # Returns the pid of the forked job, which leads its process group
+        with self.lock:
+            try:
+                socket.send_fds(self.control, [json.dumps(job).encode()], fds)
+                data = self.control.recv(ZYGOTE_MESSAGE_SIZE)
+            except OSError:
+                data = b''
+        if not data:
+            raise DaemonError("the render daemon's zygote has exited")
+        return json.loads(data)['pid']
+
+    def close(self):
+        self.control.close()
+        os.waitpid(self.pid, 0)
+
+
+class ForkedJob:
+    # One render forked by the zygote. The child starts with manim imported
+    # and configured, and whatever the scene changes dies with it.
+    def __init__(self, zygote, args, plugins, env):
+        out_read, out_write = os.pipe()
+        err_read, err_write = os.pipe()
+        status_read, status_write = os.pipe()
+        try:
+            self.pid = zygote.fork(
+                {'args': args, 'plugins': plugins, 'env': env},
+                [out_write, err_write, status_write],
+            )
+        except BaseException:
+            for fd in (out_read, err_read, status_read):
+                os.close(fd)
+            raise
+        finally:
+            for fd in (out_write, err_write, status_write):
+                os.close(fd)
+        self.stdout = os.fdopen(out_read, encoding='utf-8', errors='replace')
+        self.stderr = os.fdopen(err_read, encoding='utf-8', errors='replace')
+        self.status = os.fdopen(status_read, encoding='utf-8')
+
+    def wait(self):
+        # Nothing written means the job was killed before it could report
+        with self.status:
+            code = self.status.read()
+        return int(code) if code else -signal.SIGKILL
+
+    def kill(self):
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class ProcessJob:
+    # Without fork (Windows) every job is a fresh process; the daemon still
+    # queues and streams the jobs but cannot keep the imports warm
+    def __init__(self, args, plugins, env):
+        self.process = subprocess.Popen(
+            plugin_command(plugins, args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            env=dict(os.environ, **env),
+            cwd=ROOT,
+        )
+        self.stdout = self.process.stdout
+        self.stderr = self.process.stderr
+
+    def wait(self):
+        return self.process.wait()
+
+    def kill(self):
+        self.process.kill()
+
+
+def spawn(zygote, args, plugins, env):
+    if zygote is not None:
+        return ForkedJob(zygote, args, plugins, env)
+    return ProcessJob(args, plugins, env)
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            message, _ = read_message(self.rfile)
+        except (ConnectionError, ValueError):
+            return
+        if message['op'] == 'status':
+            send_message(self.wfile, self.server.status())
+        elif message['op'] == 'render':
+            # A fork renders with the config and code the daemon loaded; a
+            # client that sees them changed on disk gets a refusal instead
+            error = stale(self.server.loaded, message.get('loaded', self.server.loaded))
+            if error:
+                send_message(self.wfile, {'ok': False, 'error': error})
+            else:
+                self.render(message)
+        elif message['op'] == 'shutdown':
+            send_message(self.wfile, {'ok': True})
+            threading.Thread(target=self.server.shutdown).start()
+        else:
+            send_message(self.wfile, {'ok': False, 'error': f"unknown op {message['op']!r}"})
+
+    def render(self, message):
+        server = self.server
+        with server.slots:
+            start = time.monotonic()
+            job = spawn(server.zygote, message['args'], message.get('plugins', []), message.get('env', {}))
+            with server.lock:
+                server.running += 1
+            send_lock = threading.Lock()
+            # A client that hangs up no longer wants the render
+            gone = threading.Event()
+            # A reaped fork's pid can be reused; it is only killed while running
+            state_lock = threading.Lock()
+            finished = False
+
+            def hang_up():
+                gone.set()
+                with state_lock:
+                    if not finished:
+                        job.kill()
+
+            def forward(pipe, stream):
+                for line in pipe:
+                    if gone.is_set():
+                        continue
+                    try:
+                        with send_lock:
+                            send_message(self.wfile, {'stream': stream, 'line': line.rstrip('\n')})
+                    except OSError:
+                        hang_up()
+                pipe.close()
+
+            def listen():
+                # The client sends nothing after its request, so a read only
+                # returns when it closes the connection, even while the
+                # render prints nothing
+                try:
+                    self.rfile.read(1)
+                except OSError:
+                    pass
+                hang_up()
+
+            readers = [
+                threading.Thread(target=forward, args=(job.stdout, 'stdout')),
+                threading.Thread(target=forward, args=(job.stderr, 'stderr')),
+            ]
+            for reader in readers:
+                reader.start()
+            threading.Thread(target=listen, daemon=True).start()
+            returncode = job.wait()
+            with state_lock:
+                finished = True
+            for reader in readers:
+                reader.join()
+            with server.lock:
+                server.running -= 1
+                server.served += 1
+
+        seconds = time.monotonic() - start
+        log(f"{Path(message['args'][0]).name} {' '.join(message['args'][1:])}: exit {returncode} after {seconds:.1f}s")
+        if not gone.is_set():
+            try:
+                send_message(self.wfile, {'done': True, 'returncode': returncode, 'seconds': seconds})
+            except OSError:
+                pass
+
+
+class Daemon(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port, workers, zygote, loaded):
+        super().__init__((HOST, port), DaemonHandler)
+        self.zygote = zygote
+        self.loaded = loaded
+        # Jobs beyond this many wait for a free slot
+        self.slots = threading.Semaphore(workers)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.running = 0
+        self.served = 0
+        self.started = time.time()
+
+    def status(self):
+        with self.lock:
+            return {
+                'ok': True,
+                'pid': os.getpid(),
+                'manim': manim_version(),
+                'loaded': self.loaded,
+                'workers': self.workers,
+                'running': self.running,
+                'served': self.served,
+                'uptime': round(time.time() - self.started, 1),
+                'fork': self.zygote is not None,
+            }
+
+
+def serve(port=0, workers=None):
+    # manim reads manim.cfg and sets up its console when it is imported, so
+    # both happen here, once, the way every job would do them
+    os.chdir(ROOT)
+    os.environ['COLUMNS'] = '4096'
+    start = time.monotonic()
+    # Before anything reads them, so an edit during the warm-up counts
+    loaded = loaded_state()
+    warm_up()
+    workers = workers or os.cpu_count() or 1
+    # Forked before the server opens its socket or starts any thread
+    zygote = Zygote() if hasattr(os, 'fork') else None
+    try:
+        with Daemon(port, workers, zygote, loaded) as daemon:
+            port = daemon.server_address[1]
+            STATE_DIR.mkdir(parents=True, exist_ok=True)
+            DAEMON_FILE.write_text(json.dumps({'host': HOST, 'port': port, 'pid': os.getpid()}), encoding='utf-8')
+            log(f"Render daemon warm after {time.monotonic() - start:.1f}s, "
+                f"listening on {HOST}:{port} with {workers} workers")
+            try:
+                daemon.serve_forever()
+            finally:
+                DAEMON_FILE.unlink(missing_ok=True)
+    finally:
+        if zygote is not None:
+            zygote.close()
+
+
+# Client side
+
+def daemon_address():
+    try:
+        info = json.loads(DAEMON_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return info['host'], info['port']
+
+
+def request(message):
+    # Opens a connection, sends one request and returns the stream to read
+    # the answer from
+    address = daemon_address()
+    if address is None:
+        raise DaemonError("no render daemon is running (start one with: python -m rendering.daemon start)")
+    try:
+        connection = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+    except OSError as e:
+        raise DaemonError(f"render daemon at {address[0]}:{address[1]} is not answering: {e}") from e
+    connection.settimeout(None)
+    stream = connection.makefile('rwb')
+    send_message(stream, message)
+    return connection, stream
+
+
+def status():
+    connection, stream = request({'op': 'status'})
+    with connection:
+        response, _ = read_message(stream)
+    return response
+
+
+def check():
+    # The daemon imported manim, read manim.cfg and imported the rendering
+    # package when it started; after an upgrade or an edit its renders
+    # would not match what a fresh process renders
+    response = status()
+    if response['manim'] != manim_version():
+        raise DaemonError(
+            f"render daemon runs manim {response['manim']} but {manim_version()} is installed; restart it"
+        )
+    error = stale(response['loaded'], loaded_state())
+    if error:
+        raise DaemonError(error)
+    return response
+
+
+def execute(job, cancel=None):
+    # Drop-in for pool.run_process: the same job, rendered by the daemon.
+    # Setting the `cancel` event hangs up, which kills the render, and
+    # raises RenderCancelled here.
+    connection, stream = request({
+        'op': 'render',
+        'args': job.manim_args(),
+        'plugins': job.plugins,
+        'env': job.env,
+        'loaded': loaded_state(),
+    })
+    stdout = OutputFilter(job.name)
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    stderr = OutputFilter(job.name, stderr_tail)
+    done = threading.Event()
+
+    def hang_up():
+        while not done.is_set():
+            if cancel.wait(0.1):
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                return
+
+    if cancel is not None:
+        threading.Thread(target=hang_up, daemon=True).start()
+    with connection:
+        try:
+            while True:
+                try:
+                    message, _ = read_message(stream)
+                except (OSError, ValueError):
+                    if cancel is not None and cancel.is_set():
+                        raise RenderCancelled(f"{job.name} was cancelled") from None
+                    raise
+                if message.get('done'):
+                    return message['returncode'], '\n'.join(stderr_tail)
+                if 'error' in message:
+                    raise DaemonError(message['error'])
+                (stderr if message['stream'] == 'stderr' else stdout).feed(message['line'])
+        finally:
+            done.set()
+
+
+def stop():
+    connection, stream = request({'op': 'shutdown'})
+    with connection:
+        read_message(stream)
+
+
+class LocalDaemon:
+    # The running daemon, or one started for as long as the block runs
+    def __init__(self, workers=None):
+        self.workers = workers
+        self.process = None
+
+    def __enter__(self):
+        try:
+            status()
+        except DaemonError:
+            pass
+        else:
+            # One is running; it has to be usable
+            return check()
+        command = [sys.executable, '-m', 'rendering.daemon', 'start']
+        if self.workers:
+            command += ['-j', str(self.workers)]
+        DAEMON_FILE.unlink(missing_ok=True)
+        self.process = subprocess.Popen(command, cwd=ROOT)
+        while True:
+            if self.process.poll() is not None:
+                raise DaemonError(f"render daemon exited with {self.process.returncode} while starting")
+            try:
+                status()
+            except DaemonError:
+                time.sleep(0.2)
+                continue
+            # A file edited while it started is reported, not waited out
+            return check()
+
+    def __exit__(self, *exc):
+        if self.process is None:
+            return
+        try:
+            stop()
+        except (DaemonError, OSError):
+            self.process.terminate()
+        self.process.wait()
+        self.process = None
+
+    def current(self):
+        try:
+            check()
+        except DaemonError:
+            return False
+        return True
+
+    def restart(self):
+        # For a daemon that loaded manim.cfg or the rendering code before it
+        # changed. Only one started here can be restarted.
+        if self.process is None:
+            check()
+            return
+        self.__exit__()
+        self.__enter__()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Keep manim imported in a long-lived process and render jobs in forks of it."
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    start = commands.add_parser('start', help="run the daemon in the foreground")
+    start.add_argument('--port', type=int, default=0, help="port on 127.0.0.1 (default: any free port)")
+    start.add_argument('-j', '--jobs', type=int, help="renders at the same time (default: number of CPU cores)")
+    commands.add_parser('status', help="show whether a daemon is running and what it is doing")
+    commands.add_parser('stop', help="shut the running daemon down")
+    submit = commands.add_parser('submit', help="render a scene file with the running daemon")
+    submit.add_argument('file', type=Path)
+    submit.add_argument('scenes', nargs='*', help="scene classes to render (default: all)")
+    submit.add_argument('-q', '--quality', default='h', choices=['l', 'm', 'h', 'p', 'k'])
+    submit.add_argument('--plugin', action='append', default=[], metavar='NAME[=ARG]')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.command == 'start':
+            serve(args.port, args.jobs)
+        elif args.command == 'status':
+            print(json.dumps(status(), indent=2))
+        elif args.command == 'stop':
+            stop()
+            print("Render daemon stopped")
+        elif args.command == 'submit':
+            check()
+            job = RenderJob(
+                args.file.resolve(),
+                quality=args.quality,
+                run_args=args.scenes,
+                plugins=args.plugin,
+            )
+            start = time.monotonic()
+            returncode, _ = execute(job)
+            print(f"{job.name}: exit {returncode} after {time.monotonic() - start:.1f}s")
+            return returncode
+    except DaemonError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
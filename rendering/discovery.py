@@ -0,0 +1,122 @@
+import argparse
+import ast
+import fnmatch
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .jobs import RenderJob
+from .paths import ANIMATIONS_DIR
+
+
+@dataclass
+class SceneInfo:
+    file: Path
+    name: str
+    # Rough relative cost: the play() and wait() calls construct() can reach
+    cost: int
+
+    @property
+    def key(self):
+        return f"{self.file.stem}:{self.name}"
+
+
+def _bases(node):
+    return [getattr(base, 'id', getattr(base, 'attr', '')) for base in node.bases]
+
+
+def scene_classes(tree):
+    # Classes deriving from something named *Scene (Scene, MovingCameraScene,
+    # SectionedScene, ...), directly or through another scene of the same file
+    scenes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            if any(base.endswith('Scene') or base in scenes for base in _bases(node)):
+                scenes[node.name] = node
+    return scenes
+
+
+def _animation_calls(node):
+    return sum(
+        isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Attribute)
+        and call.func.attr in ('play', 'wait')
+        and isinstance(call.func.value, ast.Name)
+        and call.func.value.id == 'self'
+        for call in ast.walk(node)
+    )
+
+
+def scene_methods(cls, scenes):
+    # Methods resolve through the scene's bases in the same file, so a
+    # subclass that only changes a class attribute runs its base's code
+    methods = {}
+    for base in _bases(cls):
+        if base in scenes:
+            methods.update(scene_methods(scenes[base], scenes))
+    methods.update({f.name: f for f in cls.body if isinstance(f, ast.FunctionDef)})
+    return methods
+
+
+def static_cost(cls, scenes):
+    return max(sum(_animation_calls(f) for f in scene_methods(cls, scenes).values()), 1)
+
+
+def discover_file(file):
+    file = Path(file)
+    tree = ast.parse(file.read_text(encoding='utf-8'), filename=str(file))
+    scenes = scene_classes(tree)
+    return [SceneInfo(file, name, static_cost(node, scenes)) for name, node in scenes.items()]
+
+
+def matches(info, patterns):
+    # A pattern matches module:Class, or the class or module name alone
+    return any(
+        fnmatch.fnmatchcase(info.key, pattern)
+        or fnmatch.fnmatchcase(info.name, pattern)
+        or fnmatch.fnmatchcase(info.file.stem, pattern)
+        for pattern in patterns
+    )
+
+
+def discover(files=None, include=(), exclude=()):
+    # Every scene of the files (default: animations/*.py), found without
+    # importing them, so neither manim nor the scenes' imports are needed
+    files = sorted(ANIMATIONS_DIR.glob('*.py')) if files is None else files
+    scenes = [info for file in files for info in discover_file(file)]
+    if include:
+        scenes = [info for info in scenes if matches(info, include)]
+    return [info for info in scenes if not matches(info, exclude)]
+
+
+def scene_jobs(scenes, **options):
+    return [RenderJob(info.file, scene=info.name, **options) for info in scenes]
+
+
+def schedule(jobs, costs):
+    # Most expensive first: a long job started last would leave the other
+    # workers idle at the end
+    return sorted(jobs, key=lambda job: costs.get(job.name, 0), reverse=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="List the scenes the runner would render.")
+    parser.add_argument('files', nargs='*', type=Path, help="scene files (default: animations/*.py)")
+    parser.add_argument('--scene', action='append', default=[], metavar='PATTERN',
+                        help="only scenes matching module:Class, Class or module (glob patterns)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help="leave out scenes matching these patterns")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    scenes = discover(args.files or None, args.scene, args.exclude)
+    elapsed = time.perf_counter() - start
+    width = max((len(info.key) for info in scenes), default=0)
+    for info in sorted(scenes, key=lambda info: info.cost, reverse=True):
+        print(f"{info.key:<{width}}  {info.cost:>4} animations")
+    print(f"{len(scenes)} scenes found in {elapsed * 1000:.1f} ms")
+    sys.exit(0 if scenes else 1)
@@ -0,0 +1,54 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+# manim's -q flags by the names its config uses
+QUALITY_NAMES = {
+    'l': 'low_quality',
+    'm': 'medium_quality',
+    'h': 'high_quality',
+    'p': 'production_quality',
+    'k': 'fourk_quality',
+}
+
+
+def load_scenes(file):
+    # Import a scene file the way manim does: its directory goes on sys.path
+    # so the scenes can import their shared components, and only the Scene
+    # subclasses defined in the file itself count
+    from manim import Scene
+
+    file = Path(file).resolve()
+    if str(file.parent) not in sys.path:
+        sys.path.insert(0, str(file.parent))
+    spec = importlib.util.spec_from_file_location(file.stem, file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[file.stem] = module
+    spec.loader.exec_module(module)
+    return [
+        obj for obj in vars(module).values()
+        if isinstance(obj, type)
+        and issubclass(obj, Scene)
+        and obj.__module__ == module.__name__
+    ]
+
+
+def render_config(file, quality, **options):
+    # Settings for manim's tempconfig matching `manim -q<quality> <file>`
+    return {
+        'quality': QUALITY_NAMES[quality],
+        'input_file': str(Path(file).resolve()),
+        **options,
+    }
+
+
+def scene_caller(scene_file):
+    # Name of the innermost function of the scene file on the stack, i.e. the
+    # scene method that issued the current play() or wait()
+    scene_file = Path(scene_file).resolve()
+    frame = sys._getframe(1)
+    while frame is not None:
+        if Path(frame.f_code.co_filename).resolve() == scene_file:
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
@@ -0,0 +1,171 @@
+import functools
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .ffmpeg import run_ffmpeg
+from .pool import log
+from .worker import tag_partial_movies
+
+
+class HoldState:
+    # Where the writer of one partial movie file stands
+    def __init__(self):
+        self.next_pts = 0
+        self.last = None
+        self.last_pts = None
+
+
+class VariableFrameRate:
+    # Worker plugin writing each run of identical frames once, stamped with
+    # the time it starts; the next different frame ends the run. wait() and
+    # frozen animations then cost one encoded frame instead of fps per
+    # second. B-frames are turned off for this: with timestamp gaps, x264's
+    # reordering delay turns into a wrong file duration.
+    cfr = False
+    # Partial movies are VFR whether or not the movie is converted back
+    partial_tag = 'vfr'
+
+    def __init__(self, output):
+        self.output = Path(output) if output else None
+        self.scenes = []
+        self.states = {}
+
+    def current(self):
+        if not self.scenes:
+            self.scenes.append(self.new_scene('?'))
+        return self.scenes[-1]
+
+    @staticmethod
+    def new_scene(name):
+        return {'scene': name, 'frames': 0, 'encoded': 0, 'holds': 0, 'encode_seconds': 0.0}
+
+    def install(self):
+        import av
+        from manim import Scene
+        from manim.scene.scene_file_writer import SceneFileWriter
+
+        plugin = self
+        render = Scene.render
+        open_stream = SceneFileWriter.open_partial_movie_stream
+        listen = SceneFileWriter.listen_and_write
+        combine = SceneFileWriter.combine_to_movie
+
+        @functools.wraps(render)
+        def render_scene(scene, *args, **kwargs):
+            plugin.scenes.append(plugin.new_scene(type(scene).__name__))
+            return render(scene, *args, **kwargs)
+
+        @functools.wraps(open_stream)
+        def open_partial_movie_stream(writer, *args, **kwargs):
+            open_stream(writer, *args, **kwargs)
+            writer.video_stream.codec_context.max_b_frames = 0
+            plugin.states[id(writer)] = HoldState()
+
+        def encode(writer, frame, pts):
+            av_frame = av.VideoFrame.from_ndarray(frame, format='rgba')
+            av_frame.pts = pts
+            for packet in writer.video_stream.encode(av_frame):
+                writer.video_container.mux(packet)
+
+        def encode_and_write_frame(writer, frame, num_frames):
+            state = plugin.states[id(writer)]
+            stats = plugin.current()
+            start = time.perf_counter()
+            stats['frames'] += num_frames
+            if state.last is not None and np.array_equal(frame, state.last):
+                if state.next_pts == state.last_pts + 1:
+                    stats['holds'] += 1
+            else:
+                encode(writer, frame, state.next_pts)
+                stats['encoded'] += 1
+                if num_frames > 1:
+                    stats['holds'] += 1
+                state.last, state.last_pts = frame, state.next_pts
+            state.next_pts += num_frames
+            stats['encode_seconds'] += time.perf_counter() - start
+
+        @functools.wraps(listen)
+        def listen_and_write(writer):
+            listen(writer)
+            # A file ending in a hold needs its last frame stamped at the
+            # end, or the file stops where the hold starts
+            state = plugin.states.pop(id(writer), None)
+            if state and state.last is not None and state.last_pts < state.next_pts - 1:
+                encode(writer, state.last, state.next_pts - 1)
+                plugin.current()['encoded'] += 1
+
+        @functools.wraps(combine)
+        def combine_to_movie(writer, *args, **kwargs):
+            combine(writer, *args, **kwargs)
+            if plugin.cfr and writer.movie_file_path and Path(writer.movie_file_path).is_file():
+                plugin.to_cfr(Path(writer.movie_file_path))
+
+        tag_partial_movies(self.partial_tag)
+        Scene.render = render_scene
+        SceneFileWriter.open_partial_movie_stream = open_partial_movie_stream
+        SceneFileWriter.encode_and_write_frame = encode_and_write_frame
+        SceneFileWriter.listen_and_write = listen_and_write
+        SceneFileWriter.combine_to_movie = combine_to_movie
+
+    def to_cfr(self, movie):
+        # For players and editors that want every frame: the holds are
+        # expanded again, once, on the finished movie
+        from manim import config
+
+        tmp = movie.with_name(f".{movie.stem}.cfr{movie.suffix}")
+        start = time.perf_counter()
+        try:
+            run_ffmpeg([
+                '-i', str(movie),
+                '-fps_mode', 'cfr', '-r', str(config.frame_rate),
+                '-c:v', 'libx264', '-crf', '23', '-pix_fmt', 'yuv420p',
+                '-c:a', 'copy', '-movflags', '+faststart',
+                str(tmp),
+            ])
+            tmp.replace(movie)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.current()['cfr_seconds'] = round(time.perf_counter() - start, 4)
+
+    def finish(self):
+        from manim import config
+
+        for scene in self.scenes:
+            scene['deduplicated'] = scene['frames'] - scene['encoded']
+            scene['encode_seconds'] = round(scene['encode_seconds'], 4)
+        report = {'file': str(config.input_file), 'fps': config.frame_rate, 'cfr': self.cfr, 'scenes': self.scenes}
+        if self.output:
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            self.output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        for scene in self.scenes:
+            if scene['frames']:
+                log(f"{scene['scene']}: {scene['deduplicated']} of {scene['frames']} frames "
+                    f"({scene['deduplicated'] / scene['frames']:.0%}) held instead of encoded")
+
+
+class ConstantFrameRate(VariableFrameRate):
+    # The same, with the finished movie converted back to constant frame rate
+    cfr = True
+
+
+def print_dedup_table(paths):
+    rows = []
+    for path in paths:
+        try:
+            report = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            continue
+        rows += [scene for scene in report['scenes'] if scene['frames']]
+    if not rows:
+        return
+    width = max(len(scene['scene']) for scene in rows)
+    print(f"\n{'scene':<{width}} {'frames':>7} {'encoded':>8} {'held':>7} {'share':>6} {'holds':>6} {'encode':>8}")
+    for scene in rows:
+        print(f"{scene['scene']:<{width}} {scene['frames']:>7} {scene['encoded']:>8} {scene['deduplicated']:>7} "
+              f"{scene['deduplicated'] / scene['frames']:>6.0%} {scene['holds']:>6} {scene['encode_seconds']:>7.2f}s")
+    frames = sum(scene['frames'] for scene in rows)
+    held = sum(scene['deduplicated'] for scene in rows)
+    print(f"{held} of {frames} frames ({held / frames:.0%}) were held instead of encoded")
@@ -0,0 +1,344 @@
+import argparse
+import ast
+import json
+import re
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .discovery import discover, scene_classes, scene_methods, scene_jobs
+from .jobs import QUALITY_DIRS
+from .journal import partial_dir
+from .paths import STATE_DIR
+from .pool import default_workers, log
+
+HISTORY_FILE = STATE_DIR / 'history.json'
+PROFILE_DIR = STATE_DIR / 'profile'
+KEEP_HISTORY = 5
+
+# manim's defaults for play() and wait() without a run time
+DEFAULT_RUN_TIME = 1.0
+DEFAULT_WAIT_TIME = 1.0
+
+# Used until a render has been timed on this machine: seconds per frame
+# per megapixel, the extra share per mobject built, and the cost of
+# starting manim and running construct()
+DEFAULT_RATE = 0.03
+MOBJECT_WEIGHT = 0.01
+STARTUP_SECONDS = 3.0
+
+# A line of the file list manim concatenates the partial movies from
+PARTIAL_LIST_RE = re.compile(r"^file 'file:(?P<path>.*)'$")
+
+
+def quality_format(quality):
+    # (megapixels, fps) of a manim quality flag; its folder name is <height>p<fps>
+    height, fps = (int(part) for part in QUALITY_DIRS[quality].split('p'))
+    return height * height * 16 / 9 / 1e6, fps
+
+
+def _number(node, default):
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return default
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+def _keyword(call, name):
+    return next((k.value for k in call.keywords if k.arg == name), None)
+
+
+def _self_method(call):
+    func = call.func
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'self':
+        return func.attr
+    return None
+
+
+def _iterations(iterable):
+    # How often a loop over this runs, when the source says so; 1 otherwise
+    if isinstance(iterable, (ast.List, ast.Tuple, ast.Set)):
+        return len(iterable.elts)
+    if isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name):
+        args = iterable.args
+        if iterable.func.id == 'range' and args:
+            bounds = [_number(arg, None) for arg in args[:2]]
+            if None not in bounds:
+                return max(int(bounds[-1] - (bounds[0] if len(bounds) == 2 else 0)), 0)
+        if iterable.func.id in ('enumerate', 'reversed', 'zip') and args:
+            return min(_iterations(arg) for arg in args)
+    return 1
+
+
+def play_duration(call):
+    # run_time= on play() wins; otherwise the longest run_time= given to one
+    # of its animations, else manim's default
+    run_time = _keyword(call, 'run_time')
+    if run_time is not None:
+        return _number(run_time, DEFAULT_RUN_TIME)
+    nested = [
+        _number(_keyword(node, 'run_time'), DEFAULT_RUN_TIME)
+        for arg in call.args for node in ast.walk(arg)
+        if isinstance(node, ast.Call) and _keyword(node, 'run_time') is not None
+    ]
+    return max(nested, default=DEFAULT_RUN_TIME)
+
+
+def wait_duration(call):
+    duration = call.args[0] if call.args else _keyword(call, 'duration')
+    return DEFAULT_WAIT_TIME if duration is None else _number(duration, DEFAULT_WAIT_TIME)
+
+
+@dataclass
+class StaticEstimate:
+    seconds: float = 0.0
+    animations: float = 0.0
+    mobjects: float = 0.0
+
+
+def _walk(node, methods, estimate, repeat, stack):
+    # Follows construct() through the self.method() calls it makes, adding
+    # up play()/wait() durations and mobject constructors, times the
+    # iterations of the loops around them
+    if isinstance(node, (ast.For, ast.AsyncFor)):
+        _walk(node.iter, methods, estimate, repeat, stack)
+        for child in node.body + node.orelse:
+            _walk(child, methods, estimate, repeat * _iterations(node.iter), stack)
+        return
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+        for generator in node.generators:
+            repeat *= _iterations(generator.iter)
+    if isinstance(node, ast.Call):
+        method = _self_method(node)
+        if method == 'play':
+            estimate.seconds += play_duration(node) * repeat
+            estimate.animations += repeat
+            # Animations are built here, not mobjects worth counting
+            return
+        if method == 'wait':
+            estimate.seconds += wait_duration(node) * repeat
+            estimate.animations += repeat
+            return
+        if method in methods and method not in stack:
+            _walk(methods[method], methods, estimate, repeat, stack | {method})
+        elif isinstance(node.func, ast.Name) and node.func.id[:1].isupper():
+            estimate.mobjects += repeat
+    for child in ast.iter_child_nodes(node):
+        _walk(child, methods, estimate, repeat, stack)
+
+
+def static_estimate(cls, scenes):
+    methods = scene_methods(cls, scenes)
+    estimate = StaticEstimate()
+    if 'construct' in methods:
+        _walk(methods['construct'], methods, estimate, 1, frozenset({'construct'}))
+    return estimate
+
+
+def static_estimates(files):
+    estimates = {}
+    for file in files:
+        tree = ast.parse(Path(file).read_text(encoding='utf-8'), filename=str(file))
+        scenes = scene_classes(tree)
+        for name, cls in scenes.items():
+            estimates[f"{Path(file).stem}:{name}"] = static_estimate(cls, scenes)
+    return estimates
+
+
+class History:
+    # Seconds per frame per megapixel of the last renders of every job, so
+    # estimates follow this machine and each scene's actual complexity
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self.entries = json.loads(path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def rate(self, key):
+        rates = self.entries.get(key)
+        return statistics.median(rates) if rates else None
+
+    def machine_rate(self):
+        # Typical rate of every scene rendered so far, for scenes never rendered
+        rates = [statistics.median(rates) for rates in self.entries.values() if rates]
+        return statistics.median(rates) if rates else None
+
+    def record(self, key, seconds, frames, megapixels):
+        if frames <= 0 or seconds <= STARTUP_SECONDS:
+            return
+        with self._lock:
+            rates = self.entries.setdefault(key, [])
+            rates.append(round((seconds - STARTUP_SECONDS) / (frames * megapixels), 6))
+            del rates[:-KEEP_HISTORY]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding='utf-8')
+            tmp.replace(self.path)
+
+
+def rendered_in_full(job, since):
+    # Whether the run that started at `since` (a time.time()) rendered every
+    # animation of the scene itself. A partial movie manim took from its
+    # cache is older than the run, and the run's time says nothing about it.
+    if not job.scene:
+        return False
+    listing = partial_dir(job) / 'partial_movie_file_list.txt'
+    try:
+        if listing.stat().st_mtime < since:
+            return False
+        lines = listing.read_text(encoding='utf-8').splitlines()
+        paths = [match['path'] for match in map(PARTIAL_LIST_RE.match, lines) if match]
+        return bool(paths) and all(Path(path).stat().st_mtime >= since for path in paths)
+    except FileNotFoundError:
+        return False
+
+
+def profile_rate(job):
+    # Seconds per frame per megapixel from the last --profile run of the job
+    try:
+        report = json.loads((PROFILE_DIR / f"{job.slug}.json").read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return None
+    width, height = (int(n) for n in report['resolution'].split('x'))
+    plays = [play for scene in report['scenes'] for play in scene['plays']]
+    frames = sum(play['frames'] for play in plays)
+    if not frames:
+        return None
+    return sum(play['wall'] for play in plays) / (frames * width * height / 1e6)
+
+
+@dataclass
+class Estimate:
+    job: object
+    video_seconds: float
+    frames: int
+    seconds: float
+    # Where the rate came from: history, profile, machine or default
+    source: str
+    # Whether the frame count came from a probe rather than the source code
+    probed: bool = False
+
+
+def estimate_job(job, static, history, probe=None):
+    megapixels, fps = quality_format(job.quality)
+    if probe is not None:
+        video_seconds, frames = probe['duration'], probe['frames']
+    else:
+        video_seconds = static.seconds
+        frames = round(static.seconds * fps)
+
+    rate, source = history.rate(job.name), 'history'
+    if rate is None:
+        rate, source = profile_rate(job), 'profile'
+    if rate is None:
+        # Without a measurement of this scene, more mobjects mean slower frames
+        rate = (history.machine_rate() or DEFAULT_RATE) * (1 + MOBJECT_WEIGHT * static.mobjects)
+        source = 'machine' if history.machine_rate() else 'default'
+    seconds = STARTUP_SECONDS + frames * megapixels * rate
+    return Estimate(job, video_seconds, frames, seconds, source, probe is not None)
+
+
+def estimate_jobs(jobs, probes=None, history=None):
+    # probes: {job name: probed scene}, from a preflight run
+    history = history or History()
+    probes = probes or {}
+    statics = static_estimates(sorted({job.file for job in jobs}))
+    return {
+        job.name: estimate_job(job, statics.get(job.name, StaticEstimate()), history, probes.get(job.name))
+        for job in jobs
+    }
+
+
+def makespan(costs, workers):
+    # Wall time of running jobs longest first on `workers` workers, each
+    # taking the next job as soon as it is free
+    finish = [0.0] * max(1, workers)
+    for cost in sorted(costs, reverse=True):
+        finish[finish.index(min(finish))] += cost
+    return max(finish)
+
+
+def format_seconds(seconds):
+    seconds = round(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02}s"
+    return f"{seconds}s"
+
+
+class Progress:
+    # Prints an ETA whenever a job finishes. The remaining estimates are
+    # scaled by how far off the finished ones were.
+    def __init__(self, estimates, workers):
+        self.estimates = estimates
+        self.workers = workers
+        self.pending = set(estimates)
+        self.estimated_done = 0.0
+        self.actual_done = 0.0
+        self.start = time.monotonic()
+        self.lock = threading.Lock()
+
+    def done(self, result):
+        with self.lock:
+            name = result.job.name
+            if name not in self.pending:
+                return
+            self.pending.discard(name)
+            if result.ok:
+                self.estimated_done += self.estimates[name].seconds
+                self.actual_done += result.duration
+            scale = self.actual_done / self.estimated_done if self.estimated_done else 1.0
+            remaining = makespan([self.estimates[n].seconds * scale for n in self.pending], self.workers)
+            finished = len(self.estimates) - len(self.pending)
+            elapsed = time.monotonic() - self.start
+        if self.pending:
+            log(f"[{finished}/{len(self.estimates)} done, {format_seconds(elapsed)} elapsed] "
+                f"ETA {format_seconds(remaining)}")
+
+
+def print_estimates(estimates, workers):
+    rows = sorted(estimates.values(), key=lambda e: e.seconds, reverse=True)
+    if not rows:
+        return
+    width = max(len(e.job.name) for e in rows)
+    log(f"{'scene':<{width}} {'video':>8} {'frames':>7} {'estimate':>9}  rate from")
+    for e in rows:
+        frames = f"{e.frames}" if e.probed else f"~{e.frames}"
+        log(f"{e.job.name:<{width}} {e.video_seconds:>7.1f}s {frames:>7} "
+            f"{format_seconds(e.seconds):>9}  {e.source}")
+    total = sum(e.seconds for e in rows)
+    log(f"{len(rows)} scenes, {format_seconds(total)} of rendering, "
+        f"about {format_seconds(makespan([e.seconds for e in rows], workers))} with {workers} workers")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate how long rendering every scene will take.")
+    parser.add_argument('-q', '--quality', default='h', choices=['l', 'm', 'h', 'p', 'k'])
+    parser.add_argument('-j', '--jobs', type=int, default=default_workers(), help="workers to plan for")
+    parser.add_argument('--scene', action='append', default=[], metavar='PATTERN')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN')
+    parser.add_argument(
+        '--probe', action='store_true',
+        help="count frames by running the scenes with rendering skipped (needs manim)",
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    jobs = scene_jobs(discover(include=args.scene, exclude=args.exclude), quality=args.quality)
+    probes = {}
+    if args.probe:
+        from .preflight import preflight
+
+        _, checks = preflight(jobs, args.jobs)
+        probes = {c.job.name: c.scenes[0] for c in checks if c.ok and c.scenes}
+    print_estimates(estimate_jobs(jobs, probes), args.jobs)
+    sys.exit(0)
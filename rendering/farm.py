@@ -0,0 +1,447 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .ffmpeg import concat_copy
+from .fingerprint import fingerprint_job, manim_version, relative
+from .jobs import QUALITY_DIRS, JobResult, RenderJob
+from .paths import ANIMATIONS_DIR, ROOT, STATE_DIR
+from .pool import STDERR_TAIL_LINES, default_workers, log, report
+from .probe import probe_job, report_errors
+from .worker import OUTPUT_PLUGINS, SPEED_PLUGINS, output_spec
+
+FARM_DIR = STATE_DIR / 'farm'
+DEFAULT_PORT = 8765
+
+# Estimated cost of a range in frames: what it renders, plus the manim
+# startup and the skipped construct() run every range pays up front
+RANGE_OVERHEAD_FRAMES = 120
+MIN_RANGE_FRAMES = 240
+# Ranges per node; a few more than one lets longest-first even out the tail
+RANGES_PER_NODE = 3
+
+CONNECT_TIMEOUT = 10
+
+
+class NodeError(RuntimeError):
+    # The node is unreachable or cannot render this tree; its work goes to
+    # the other nodes
+    pass
+
+
+class RangeError(RuntimeError):
+    # manim failed on the range; retrying it elsewhere would fail the same way
+    pass
+
+
+# Wire format: one JSON header line, optionally followed by `size` raw bytes
+
+def send_message(stream, message, payload=b''):
+    stream.write(json.dumps(dict(message, size=len(payload))).encode() + b'\n')
+    stream.write(payload)
+    stream.flush()
+
+
+def read_message(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    message = json.loads(line)
+    payload = stream.read(message.get('size', 0))
+    if len(payload) != message.get('size', 0):
+        raise ConnectionError("connection closed mid-transfer")
+    return message, payload
+
+
+def parse_hosts(value):
+    hosts = []
+    for entry in value.split(','):
+        host, _, port = entry.strip().rpartition(':')
+        hosts.append((host or entry.strip(), int(port) if host else DEFAULT_PORT))
+    return hosts
+
+
+# Node side
+
+class NodeHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                message, _ = read_message(self.rfile)
+            except ConnectionError:
+                return
+            if message['op'] == 'hello':
+                send_message(self.wfile, {'ok': True, 'host': socket.gethostname(), 'manim': manim_version()})
+            elif message['op'] == 'render':
+                try:
+                    response, payload = self.server.render(message)
+                except Exception as e:
+                    response, payload = {'ok': False, 'error': f"{type(e).__name__}: {e}"}, b''
+                send_message(self.wfile, response, payload)
+            else:
+                send_message(self.wfile, {'ok': False, 'error': f"unknown op {message['op']!r}"})
+
+
+class Node(socketserver.TCPServer):
+    # Renders one range at a time with the node's own checkout of the repo.
+    # Run one node per core you want to use on a machine.
+    allow_reuse_address = True
+
+    def __init__(self, address, media_dir):
+        super().__init__(address, NodeHandler)
+        self.media_dir = Path(media_dir)
+
+    def render(self, message):
+        file = (ROOT / message['file']).resolve()
+        if file.parent != ANIMATIONS_DIR.resolve() or not file.is_file():
+            return {'ok': False, 'error': f"no scene file {message['file']}"}, b''
+
+        job = RenderJob(
+            file,
+            quality=message['quality'],
+            extra_args=message['args'],
+            plugins=message.get('plugins', []),
+        )
+        if fingerprint_job(job) != message['fingerprint']:
+            return {'ok': False, 'mismatch': True, 'error': "node sources differ from the coordinator"}, b''
+
+        first, last = message['range']
+        job.run_args = [message['scene'], '-n', f"{first},{last}", '--media_dir', str(self.media_dir)]
+        start = time.monotonic()
+        log(f"Rendering {job.name} {message['scene']} animations {first}-{last}")
+        result = subprocess.run(
+            job.command(),
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            env=dict(os.environ, COLUMNS='4096', **job.env),
+            cwd=ROOT,
+        )
+        if result.returncode != 0:
+            tail = '\n'.join(result.stderr.splitlines()[-STDERR_TAIL_LINES:])
+            return {'ok': False, 'error': tail or f"manim exited with {result.returncode}"}, b''
+
+        video = self.media_dir / 'videos' / file.stem / QUALITY_DIRS[job.quality] / f"{message['scene']}.mp4"
+        payload = video.read_bytes()
+        video.unlink()
+        return {'ok': True, 'seconds': time.monotonic() - start}, payload
+
+
+def serve(host, port, media_dir=None):
+    media_dir = media_dir or FARM_DIR / f"node-{port}"
+    with Node((host, port), media_dir) as node:
+        log(f"Render node listening on {host}:{node.server_address[1]}")
+        node.serve_forever()
+
+
+# Coordinator side
+
+class NodeClient:
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self.name = f"{host}:{port}"
+        self.socket = None
+
+    def connect(self):
+        try:
+            self.socket = socket.create_connection(self.address, timeout=CONNECT_TIMEOUT)
+            # Renders take as long as they take
+            self.socket.settimeout(None)
+            self.stream = self.socket.makefile('rwb')
+            send_message(self.stream, {'op': 'hello'})
+            hello, _ = read_message(self.stream)
+        except OSError as e:
+            raise NodeError(f"cannot reach {self.name}: {e}") from e
+        return hello
+
+    def render(self, range_):
+        try:
+            send_message(self.stream, {
+                'op': 'render',
+                'file': relative(range_.job.file.resolve()),
+                'scene': range_.scene,
+                'quality': range_.job.quality,
+                'args': range_.job.extra_args,
+                # Only plugins that change the video or speed it up; reports
+                # stay on this side
+                'plugins': [
+                    output_spec(p) if p.partition('=')[0] in OUTPUT_PLUGINS else p
+                    for p in range_.job.plugins
+                    if p.partition('=')[0] in OUTPUT_PLUGINS | SPEED_PLUGINS
+                ],
+                'range': [range_.first, range_.last],
+                'fingerprint': range_.fingerprint,
+            })
+            response, payload = read_message(self.stream)
+        except OSError as e:
+            raise NodeError(f"lost {self.name}: {e}") from e
+        if response.get('mismatch'):
+            raise NodeError(f"{self.name}: {response['error']}")
+        if not response['ok']:
+            raise RangeError(response['error'])
+        return payload
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+
+
+@dataclass
+class Range:
+    job: RenderJob
+    scene: str
+    first: int
+    last: int
+    cost: int
+    fingerprint: str
+
+    @property
+    def label(self):
+        return f"{self.job.name} {self.scene} {self.first}-{self.last}"
+
+
+def split_ranges(plays, target):
+    # Cut a scene's animations into consecutive ranges of roughly `target`
+    # estimated frames each
+    ranges, first, cost = [], 0, RANGE_OVERHEAD_FRAMES
+    for play in plays:
+        cost += play['frames']
+        if cost >= target:
+            ranges.append((first, play['index'], cost))
+            first, cost = play['index'] + 1, RANGE_OVERHEAD_FRAMES
+    if first < len(plays):
+        ranges.append((first, len(plays) - 1, cost))
+    return ranges
+
+
+@dataclass
+class FarmJob:
+    job: RenderJob
+    scenes: list
+    ranges: list = field(default_factory=list)
+    videos: dict = field(default_factory=dict)
+    error: str = ''
+    started: float = None
+
+    @property
+    def done(self):
+        return len(self.videos) == len(self.ranges)
+
+
+class Farm:
+    # Spreads animation ranges of every job over the nodes, longest estimated
+    # range first. Each node pulls the next range when it finishes one; the
+    # ranges of a job are concatenated once all of them are back.
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.lock = threading.Lock()
+
+    def plan(self, jobs):
+        # Probing runs construct() with nothing rasterized, which is what
+        # tells how many frames each animation will take
+        with ThreadPoolExecutor(max_workers=default_workers()) as executor:
+            reports = list(executor.map(probe_job, jobs))
+        farm_jobs = []
+        for job, probed in zip(jobs, reports):
+            errors = report_errors(probed)
+            farm_jobs.append(FarmJob(job, probed['scenes'], error=errors[0] if errors else ''))
+
+        total = sum(s['frames'] for fj in farm_jobs for s in fj.scenes)
+        target = max(total // max(len(self.hosts) * RANGES_PER_NODE, 1), MIN_RANGE_FRAMES)
+        for fj in farm_jobs:
+            if fj.error:
+                continue
+            fingerprint = fingerprint_job(fj.job)
+            for scene in fj.scenes:
+                for first, last, cost in split_ranges(scene['plays'], target):
+                    fj.ranges.append(Range(fj.job, scene['scene'], first, last, cost, fingerprint))
+        return farm_jobs
+
+    def run(self, jobs, on_result=None):
+        farm_jobs = self.plan(jobs)
+        self.on_result = on_result
+        self.results = {}
+        self.by_job = {id(fj.job): fj for fj in farm_jobs}
+
+        for fj in farm_jobs:
+            if fj.error or not fj.ranges:
+                self.finish(fj)
+
+        self.queue = deque(sorted(
+            (r for fj in farm_jobs if not fj.error for r in fj.ranges),
+            key=lambda r: r.cost,
+            reverse=True,
+        ))
+        log(f"Farm: {len(self.queue)} ranges over {len(self.hosts)} nodes")
+
+        workers = [threading.Thread(target=self.work, args=(host,)) for host in self.hosts]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # Anything still queued had no node left to run it
+        for fj in farm_jobs:
+            if fj.job.name not in self.results:
+                fj.error = fj.error or "no render node left to finish the job"
+                self.finish(fj)
+        return [self.results[job.name] for job in jobs]
+
+    def next_range(self):
+        with self.lock:
+            while self.queue:
+                range_ = self.queue.popleft()
+                if not self.by_job[id(range_.job)].error:
+                    return range_
+            return None
+
+    def work(self, host):
+        client = NodeClient(*host)
+        try:
+            client.connect()
+        except NodeError as e:
+            log(f"✗ {e}")
+            return
+        try:
+            while True:
+                range_ = self.next_range()
+                if range_ is None:
+                    return
+                fj = self.by_job[id(range_.job)]
+                with self.lock:
+                    fj.started = fj.started or time.monotonic()
+                log(f"[{client.name}] {range_.label} (~{range_.cost} frames)")
+                try:
+                    payload = client.render(range_)
+                except NodeError as e:
+                    log(f"✗ {e}; requeueing {range_.label}")
+                    with self.lock:
+                        self.queue.appendleft(range_)
+                    return
+                except RangeError as e:
+                    with self.lock:
+                        fj.error = fj.error or f"{range_.label}: {e}"
+                    self.finish(fj)
+                    continue
+                self.store(fj, range_, payload)
+        finally:
+            client.close()
+
+    def store(self, fj, range_, payload):
+        path = FARM_DIR / 'ranges' / fj.job.file.stem / f"{range_.scene}.{range_.first:04}-{range_.last:04}.mp4"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(payload)
+        with self.lock:
+            fj.videos[(range_.scene, range_.first)] = path
+            done = fj.done
+        if done:
+            self.finish(fj)
+
+    def finish(self, fj):
+        with self.lock:
+            if fj.job.name in self.results:
+                return
+            duration = time.monotonic() - fj.started if fj.started else 0.0
+            result = JobResult(fj.job, 0 if not fj.error else 1, duration, fj.error)
+            self.results[fj.job.name] = result
+
+        if result.ok:
+            try:
+                for scene in fj.scenes:
+                    parts = sorted(
+                        (first, path) for (name, first), path in fj.videos.items()
+                        if name == scene['scene']
+                    )
+                    output = fj.job.output_dir / f"{scene['scene']}.mp4"
+                    result.outputs.append(concat_copy([path for _, path in parts], output))
+            except Exception as e:
+                result.returncode = 1
+                result.stderr = f"{type(e).__name__}: {e}"
+        for path in fj.videos.values():
+            path.unlink(missing_ok=True)
+        report(result)
+        if self.on_result:
+            self.on_result(result)
+
+
+def render_on_farm(jobs, hosts, on_result=None):
+    if not jobs:
+        return []
+    return Farm(hosts).run(jobs, on_result=on_result)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class LocalNodes:
+    # A pool of nodes on this machine, for testing the farm without one
+    def __init__(self, count):
+        self.count = count
+        self.processes = []
+
+    def __enter__(self):
+        hosts = []
+        for i in range(self.count):
+            port = _free_port()
+            # Fixed media dirs so manim's partial movie cache survives runs
+            self.processes.append(subprocess.Popen(
+                [
+                    sys.executable, '-m', 'rendering.farm', 'serve',
+                    '--host', '127.0.0.1', '--port', str(port),
+                    '--media-dir', str(FARM_DIR / f"local-{i}"),
+                ],
+                cwd=ROOT,
+            ))
+            hosts.append(('127.0.0.1', port))
+        for host in hosts:
+            self._wait_for(host)
+        return hosts
+
+    def _wait_for(self, host, timeout=30):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection(host, timeout=1).close()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise NodeError(f"local node {host[0]}:{host[1]} did not start")
+                time.sleep(0.1)
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.wait()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render nodes for distributed scene rendering.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    node = commands.add_parser('serve', help="run a render node")
+    node.add_argument('--host', default='0.0.0.0')
+    node.add_argument('--port', type=int, default=DEFAULT_PORT)
+    node.add_argument('--media-dir', type=Path, help="where the node keeps manim's output and cache")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        serve(args.host, args.port, args.media_dir)
+    except KeyboardInterrupt:
+        pass
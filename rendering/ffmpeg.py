@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+
+class FFmpegError(RuntimeError):
+    pass
+
+
+def ffmpeg_binary():
+    binary = shutil.which('ffmpeg')
+    if binary is None:
+        raise FFmpegError("ffmpeg was not found on PATH")
+    return binary
+
+
+def ffprobe_binary():
+    # Usually installed next to ffmpeg
+    binary = shutil.which('ffprobe') or shutil.which('ffprobe', path=str(Path(ffmpeg_binary()).parent))
+    if binary is None:
+        raise FFmpegError("ffprobe was not found on PATH")
+    return binary
+
+
+def probe_media(path):
+    # ffprobe's view of a file: its streams and its container format
+    result = subprocess.run(
+        [ffprobe_binary(), '-v', 'error', '-of', 'json', '-show_streams', '-show_format', str(path)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise FFmpegError(result.stderr.strip() or f"ffprobe exited with {result.returncode}")
+    return json.loads(result.stdout)
+
+
+def run_ffmpeg(args):
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-y', *args],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise FFmpegError(result.stderr.strip() or f"ffmpeg exited with {result.returncode}")
+
+
+def write_concat_list(paths, list_file):
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for path in paths:
+            # The concat demuxer wants single quotes escaped as '\''
+            escaped = Path(path).resolve().as_posix().replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+
+def concat_copy(inputs, output, extra_args=()):
+    # Lossless concatenation: every input must share codec parameters, which
+    # holds for segments written by the same manim encoder settings
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    fd, list_file = tempfile.mkstemp(suffix='.txt', dir=output.parent)
+    os.close(fd)
+    tmp_output = output.with_name(f".{output.stem}.tmp{output.suffix}")
+    try:
+        write_concat_list(inputs, list_file)
+        run_ffmpeg([
+            '-f', 'concat', '-safe', '0', '-i', list_file,
+            *extra_args,
+            '-c', 'copy', '-movflags', '+faststart',
+            str(tmp_output),
+        ])
+        tmp_output.replace(output)
+    finally:
+        os.unlink(list_file)
+        if tmp_output.exists():
+            tmp_output.unlink()
+    return output
@@ -0,0 +1,154 @@
+import ast
+import hashlib
+import json
+import threading
+from importlib import metadata
+from pathlib import Path
+
+from .paths import CONFIG_FILE, ROOT, STATE_DIR
+from .worker import OUTPUT_PLUGINS, output_spec
+
+MANIFEST_FILE = STATE_DIR / 'manifest.json'
+
+# Anything referenced by a string literal with one of these suffixes is
+# treated as an asset the scene reads at render time
+ASSET_SUFFIXES = {
+    '.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.svg',
+    '.wav', '.mp3', '.ogg', '.ttf', '.otf', '.tex', '.json', '.csv',
+}
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manim_version():
+    try:
+        return metadata.version('manim')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def _resolve_module(name, search_dirs):
+    # Only modules that live next to the scenes count as helpers; manim,
+    # numpy and the standard library are covered by the version string
+    parts = name.split('.')
+    for base in search_dirs:
+        candidate = base.joinpath(*parts)
+        if candidate.with_suffix('.py').is_file():
+            return [candidate.with_suffix('.py')]
+        if (candidate / '__init__.py').is_file():
+            return sorted(candidate.rglob('*.py'))
+    return []
+
+
+def _resolve_asset(value, source):
+    if Path(value).suffix.lower() not in ASSET_SUFFIXES:
+        return None
+    for base in (ROOT, source.parent):
+        candidate = base / value
+        if candidate.is_file():
+            return candidate.resolve()
+    return None
+
+
+def collect_inputs(file):
+    # Walk the scene file and every local module it imports, collecting the
+    # sources and the asset files they reference
+    file = Path(file).resolve()
+    search_dirs = [file.parent, ROOT]
+    sources, assets = set(), set()
+    pending = [file]
+
+    while pending:
+        source = pending.pop()
+        if source in sources:
+            continue
+        sources.add(source)
+        tree = ast.parse(source.read_text(encoding='utf-8'), filename=str(source))
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    pending.extend(_resolve_module(alias.name, search_dirs))
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.extend(_resolve_module(node.module, search_dirs))
+            elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+                asset = _resolve_asset(node.value, source)
+                if asset:
+                    assets.add(asset)
+
+    return sorted(sources), sorted(assets)
+
+
+def relative(path):
+    try:
+        return path.relative_to(ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def fingerprint_payload(job):
+    sources, assets = collect_inputs(job.file)
+    config = CONFIG_FILE.read_bytes() if CONFIG_FILE.exists() else b''
+    payload = {
+        'sources': {relative(p): hash_file(p) for p in sources},
+        'assets': {relative(p): hash_file(p) for p in assets},
+        'config': hash_bytes(config),
+        'args': job.render_args(),
+        'manim': manim_version(),
+    }
+    encoding = sorted(output_spec(spec) for spec in job.plugins if spec.partition('=')[0] in OUTPUT_PLUGINS)
+    if encoding:
+        payload['encoding'] = encoding
+    return payload
+
+
+def hash_payload(payload):
+    return hash_bytes(json.dumps(payload, sort_keys=True).encode())
+
+
+def fingerprint_job(job):
+    return hash_payload(fingerprint_payload(job))
+
+
+class Manifest:
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self.entries = json.loads(path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def is_fresh(self, key, fingerprint):
+        entry = self.entries.get(key)
+        if not entry or entry.get('fingerprint') != fingerprint:
+            return False
+        # A matching fingerprint is useless if the video was deleted since
+        return bool(entry.get('outputs')) and all((ROOT / p).is_file() for p in entry['outputs'])
+
+    def outputs(self, key):
+        return self.entries.get(key, {}).get('outputs', [])
+
+    def record(self, key, fingerprint, outputs):
+        with self._lock:
+            self.entries[key] = {
+                'fingerprint': fingerprint,
+                'outputs': [relative(Path(p).resolve()) for p in outputs],
+            }
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding='utf-8')
+        tmp.replace(self.path)
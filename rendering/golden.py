@@ -0,0 +1,320 @@
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .driver import load_scenes
+from .paths import ROOT, STATE_DIR
+from .pool import default_workers, log
+from .probe import describe_error
+
+# Reference frames, committed with the scenes: <module>/<Scene>/<sample>.png
+GOLDEN_DIR = ROOT / 'golden'
+# Which frames of a scene are compared, by module:Class; a scene not listed
+# is compared at the end of every animation. A sample is an animation index
+# (its last frame) or a time into the scene such as "12.5s".
+SAMPLES_FILE = GOLDEN_DIR / 'samples.json'
+# Frames of the last check and their diff images
+CHECK_DIR = STATE_DIR / 'golden'
+
+GOLDEN_WIDTH, GOLDEN_HEIGHT = 320, 180
+# A pixel differs when its colour, after a 3x3 blur that absorbs
+# antialiasing, is further than this from the golden one (CIE76 ΔE; about
+# 2.3 is the smallest difference people notice side by side)...
+PIXEL_DELTA_E = 8.0
+# ...and a frame differs when more than this share of its pixels do
+CHANGED_AREA = 0.002
+
+
+def sample_name(sample):
+    return f"a{sample:03}" if isinstance(sample, int) else f"t{float(sample[:-1]):07.2f}s"
+
+
+def parse_sample(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.endswith('s'):
+        float(value[:-1])
+        return value
+    raise ValueError(f"bad golden sample {value!r}; expected an animation index or seconds such as \"12.5s\"")
+
+
+def load_samples():
+    try:
+        samples = json.loads(SAMPLES_FILE.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return {}
+    return {key: [parse_sample(value) for value in values] for key, values in samples.items()}
+
+
+# Inside manim
+
+def frame_pixels(renderer, scene):
+    # The whole scene drawn now, ignoring the static frame manim keeps for
+    # the current play, as RGB
+    static, renderer.static_image = renderer.static_image, None
+    try:
+        renderer.update_frame(scene, ignore_skipping=True)
+    finally:
+        renderer.static_image = static
+    return np.array(renderer.camera.pixel_array[:, :, :3])
+
+
+def capture_scene(scene_class, samples, output):
+    # Runs construct() with every animation skipped, like a preflight, and
+    # draws only the sampled frames: the end of an animation once it has
+    # finished, a time by interpolating the animation running then
+    from PIL import Image
+
+    scene = scene_class(skip_animations=True)
+    renderer = scene.renderer
+    play, play_internal = renderer.play, scene.play_internal
+    ends = {sample for sample in samples if isinstance(sample, int)}
+    times = sorted((float(sample[:-1]), sample) for sample in samples if isinstance(sample, str))
+    captured = []
+
+    def save(sample):
+        path = output / f"{sample_name(sample)}.png"
+        Image.fromarray(frame_pixels(renderer, scene)).save(path)
+        captured.append(sample_name(sample))
+
+    def timed_play_internal(*args, **kwargs):
+        # renderer.time already counts this play when it is skipped
+        start = renderer.time - scene.duration
+        while times and times[0][0] < renderer.time:
+            at, sample = times.pop(0)
+            scene.update_to_time(max(at - start, 0))
+            save(sample)
+        return play_internal(*args, **kwargs)
+
+    def sampled_play(scene, *args, **kwargs):
+        index = renderer.num_plays
+        play(scene, *args, **kwargs)
+        # A wait with nothing moving never reaches play_internal; the scene
+        # looked the same all through it
+        while times and times[0][0] < renderer.time:
+            save(times.pop(0)[1])
+        if index in ends or not samples:
+            save(index)
+
+    renderer.play = sampled_play
+    scene.play_internal = timed_play_internal
+    error = None
+    try:
+        scene.render()
+    except Exception as e:
+        error = describe_error(e)
+    return {'scene': scene_class.__name__, 'frames': captured, 'error': error}
+
+
+def capture(file, scenes, samples, output):
+    from manim import tempconfig
+
+    file = Path(file).resolve()
+    options = {
+        'input_file': str(file),
+        'pixel_width': GOLDEN_WIDTH,
+        'pixel_height': GOLDEN_HEIGHT,
+        'frame_rate': 15,
+        'dry_run': True,
+        'verbosity': 'ERROR',
+        'progress_bar': 'none',
+    }
+    with tempconfig(options):
+        report = {'file': str(file), 'scenes': [], 'error': None}
+        try:
+            scene_classes = load_scenes(file)
+        except Exception as e:
+            report['error'] = describe_error(e)
+            return report
+        for cls in scene_classes:
+            if scenes and cls.__name__ not in scenes:
+                continue
+            directory = output / file.stem / cls.__name__
+            directory.mkdir(parents=True, exist_ok=True)
+            report['scenes'].append(capture_scene(cls, samples.get(f"{file.stem}:{cls.__name__}", []), directory))
+    return report
+
+
+# Comparing
+
+def lab(pixels):
+    # sRGB (uint8) to CIE Lab under D65
+    rgb = pixels.astype(np.float32) / 255
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([
+        [0.4124, 0.3576, 0.1805],
+        [0.2126, 0.7152, 0.0722],
+        [0.0193, 0.1192, 0.9505],
+    ], dtype=np.float32).T / np.array([0.9505, 1.0, 1.089], dtype=np.float32)
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def blur(image):
+    padded = np.pad(image, ((1, 1), (1, 1), (0, 0)), mode='edge')
+    height, width = image.shape[:2]
+    return sum(padded[y:y + height, x:x + width] for y in range(3) for x in range(3)) / 9
+
+
+def difference(golden, actual):
+    # Per pixel ΔE between the two frames
+    return np.linalg.norm(lab(blur(golden.astype(np.float32))) - lab(blur(actual.astype(np.float32))), axis=-1)
+
+
+def diff_image(golden, actual, delta, path):
+    # Golden, new frame, and the new frame dimmed with what changed in red
+    from PIL import Image
+
+    heat = (actual.astype(np.float32) * 0.3).astype(np.uint8)
+    changed = delta > PIXEL_DELTA_E
+    heat[changed] = [255, 0, 0]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(np.concatenate([golden, actual, heat], axis=1)).save(path)
+
+
+def compare(golden_path, actual_path, diff_path):
+    # None when the frames match, otherwise what is wrong
+    from PIL import Image
+
+    if not golden_path.exists():
+        return "no golden frame"
+    with Image.open(golden_path) as image:
+        golden = np.asarray(image.convert('RGB'))
+    with Image.open(actual_path) as image:
+        actual = np.asarray(image.convert('RGB'))
+    if golden.shape != actual.shape:
+        return f"size {actual.shape[1]}x{actual.shape[0]}, golden is {golden.shape[1]}x{golden.shape[0]}"
+    delta = difference(golden, actual)
+    area = float((delta > PIXEL_DELTA_E).mean())
+    if area <= CHANGED_AREA:
+        return None
+    diff_image(golden, actual, delta, diff_path)
+    return f"{area:.2%} of the frame changed (max ΔE {delta.max():.0f}), see {diff_path.relative_to(ROOT)}"
+
+
+def capture_file(file, scenes, output):
+    # In a fresh interpreter, like a probe
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = Path(tmp) / 'golden.json'
+        result = subprocess.run(
+            [sys.executable, '-m', 'rendering.golden', 'capture', str(file), *scenes,
+             '--output', str(output), '--json', str(report_path)],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            cwd=ROOT,
+        )
+        if not report_path.exists():
+            lines = result.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"capture exited with {result.returncode}")
+        return json.loads(report_path.read_text(encoding='utf-8'))
+
+
+def check_golden(jobs, workers=None, update=False):
+    # Draws the sampled frames of every job's scenes and compares them with
+    # the goldens, or replaces the goldens with them. Returns whether all match.
+    start = time.monotonic()
+    actual_dir = CHECK_DIR / 'actual'
+    diff_dir = CHECK_DIR / 'diff'
+    for directory in (actual_dir, diff_dir):
+        shutil.rmtree(directory, ignore_errors=True)
+    files = {}
+    for job in jobs:
+        files.setdefault(job.file, []).append(job.scene)
+
+    def run(item):
+        file, scenes = item
+        try:
+            return capture_file(file, [scene for scene in scenes if scene], actual_dir)
+        except Exception as e:
+            return {'file': str(file), 'scenes': [], 'error': str(e)}
+
+    log(f"Golden frames: drawing {'and storing ' if update else ''}samples of {len(jobs)} scenes "
+        f"at {GOLDEN_WIDTH}x{GOLDEN_HEIGHT}...")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or default_workers(), len(files)))) as executor:
+        reports = list(executor.map(run, files.items()))
+
+    failed = compared = 0
+    for report in reports:
+        module = Path(report['file']).stem
+        if report['error']:
+            failed += 1
+            log(f"  ✗ {module}: {report['error']}")
+            continue
+        for scene in report['scenes']:
+            relative = Path(module) / scene['scene']
+            if scene['error']:
+                failed += 1
+                log(f"  ✗ {module}:{scene['scene']} failed after {len(scene['frames'])} samples: {scene['error']}")
+                continue
+            if update:
+                golden = GOLDEN_DIR / relative
+                shutil.rmtree(golden, ignore_errors=True)
+                shutil.copytree(actual_dir / relative, golden)
+                log(f"  ✓ {module}:{scene['scene']}: stored {len(scene['frames'])} golden frames")
+                continue
+            problems = []
+            for name in scene['frames']:
+                compared += 1
+                problem = compare(
+                    GOLDEN_DIR / relative / f"{name}.png",
+                    actual_dir / relative / f"{name}.png",
+                    diff_dir / relative / f"{name}.png",
+                )
+                if problem:
+                    problems.append(f"{name}: {problem}")
+            stale = {path.stem for path in (GOLDEN_DIR / relative).glob('*.png')} - set(scene['frames'])
+            problems += [f"{name}: golden frame no longer sampled" for name in sorted(stale)]
+            if problems:
+                failed += 1
+                log(f"  ✗ {module}:{scene['scene']}")
+                for problem in problems:
+                    log(f"      {problem}")
+            else:
+                log(f"  ✓ {module}:{scene['scene']}: {len(scene['frames'])} frames match")
+
+    seconds = time.monotonic() - start
+    if update:
+        log(f"Golden frames: stored in {GOLDEN_DIR.relative_to(ROOT)} in {seconds:.1f}s"
+            + (f", {failed} scenes failed" if failed else ''))
+    else:
+        log(f"Golden frames: {compared} compared, {failed} scenes differ or failed, {seconds:.1f}s"
+            + ("; if the change is intended, run with --update-golden" if failed else ''))
+    return not failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare sampled frames of the scenes with golden frames.")
+    commands = parser.add_subparsers(dest='command')
+    capture_parser = commands.add_parser('capture', help="draw the sampled frames of one file (used by check)")
+    capture_parser.add_argument('file', type=Path)
+    capture_parser.add_argument('scenes', nargs='*')
+    capture_parser.add_argument('--output', type=Path, required=True)
+    capture_parser.add_argument('--json', type=Path, required=True)
+    for name, help in (('check', "compare with the golden frames"), ('update', "store new golden frames")):
+        command = commands.add_parser(name, help=help)
+        command.add_argument('-j', '--jobs', type=int, default=default_workers())
+        command.add_argument('--scene', action='append', default=[], metavar='PATTERN')
+        command.add_argument('--exclude', action='append', default=[], metavar='PATTERN')
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'capture':
+        report = capture(args.file, args.scenes, load_samples(), args.output)
+        args.json.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        sys.exit(0)
+    from .discovery import discover, scene_jobs
+
+    jobs = scene_jobs(discover(include=args.scene, exclude=args.exclude))
+    sys.exit(0 if check_golden(jobs, args.jobs, update=args.command == 'update') else 1)
@@ -0,0 +1,381 @@
+import argparse
+import functools
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .driver import scene_caller
+from .layers import bounds
+from .profiler import peak_rss_mb
+
+# Plays a mobject may stay drawn after its last animation before it is
+# listed as idle
+IDLE_PLAYS = 3
+# Flags that --growth-prune removes from the scene; the others only report
+PRUNED = ('transparent', 'offscreen')
+SPARKS = ' ▁▂▃▄▅▆▇█'
+CHART_WIDTH = 48
+TOP_FLAGS = 12
+
+
+def rss_mb():
+    # Resident memory now; the peak where /proc is not available
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / (1 << 20), 1)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def drawn_members(mobject):
+    # The family members the camera draws: the ones with points
+    return [m for m in mobject.get_family() if len(m.points)]
+
+
+def array_bytes(mobject):
+    total = 0
+    for attr in ('points', 'fill_rgbas', 'stroke_rgbas', 'background_stroke_rgbas', 'rgbas', 'pixel_array'):
+        value = getattr(mobject, attr, None)
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+    return total
+
+
+def invisible(mobject):
+    pixels = getattr(mobject, 'pixel_array', None)
+    if isinstance(pixels, np.ndarray):
+        return pixels.ndim == 3 and pixels.shape[2] == 4 and not pixels[:, :, 3].any()
+    if not hasattr(mobject, 'fill_rgbas'):
+        # Point clouds and the like; not worth guessing
+        return False
+    for colors, width in (
+        (mobject.fill_rgbas, 1),
+        (mobject.stroke_rgbas, mobject.stroke_width),
+        (getattr(mobject, 'background_stroke_rgbas', None), getattr(mobject, 'background_stroke_width', 0)),
+    ):
+        if width and isinstance(colors, np.ndarray) and colors[:, 3].any():
+            return False
+    return True
+
+
+def frame_rect(camera):
+    x, y = camera.frame_center[:2]
+    w, h = camera.frame_width / 2, camera.frame_height / 2
+    return (x - w, y - h, x + w, y + h)
+
+
+def outside(members, rect):
+    for member in members:
+        box = bounds(member, 0)
+        if box[0] <= rect[2] and rect[0] <= box[2] and box[1] <= rect[3] and rect[1] <= box[3]:
+            return False
+    return True
+
+
+def appearance(mobject):
+    # Two members with the same key paint the same pixels. Arrays are
+    # compared by content, however large, like layers.signature: two images
+    # with the same pixels are copies whichever arrays hold them.
+    parts = [mobject.points.tobytes()]
+    for attr in ('fill_rgbas', 'stroke_rgbas', 'pixel_array'):
+        value = getattr(mobject, attr, None)
+        if isinstance(value, np.ndarray):
+            parts.append((value.shape, value.dtype.str, value.tobytes()))
+    parts.append(repr(getattr(mobject, 'stroke_width', None)))
+    return hash(tuple(parts))
+
+
+def describe(mobject):
+    x, y = mobject.get_center()[:2]
+    return f"{mobject.name} at ({x:.1f}, {y:.1f})"
+
+
+def has_updaters(mobject):
+    return any(m.updaters for m in mobject.get_family())
+
+
+class GrowthTracker:
+    # Worker plugin sampling the scene after every play() and wait(): how
+    # many mobjects it holds, their points and memory, and what a frame
+    # costs to rasterize. Mobjects that are still drawn but cannot be seen
+    # (fully transparent, outside the frame), that are drawn exactly over
+    # another one (what Transform leaves behind where ReplacementTransform
+    # was meant), or that stay drawn long after their last animation are
+    # flagged.
+    prune = False
+
+    def __init__(self, output):
+        self.output = Path(output) if output else None
+        self.scenes = []
+        self.raster = 0.0
+        self.frames = 0
+        self.drawn = {}
+        # Pruned mobject id -> (mobject, ids of the mobjects drawn below it)
+        self.pruned = {}
+
+    def install(self):
+        from manim import Scene
+        from manim.renderer.cairo_renderer import CairoRenderer
+
+        tracker = self
+        render, play = Scene.render, CairoRenderer.play
+        add_from_animations = Scene.add_mobjects_from_animations
+        update_frame, add_frame = CairoRenderer.update_frame, CairoRenderer.add_frame
+
+        @functools.wraps(render)
+        def render_scene(scene, *args, **kwargs):
+            tracker.scenes.append({'scene': type(scene).__name__, 'plays': [], 'flags': {}})
+            tracker.drawn = {}
+            tracker.pruned = {}
+            try:
+                return render(scene, *args, **kwargs)
+            finally:
+                tracker.flag_idle()
+
+        @functools.wraps(play)
+        def tracked_play(renderer, scene, *args, **kwargs):
+            tracker.raster = 0.0
+            tracker.frames = 0
+            play(renderer, scene, *args, **kwargs)
+            tracker.sample(renderer, scene)
+
+        @functools.wraps(add_from_animations)
+        def restoring_add(scene, animations):
+            # manim adds an animated mobject that is not in the scene on top
+            # of the others. A pruned one goes back where it was drawn
+            # instead, so pruning leaves the layering as it was.
+            if tracker.pruned:
+                for animation in animations:
+                    if animation.mobject is not None and not animation.is_introducer():
+                        tracker.restore(scene, animation.mobject)
+            return add_from_animations(scene, animations)
+
+        @functools.wraps(update_frame)
+        def timed_update_frame(renderer, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return update_frame(renderer, *args, **kwargs)
+            finally:
+                tracker.raster += time.perf_counter() - start
+
+        @functools.wraps(add_frame)
+        def count_frames(renderer, frame, num_frames=1):
+            if not renderer.skip_animations:
+                tracker.frames += num_frames
+            return add_frame(renderer, frame, num_frames)
+
+        Scene.render = render_scene
+        Scene.add_mobjects_from_animations = restoring_add
+        CairoRenderer.play = tracked_play
+        CairoRenderer.update_frame = timed_update_frame
+        CairoRenderer.add_frame = count_frames
+
+    def sample(self, renderer, scene):
+        from manim import config
+
+        index = renderer.num_plays - 1
+        record = self.scenes[-1]
+        animated = set()
+        for animation in getattr(scene, 'animations', None) or []:
+            animated.update(id(m) for m in animation.mobject.get_family())
+
+        leaves = {id(m): m for m in scene.get_mobject_family_members() if len(m.points)}
+        record['plays'].append({
+            'index': index,
+            'method': scene_caller(config.input_file),
+            'mobjects': len(scene.mobjects),
+            'drawn': len(leaves),
+            'points': sum(len(m.points) for m in leaves.values()),
+            'bytes': sum(array_bytes(m) for m in leaves.values()),
+            'rss_mb': rss_mb(),
+            'frames': self.frames,
+            'raster_ms': round(self.raster / self.frames * 1000, 3) if self.frames else None,
+        })
+
+        rect = frame_rect(renderer.camera)
+        seen = {}
+        flagged = []
+        for top in scene.mobjects:
+            members = drawn_members(top)
+            if not members:
+                continue
+            # Holding on to the mobject for the rest of the scene keeps its id
+            # from being reused by another one
+            entry = self.drawn.setdefault(id(top), {'mobject': top, 'last_animated': index, 'idle_frames': 0})
+            if has_updaters(top) or any(id(m) in animated for m in top.get_family()):
+                entry['last_animated'] = index
+                entry['idle_frames'] = 0
+            else:
+                entry['idle_frames'] += self.frames
+            entry['last_drawn'] = index
+            if all(invisible(m) for m in members):
+                flagged.append((top, 'transparent', "fully transparent"))
+            elif outside(members, rect):
+                flagged.append((top, 'offscreen', "outside the frame"))
+            else:
+                copies = set()
+                for member in members:
+                    if invisible(member):
+                        continue
+                    key = appearance(member)
+                    if key in seen and seen[key] is not top:
+                        copies.add(seen[key])
+                    seen.setdefault(key, top)
+                if copies:
+                    names = ', '.join(sorted({describe(c) for c in copies}))
+                    flagged.append((top, 'duplicate', f"drawn exactly over {names}"))
+
+        for top, kind, detail in flagged:
+            key = f"{id(top)}:{kind}"
+            flag = record['flags'].setdefault(key, {
+                'kind': kind,
+                'mobject': describe(top),
+                'detail': detail,
+                'first_play': index,
+                'method': record['plays'][-1]['method'],
+                'plays': 0,
+                'frames': 0,
+                'pruned': False,
+            })
+            flag['last_play'] = index
+            flag['plays'] += 1
+            flag['frames'] += self.frames
+            if self.prune and kind in PRUNED and not has_updaters(top):
+                # An animation that uses it again puts it back (restore)
+                position = scene.mobjects.index(top)
+                self.pruned[id(top)] = (top, {id(m) for m in scene.mobjects[:position]})
+                scene.remove(top)
+                flag['pruned'] = True
+
+    def restore(self, scene, mobject):
+        # Puts the pruned mobject holding this one back into the scene, just
+        # above the highest of the mobjects that were drawn below it. One
+        # that was added again since (scene.add puts it on top, pruned or
+        # not) is only forgotten.
+        for key, (top, below) in list(self.pruned.items()):
+            if mobject not in top.get_family():
+                continue
+            del self.pruned[key]
+            if top in scene.mobjects:
+                continue
+            position = max((i + 1 for i, m in enumerate(scene.mobjects) if id(m) in below), default=0)
+            scene.mobjects.insert(position, top)
+
+    def flag_idle(self):
+        # Once the scene is over it is known which mobjects were never
+        # animated again: the ones drawn for IDLE_PLAYS plays or more after
+        # their last animation
+        record = self.scenes[-1]
+        methods = {play['index']: play['method'] for play in record['plays']}
+        for entry in self.drawn.values():
+            last, idle = entry['last_animated'], entry['last_drawn'] - entry['last_animated']
+            if idle < IDLE_PLAYS:
+                continue
+            top = entry['mobject']
+            record['flags'][f"{id(top)}:idle"] = {
+                'kind': 'idle',
+                'mobject': describe(top),
+                'detail': f"never animated again after play {last}",
+                'first_play': last + 1,
+                'method': methods.get(last + 1),
+                'plays': idle,
+                'frames': entry['idle_frames'],
+                'pruned': False,
+                'last_play': entry['last_drawn'],
+            }
+        self.drawn = {}
+
+    def finish(self):
+        if not self.output:
+            return
+        from manim import config
+
+        scenes = [{**scene, 'flags': list(scene['flags'].values())} for scene in self.scenes]
+        report = {'file': str(config.input_file), 'prune': self.prune, 'scenes': scenes}
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self.output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+
+class PruningGrowthTracker(GrowthTracker):
+    # Also removes the transparent and off-screen mobjects it finds, unless
+    # an updater could bring them back, and puts one back in its old place
+    # in the layering when an animation uses it again
+    prune = True
+
+
+def sparkline(values, width=CHART_WIDTH):
+    values = [v for v in values if v is not None]
+    if not values:
+        return ''
+    if len(values) > width:
+        # Each column is the largest sample it covers
+        step = len(values) / width
+        values = [max(values[int(i * step):int((i + 1) * step)] or [0]) for i in range(width)]
+    low, high = min(values), max(values)
+    scale = (len(SPARKS) - 2) / (high - low) if high > low else 0
+    return ''.join(SPARKS[1 + round((v - low) * scale)] for v in values)
+
+
+def compact_number(value):
+    for unit, size in (('M', 1e6), ('k', 1e3)):
+        if value >= size:
+            return f"{value / size:.1f}{unit}"
+    return str(value)
+
+
+def compact_bytes(value):
+    return f"{value / (1 << 20):.1f}MB" if value >= 1 << 20 else f"{value / 1024:.0f}kB"
+
+
+def trend(plays, key, format=str):
+    values = [play[key] for play in plays if play[key] is not None]
+    if not values:
+        return '-'
+    return f"{format(values[0])} → {format(values[-1])}"
+
+
+def print_growth_report(paths):
+    for path in paths:
+        try:
+            report = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            continue
+        for scene in report['scenes']:
+            plays = scene['plays']
+            if not plays:
+                continue
+            rows = [
+                ('drawn', trend(plays, 'drawn'), sparkline([p['drawn'] for p in plays])),
+                ('points', trend(plays, 'points', compact_number), sparkline([p['points'] for p in plays])),
+                ('memory', trend(plays, 'bytes', compact_bytes),
+                 sparkline([p['bytes'] for p in plays])),
+                ('ms/frame', trend(plays, 'raster_ms', lambda ms: f"{ms:.1f}"),
+                 sparkline([p['raster_ms'] for p in plays])),
+            ]
+            width = max(len(row[1]) for row in rows)
+            print(f"\n{scene['scene']} ({len(plays)} plays)")
+            for name, change, chart in rows:
+                print(f"  {name:<9} {change:<{width}}  {chart}")
+            flags = sorted(scene['flags'], key=lambda flag: (flag['kind'] == 'idle', -flag['frames']))
+            for flag in flags[:TOP_FLAGS]:
+                pruned = ', pruned' if flag['pruned'] else ''
+                where = f"{flag['method']}, play {flag['first_play']}" if flag['method'] else f"play {flag['first_play']}"
+                print(f"  {flag['kind']:<11} {flag['mobject']} ({where}): "
+                      f"{flag['detail']}, drawn for {flag['frames']} frames{pruned}")
+            if len(flags) > TOP_FLAGS:
+                print(f"  ... {len(flags) - TOP_FLAGS} more in {path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Show how the scenes' mobjects grow over their animations.")
+    parser.add_argument('reports', nargs='+', type=Path)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print_growth_report(args.reports)
@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .paths import VIDEO_DIR
+from .worker import plugin_command
+
+# manim names the output folder after the pixel height and frame rate
+QUALITY_DIRS = {
+    'l': '480p15',
+    'm': '720p30',
+    'h': '1080p60',
+    'p': '1440p60',
+    'k': '2160p60',
+}
+
+
+@dataclass
+class RenderJob:
+    file: Path
+    quality: str = 'h'
+    # Scene class to render; None renders every scene of the file
+    scene: str = None
+    extra_args: list = field(default_factory=list)
+    # Per-run settings that do not change what the scene looks like
+    run_args: list = field(default_factory=list)
+    env: dict = field(default_factory=dict)
+    # Worker plugins (name=arg); when set manim runs inside rendering.worker
+    plugins: list = field(default_factory=list)
+    # Called before manim starts, e.g. to pre-render part of the scene
+    prepare: object = None
+    # Called with the JobResult after a successful render
+    finalize: object = None
+
+    @property
+    def name(self):
+        return f"{self.file.stem}:{self.scene}" if self.scene else self.file.name
+
+    @property
+    def slug(self):
+        # The name, usable as a file name
+        return f"{self.file.stem}.{self.scene}" if self.scene else self.file.stem
+
+    @property
+    def output_dir(self):
+        return VIDEO_DIR / self.file.stem / QUALITY_DIRS[self.quality]
+
+    def render_args(self):
+        return [f'-q{self.quality}', *self.extra_args]
+
+    def manim_args(self):
+        scenes = [self.scene] if self.scene else []
+        return [str(self.file), *scenes, *self.render_args(), *self.run_args]
+
+    def command(self):
+        args = self.manim_args()
+        if self.plugins:
+            return plugin_command(self.plugins, args)
+        return ['manim', *args]
+
+    def snapshot_outputs(self):
+        # manim writes media/videos/<module>/<resolution>/<Scene>.mp4; the
+        # partial movie cache lives one level deeper and is not an output
+        module_dir = VIDEO_DIR / self.file.stem
+        pattern = f"*/{self.scene}.mp4" if self.scene else '*/*.mp4'
+        return {path: path.stat().st_mtime_ns for path in module_dir.glob(pattern)}
+
+    def find_outputs(self, before):
+        return sorted(
+            path for path, mtime in self.snapshot_outputs().items()
+            if before.get(path) != mtime
+        )
+
+
+@dataclass
+class JobResult:
+    job: RenderJob
+    returncode: int
+    duration: float
+    stderr: str = ''
+    outputs: list = field(default_factory=list)
+    skipped: bool = False
+
+    @property
+    def ok(self):
+        return self.returncode == 0
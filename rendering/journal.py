@@ -0,0 +1,194 @@
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from .fingerprint import hash_file, relative
+from .paths import ROOT, STATE_DIR
+
+JOURNAL_DIR = STATE_DIR / 'journal'
+BATCH_FILE = JOURNAL_DIR / 'batch.json'
+
+
+def animation_journal(job):
+    # One file per job, appended to by the render as animations finish
+    return JOURNAL_DIR / f"{job.slug}.jsonl"
+
+
+def partial_dir(job):
+    return job.output_dir / 'partial_movie_files' / job.scene
+
+
+def append_entry(path, entry):
+    # One line per entry, on disk before the next animation starts
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_entries(path):
+    entries = []
+    try:
+        lines = path.read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        return entries
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            # The line being written when the process died
+            continue
+    return entries
+
+
+def record_partial(journal, path, animation):
+    path = Path(path)
+    append_entry(journal, {
+        'animation': animation,
+        'path': relative(path.resolve()),
+        'sha256': hash_file(path),
+        'size': path.stat().st_size,
+    })
+
+
+class AnimationJournal:
+    # Worker plugin journaling every partial movie file once manim has
+    # closed it, i.e. once it is complete. A file of a killed render is
+    # never in the journal, however far it got.
+    def __init__(self, output):
+        self.output = Path(output)
+
+    def install(self):
+        from manim.scene.scene_file_writer import SceneFileWriter
+
+        plugin = self
+        close = SceneFileWriter.close_partial_movie_stream
+        # An empty journal still tells --resume the scene started and that
+        # none of its partial movies are complete
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self.output.touch()
+
+        @functools.wraps(close)
+        def close_partial_movie_stream(writer, *args, **kwargs):
+            close(writer, *args, **kwargs)
+            record_partial(plugin.output, writer.partial_movie_file_path, writer.renderer.num_plays)
+
+        SceneFileWriter.close_partial_movie_stream = close_partial_movie_stream
+
+    def finish(self):
+        pass
+
+
+def verify_partials(job):
+    # Keeps the partial movies the journal vouches for and deletes the rest,
+    # which manim would otherwise reuse however incomplete they are. A scene
+    # the batch never started has no journal, and its partial movies are
+    # left as they are. Returns the animation indices kept and the number
+    # of files deleted.
+    journal = animation_journal(job)
+    if not journal.exists():
+        return [], 0
+    trusted = {}
+    for entry in read_entries(journal):
+        path = ROOT / entry['path']
+        if path.is_file() and path.stat().st_size == entry['size'] and hash_file(path) == entry['sha256']:
+            trusted[path.resolve()] = entry
+    removed = 0
+    directory = partial_dir(job)
+    for path in directory.glob('*.mp4') if directory.is_dir() else ():
+        if path.resolve() not in trusted:
+            path.unlink()
+            removed += 1
+    # Entries of deleted files go, so the journal does not grow forever
+    tmp = journal.with_suffix('.tmp')
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    tmp.write_text(''.join(json.dumps(entry) + '\n' for entry in trusted.values()), encoding='utf-8')
+    tmp.replace(journal)
+    kept = sorted({entry['animation'] for entry in trusted.values() if entry['animation'] is not None})
+    return kept, removed
+
+
+def first_missing(indices):
+    index = 0
+    for value in indices:
+        if value != index:
+            break
+        index += 1
+    return index
+
+
+class BatchJournal:
+    # What the current batch set out to render and which jobs it finished,
+    # with their outputs' checksums, so --resume can pick up where it died
+    def __init__(self, path=BATCH_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.batch = None
+
+    def start(self, jobs, settings, animations=False):
+        # animations: whether the renders journal their animations too. The
+        # animation journals of the last batch go, so a scene this one never
+        # starts keeps its partial movies on --resume.
+        for job in jobs:
+            animation_journal(job).unlink(missing_ok=True)
+        self.batch = {
+            'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'settings': settings,
+            'animations': animations,
+            'jobs': [job.name for job in jobs],
+            'done': {},
+        }
+        self.save()
+
+    def last(self, settings):
+        # The last batch if it ran with these settings and journaled its
+        # animations. Without that journal no partial movie can be told from
+        # a complete one, so resuming would have to delete them all.
+        try:
+            batch = json.loads(self.path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return None
+        if batch['settings'] != settings or not batch.get('animations'):
+            return None
+        return batch
+
+    def resume(self, jobs, settings):
+        # Returns False, and starts a new batch, if there is nothing to resume
+        batch = self.last(settings)
+        if batch is None:
+            self.start(jobs, settings, animations=True)
+            return False
+        self.batch = batch
+        return True
+
+    def completed(self, job):
+        # Finished in this batch, with the outputs still as they were written
+        entry = self.batch['done'].get(job.name)
+        if not entry:
+            return False
+        return all(
+            (ROOT / output['path']).is_file() and hash_file(ROOT / output['path']) == output['sha256']
+            for output in entry['outputs']
+        )
+
+    def outputs(self, job):
+        return [output['path'] for output in self.batch['done'][job.name]['outputs']]
+
+    def record(self, result):
+        outputs = [
+            {'path': relative(Path(path).resolve()), 'sha256': hash_file(path)}
+            for path in result.outputs
+        ]
+        with self._lock:
+            self.batch['done'][result.job.name] = {'outputs': outputs, 'seconds': round(result.duration, 1)}
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.batch, indent=2, sort_keys=True), encoding='utf-8')
+        tmp.replace(self.path)
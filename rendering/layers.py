@@ -0,0 +1,231 @@
+import functools
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .pool import log
+
+# Extra margin around a mobject's points, in pixels, for antialiasing
+EDGE_PIXELS = 2
+# Stroke joins can reach this many line widths past the path (cairo's
+# default miter limit is 10, i.e. 5 widths on either side)
+MITER_WIDTHS = 5
+# Above this many rectangles, overlap tests use their union instead
+MAX_RECTS = 32
+# Everything besides points and colors that changes how the camera draws a
+# mobject
+STYLE_ATTRS = (
+    'z_index',
+    'fill_opacity',
+    'stroke_opacity',
+    'background_stroke_opacity',
+    'stroke_width',
+    'background_stroke_width',
+    'sheen_factor',
+    'sheen_direction',
+    'joint_type',
+    'cap_style',
+    'resampling_algorithm',
+)
+
+
+def bounds(mobject, pad):
+    # (xmin, ymin, xmax, ymax) in scene units, covering every pixel the
+    # mobject can paint; a Bézier curve stays inside its control points
+    points = mobject.points
+    if not len(points):
+        return None
+    widths = [getattr(mobject, 'stroke_width', 0) or 0, getattr(mobject, 'background_stroke_width', 0) or 0]
+    margin = pad + max(widths) * 0.01 * MITER_WIDTHS
+    low = points[:, :2].min(axis=0) - margin
+    high = points[:, :2].max(axis=0) + margin
+    return (low[0], low[1], high[0], high[1])
+
+
+def overlaps(rect, rects):
+    return any(
+        rect[0] <= other[2] and other[0] <= rect[2] and rect[1] <= other[3] and other[1] <= rect[3]
+        for other in rects
+    )
+
+
+def union(rects):
+    return (min(r[0] for r in rects), min(r[1] for r in rects), max(r[2] for r in rects), max(r[3] for r in rects))
+
+
+def compact(rects):
+    return [union(rects)] if len(rects) > MAX_RECTS else rects
+
+
+def signature(mobject):
+    # Changes when anything the camera draws of the mobject changes. Arrays
+    # are hashed by content, however large: set_opacity and pixel edits
+    # change an image's pixel_array in place.
+    parts = [mobject.points.tobytes()]
+    for attr in ('fill_rgbas', 'stroke_rgbas', 'background_stroke_rgbas', 'pixel_array'):
+        value = getattr(mobject, attr, None)
+        if isinstance(value, np.ndarray):
+            parts.append((value.shape, value.dtype.str, value.tobytes()))
+    for attr in STYLE_ATTRS:
+        parts.append(repr(getattr(mobject, attr, None)))
+    return hash(tuple(parts))
+
+
+class PlayLayers:
+    # Cache of one play(): manim's own background (the static mobjects
+    # below the first moving one) plus every static mobject drawn above a
+    # moving one that does not overlap anything drawn after it
+    def __init__(self, index, background):
+        self.index = index
+        self.background = background
+        self.key = None
+        self.image = None
+        self.signatures = {}
+        # Statics that changed during the play; they are redrawn from then on
+        self.changed = set()
+
+
+class LayeredRendering:
+    # Worker plugin for the Cairo renderer. manim already paints the static
+    # mobjects below the first moving one once per play, but everything
+    # after it in drawing order is redrawn every frame, moving or not. This
+    # caches the static ones among those too, whenever the order they are
+    # drawn in cannot matter: a static mobject is cached only if no moving
+    # mobject and no redrawn mobject before it can touch the same pixels.
+    # The frame is then the cache with the rest drawn on top, in order,
+    # which paints every pixel exactly as the normal path does.
+    # With "verify", every frame is also rendered normally, compared and
+    # the normal one written, so a mismatch is reported but never shipped.
+    def __init__(self, arg):
+        options = set((arg or '').split(','))
+        self.verify = 'verify' in options
+        outputs = [o for o in options if o and o != 'verify']
+        self.output = Path(outputs[0]) if outputs else None
+        self.stats = {'frames': 0, 'layered': 0, 'rebuilds': 0, 'cached': 0, 'redrawn': 0, 'mismatches': 0}
+        self.play = None
+
+    def install(self):
+        from manim.camera.camera import Camera
+        from manim.renderer.cairo_renderer import CairoRenderer
+
+        plugin = self
+        render = CairoRenderer.render
+
+        @functools.wraps(render)
+        def layered_render(renderer, scene, time, moving_mobjects):
+            # A moving camera changes every pixel; the layers only hold for
+            # a fixed frame
+            if renderer.skip_animations or type(renderer.camera) is not Camera:
+                return render(renderer, scene, time, moving_mobjects)
+            frame = plugin.render_frame(renderer, scene, moving_mobjects)
+            if frame is None:
+                return render(renderer, scene, time, moving_mobjects)
+            if plugin.verify:
+                render(renderer, scene, time, moving_mobjects)
+                expected = renderer.get_frame()
+                if not np.array_equal(frame, expected):
+                    plugin.stats['mismatches'] += 1
+                    log(f"Layered frame differs at animation {renderer.num_plays}, t={time:.3f}")
+                return
+            renderer.add_frame(frame)
+
+        CairoRenderer.render = layered_render
+
+    def moving_ids(self, scene):
+        # Everything an animation, an updater or the foreground can change
+        ids = set()
+        for animation in scene.animations or []:
+            ids.update(id(m) for m in animation.mobject.get_family())
+        for mobject in [*scene.mobjects, *scene.foreground_mobjects]:
+            for member in mobject.get_family():
+                if member.updaters:
+                    ids.update(id(m) for m in member.get_family())
+        for mobject in scene.foreground_mobjects:
+            ids.update(id(m) for m in mobject.get_family())
+        return ids
+
+    def render_frame(self, renderer, scene, moving_mobjects):
+        camera = renderer.camera
+        if self.play is None or self.play.index != renderer.num_plays:
+            self.play = PlayLayers(renderer.num_plays, renderer.static_image)
+        play = self.play
+
+        display = camera.get_mobjects_to_display(moving_mobjects)
+        moving = self.moving_ids(scene)
+        if all(id(m) in moving for m in display):
+            # Nothing static above the moving mobjects; manim's path is optimal
+            return None
+
+        pad = EDGE_PIXELS * camera.frame_width / camera.pixel_width
+        dynamic_rects, redrawn_rects, cached = [], [], []
+        for mobject in display:
+            rect = bounds(mobject, pad)
+            if rect and (id(mobject) in moving or id(mobject) in play.changed):
+                dynamic_rects.append(rect)
+        dynamic_rects = compact(dynamic_rects)
+
+        for mobject in display:
+            if id(mobject) in moving or id(mobject) in play.changed:
+                continue
+            known = play.signatures.get(id(mobject))
+            current = signature(mobject)
+            if known is not None and known != current:
+                # Changed by something other than its own animation
+                play.changed.add(id(mobject))
+            else:
+                play.signatures[id(mobject)] = current
+            rect = bounds(mobject, pad)
+            if (
+                id(mobject) in play.changed
+                or rect is None
+                or overlaps(rect, dynamic_rects)
+                or overlaps(rect, compact(redrawn_rects))
+            ):
+                if rect:
+                    redrawn_rects.append(rect)
+                continue
+            cached.append(mobject)
+
+        key = frozenset(id(m) for m in cached)
+        redrawn = [m for m in display if id(m) not in key]
+        if play.key != key:
+            play.key = key
+            play.image = self.draw(renderer, scene, play.background, cached)
+            self.stats['rebuilds'] += 1
+
+        frame = self.draw(renderer, scene, play.image, redrawn)
+        self.stats['frames'] += 1
+        self.stats['layered'] += bool(cached)
+        self.stats['cached'] += len(cached)
+        self.stats['redrawn'] += len(redrawn)
+        return frame
+
+    def draw(self, renderer, scene, background, mobjects):
+        # update_frame paints mobjects over the renderer's static image; the
+        # display list is already flat and sorted, so it is used as is
+        saved = renderer.static_image
+        renderer.static_image = background
+        try:
+            if mobjects:
+                renderer.update_frame(scene, mobjects=mobjects, include_submobjects=False)
+            elif background is not None:
+                renderer.camera.set_frame_to_background(background)
+            else:
+                renderer.camera.reset()
+            return renderer.get_frame()
+        finally:
+            renderer.static_image = saved
+
+    def finish(self):
+        stats = dict(self.stats)
+        frames = stats['frames'] or 1
+        stats['cached_per_frame'] = round(stats['cached'] / frames, 1)
+        stats['redrawn_per_frame'] = round(stats['redrawn'] / frames, 1)
+        if self.output:
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            self.output.write_text(json.dumps(stats, indent=2), encoding='utf-8')
+        log(f"Layers: {stats['layered']} of {stats['frames']} frames drew on a cached layer "
+            f"({stats['cached_per_frame']} mobjects cached, {stats['redrawn_per_frame']} drawn per frame, "
+            f"{stats['rebuilds']} cache builds)"
+            + (f", {stats['mismatches']} frames differed from normal rendering" if self.verify else ''))
@@ -0,0 +1,12 @@
+from pathlib import Path
+
+# manim resolves media/ and asset paths against the working directory, so
+# every job runs from the repository root
+ROOT = Path(__file__).resolve().parent.parent
+ANIMATIONS_DIR = ROOT / 'animations'
+MEDIA_DIR = ROOT / 'media'
+VIDEO_DIR = MEDIA_DIR / 'videos'
+CONFIG_FILE = ROOT / 'manim.cfg'
+
+# Bookkeeping owned by the runner (manifests, caches, reports)
+STATE_DIR = MEDIA_DIR / '.render'
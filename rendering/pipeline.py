@@ -0,0 +1,377 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from .ffmpeg import run_ffmpeg
+from .pool import log
+from .worker import tag_partial_movies
+
+DEFAULT_DEPTH = 8
+
+# Codecs the partial movies and the finished movie can use (all fit in
+# manim's .mp4 files) and the pixel format each encodes from
+PIXEL_FORMATS = {
+    'libx264': 'yuv420p',
+    'libx264rgb': 'rgb24',
+    'libx265': 'yuv420p',
+}
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    codec: str = 'libx264'
+    preset: str = 'medium'
+    crf: int = 23
+
+    @property
+    def lossless(self):
+        return self.crf == 0
+
+    @property
+    def pix_fmt(self):
+        return PIXEL_FORMATS[self.codec]
+
+    def options(self):
+        return {'crf': str(self.crf), 'preset': self.preset}
+
+    def ffmpeg_args(self):
+        args = ['-c:v', self.codec, '-preset', self.preset, '-crf', str(self.crf), '-pix_fmt', self.pix_fmt]
+        return args + (['-tag:v', 'hvc1'] if self.codec == 'libx265' else [])
+
+    @property
+    def tag(self):
+        # Partial movie names carry the settings they were encoded with
+        return f"{self.codec}-{self.preset}-crf{self.crf}"
+
+    def __str__(self):
+        return f"{self.codec}:{self.preset}:{self.crf}"
+
+
+def parse_settings(value):
+    # CODEC[:PRESET[:CRF]], e.g. libx264rgb:ultrafast:0 or libx264:slow:18
+    codec, *rest = value.split(':')
+    if codec not in PIXEL_FORMATS or len(rest) > 2:
+        raise argparse.ArgumentTypeError(
+            f"bad encoder {value!r}; expected CODEC[:PRESET[:CRF]] with CODEC one of {', '.join(PIXEL_FORMATS)}"
+        )
+    defaults = EncoderSettings(codec)
+    try:
+        crf = int(rest[1]) if len(rest) > 1 else defaults.crf
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad CRF in {value!r}") from None
+    return EncoderSettings(codec, rest[0] if rest and rest[0] else defaults.preset, crf)
+
+
+@dataclass
+class PipelineOptions:
+    depth: int = DEFAULT_DEPTH
+    # Partial movies, one per animation
+    partial: EncoderSettings = EncoderSettings()
+    # The finished movie and its sections; None copies the partial movies'
+    # stream as manim does
+    movie: EncoderSettings = None
+    report: Path = None
+
+
+def parse_options(value):
+    # depth=N,partial=CODEC[:PRESET[:CRF]],movie=CODEC[:PRESET[:CRF]],report=PATH
+    options = PipelineOptions()
+    for item in filter(None, (value or '').split(',')):
+        key, _, setting = item.partition('=')
+        if key == 'depth' and setting.isdigit() and int(setting) >= 2:
+            options.depth = int(setting)
+        elif key in ('partial', 'movie'):
+            setattr(options, key, parse_settings(setting))
+        elif key == 'report' and setting:
+            options.report = Path(setting)
+        else:
+            raise argparse.ArgumentTypeError(
+                f"bad pipeline option {item!r}; expected depth=N (at least 2), "
+                "partial=CODEC[:PRESET[:CRF]], movie=CODEC[:PRESET[:CRF]] or report=PATH"
+            )
+    if options.partial.lossless and options.movie is None:
+        # A lossless intermediate is never what should ship
+        options.movie = EncoderSettings()
+    return options
+
+
+# Encoder stage, in its own process
+
+def encoder_main(connection, memory_name, depth, shape, free_slots):
+    # Encodes frames straight out of the ring, in the order they were
+    # written, and frees each slot once its frame is encoded
+    import av
+
+    memory = shared_memory.SharedMemory(name=memory_name)
+    ring = np.ndarray((depth, *shape), dtype=np.uint8, buffer=memory.buf)
+    stats = {'frames': 0, 'encode_seconds': 0.0, 'idle_seconds': 0.0, 'files': 0}
+    container = stream = None
+    try:
+        while True:
+            start = time.perf_counter()
+            message = connection.recv()
+            stats['idle_seconds'] += time.perf_counter() - start
+            op = message[0]
+            start = time.perf_counter()
+            if op == 'frame':
+                _, slot, num_frames = message
+                for _ in range(num_frames):
+                    # A frame object cannot be encoded twice, see manim's
+                    # encode_and_write_frame
+                    frame = av.VideoFrame.from_ndarray(ring[slot], format='rgba')
+                    for packet in stream.encode(frame):
+                        container.mux(packet)
+                free_slots.release()
+                stats['frames'] += num_frames
+            elif op == 'open':
+                _, path, fps, settings = message
+                container = av.open(path, mode='w')
+                stream = container.add_stream(settings.codec, rate=fps, options=settings.options())
+                stream.pix_fmt = settings.pix_fmt
+                stream.width, stream.height = shape[1], shape[0]
+            elif op == 'close':
+                for packet in stream.encode():
+                    container.mux(packet)
+                container.close()
+                container = stream = None
+                stats['files'] += 1
+            elif op == 'stop':
+                break
+            stats['encode_seconds'] += time.perf_counter() - start
+            if op == 'close':
+                connection.send(dict(stats))
+    finally:
+        del ring
+        memory.close()
+    connection.send(dict(stats))
+
+
+class EncoderStage:
+    # The encoder process and the ring of frame slots it reads from
+    def __init__(self, shape, depth):
+        self.shape = shape
+        self.depth = depth
+        context = multiprocessing.get_context('spawn')
+        self.memory = shared_memory.SharedMemory(create=True, size=depth * int(np.prod(shape)))
+        self.ring = np.ndarray((depth, *shape), dtype=np.uint8, buffer=self.memory.buf)
+        self.free_slots = context.Semaphore(depth)
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=encoder_main,
+            args=(child, self.memory.name, depth, shape, self.free_slots),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self.next_slot = 0
+        self.encoder_stats = {}
+
+    def open(self, path, fps, settings):
+        self.connection.send(('open', str(path), fps, settings))
+
+    def put(self, frame, num_frames, stats):
+        # Blocks while the encoder is `depth` frames behind
+        start = time.perf_counter()
+        self.free_slots.acquire()
+        stats['blocked_seconds'] += time.perf_counter() - start
+        start = time.perf_counter()
+        slot = self.next_slot
+        np.copyto(self.ring[slot], frame)
+        self.next_slot = (slot + 1) % self.depth
+        self.connection.send(('frame', slot, num_frames))
+        stats['copy_seconds'] += time.perf_counter() - start
+
+    def close(self):
+        # Returns once the partial movie is complete on disk
+        self.connection.send(('close',))
+        self.encoder_stats = self.connection.recv()
+
+    def stop(self):
+        try:
+            self.connection.send(('stop',))
+            self.encoder_stats = self.connection.recv()
+            self.process.join()
+        finally:
+            del self.ring
+            self.memory.close()
+            self.memory.unlink()
+
+
+class PipelinedEncoding:
+    # Worker plugin moving encoding out of the render process: every frame
+    # is copied once, straight from the camera, into a slot of a shared
+    # memory ring, and an encoder process encodes it from there while the
+    # next frame is drawn. A full ring blocks the renderer (backpressure).
+    # Replaces manim's writer thread, whose queue has no bound and whose
+    # encoding competes with drawing for the GIL.
+    def __init__(self, arg):
+        self.options = parse_options(arg)
+        self.stage = None
+        self.stats = {
+            'frames': 0, 'files': 0,
+            'raster_seconds': 0.0, 'copy_seconds': 0.0, 'blocked_seconds': 0.0, 'reencode_seconds': 0.0,
+        }
+        self.last_put = None
+
+    def supported(self):
+        from manim import config
+
+        return config.movie_file_extension == '.mp4' and not config.transparent
+
+    def install(self):
+        from manim import config
+        from manim.renderer.cairo_renderer import CairoRenderer
+        from manim.scene.scene_file_writer import SceneFileWriter, to_av_frame_rate, write_to_movie
+
+        plugin = self
+        options = self.options
+        render = CairoRenderer.render
+        open_stream = SceneFileWriter.open_partial_movie_stream
+        write_frame = SceneFileWriter.write_frame
+        close_stream = SceneFileWriter.close_partial_movie_stream
+        combine = SceneFileWriter.combine_to_movie
+        combine_sections = SceneFileWriter.combine_to_section_videos
+
+        @functools.wraps(render)
+        def copy_free_render(renderer, scene, time, moving_mobjects):
+            # get_frame() copies the camera's pixels only for the ring to
+            # copy them again; the ring takes them from the camera directly.
+            # manim's own writer queues the array, so it still gets a copy.
+            if not getattr(renderer.file_writer, 'pipelined', False):
+                return render(renderer, scene, time, moving_mobjects)
+            renderer.update_frame(scene, moving_mobjects)
+            renderer.add_frame(renderer.camera.pixel_array)
+
+        @functools.wraps(open_stream)
+        def open_partial_movie_stream(writer, file_path=None):
+            writer.pipelined = plugin.supported()
+            if not writer.pipelined:
+                return open_stream(writer, file_path=file_path)
+            if file_path is None:
+                file_path = writer.partial_movie_files[writer.renderer.num_plays]
+            writer.partial_movie_file_path = file_path
+            shape = (config.pixel_height, config.pixel_width, 4)
+            if plugin.stage is None or plugin.stage.shape != shape:
+                plugin.stop_stage()
+                plugin.stage = EncoderStage(shape, options.depth)
+            plugin.stage.open(file_path, to_av_frame_rate(config.frame_rate), options.partial)
+            plugin.last_put = time.perf_counter()
+
+        @functools.wraps(write_frame)
+        def pipelined_write_frame(writer, frame, num_frames=1):
+            if not getattr(writer, 'pipelined', False) or not write_to_movie():
+                return write_frame(writer, frame, num_frames)
+            now = time.perf_counter()
+            plugin.stats['raster_seconds'] += now - plugin.last_put
+            plugin.stage.put(frame, num_frames, plugin.stats)
+            plugin.stats['frames'] += num_frames
+            plugin.last_put = time.perf_counter()
+
+        @functools.wraps(close_stream)
+        def close_partial_movie_stream(writer):
+            if not getattr(writer, 'pipelined', False):
+                return close_stream(writer)
+            plugin.stage.close()
+            plugin.stats['files'] += 1
+
+        @functools.wraps(combine)
+        def combine_to_movie(writer, *args, **kwargs):
+            combine(writer, *args, **kwargs)
+            movie = Path(writer.movie_file_path) if writer.movie_file_path else None
+            if options.movie and movie and movie.suffix == '.mp4' and movie.is_file():
+                plugin.reencode(movie)
+
+        @functools.wraps(combine_sections)
+        def combine_to_section_videos(writer, *args, **kwargs):
+            combine_sections(writer, *args, **kwargs)
+            if options.movie:
+                for video in Path(writer.sections_output_dir).glob(f"{writer.output_name}_*.mp4"):
+                    plugin.reencode(video)
+
+        if getattr(CairoRenderer.render, '__wrapped__', None) is None:
+            # Another plugin drawing frames its own way keeps get_frame()
+            CairoRenderer.render = copy_free_render
+        tag_partial_movies(options.partial.tag)
+        SceneFileWriter.open_partial_movie_stream = open_partial_movie_stream
+        SceneFileWriter.write_frame = pipelined_write_frame
+        SceneFileWriter.close_partial_movie_stream = close_partial_movie_stream
+        SceneFileWriter.combine_to_movie = combine_to_movie
+        SceneFileWriter.combine_to_section_videos = combine_to_section_videos
+
+    def reencode(self, movie):
+        # The finished movie in the movie target's codec, from the
+        # partial movies' (possibly lossless) intermediate
+        tmp = movie.with_name(f".{movie.stem}.encode{movie.suffix}")
+        start = time.perf_counter()
+        try:
+            run_ffmpeg([
+                '-i', str(movie), *self.options.movie.ffmpeg_args(),
+                '-c:a', 'copy', '-movflags', '+faststart', str(tmp),
+            ])
+            tmp.replace(movie)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.stats['reencode_seconds'] += time.perf_counter() - start
+
+    def stop_stage(self):
+        if self.stage is not None:
+            self.stage.stop()
+            for key in ('encode_seconds', 'idle_seconds'):
+                self.stats[key] = self.stats.get(key, 0.0) + self.stage.encoder_stats.get(key, 0.0)
+            self.stage = None
+
+    def finish(self):
+        self.stop_stage()
+        stats = {key: round(value, 4) if isinstance(value, float) else value for key, value in self.stats.items()}
+        stats['depth'] = self.options.depth
+        stats['partial'] = str(self.options.partial)
+        stats['movie'] = str(self.options.movie) if self.options.movie else 'copy'
+        if self.options.report:
+            self.options.report.parent.mkdir(parents=True, exist_ok=True)
+            self.options.report.write_text(json.dumps(stats, indent=2), encoding='utf-8')
+        if stats['frames']:
+            log(f"Pipeline: {describe(stats)}")
+
+
+def stage_rates(stats):
+    # Frames per second each stage manages while it is busy
+    raster = stats['frames'] / stats['raster_seconds'] if stats['raster_seconds'] else float('inf')
+    encode = stats['frames'] / stats.get('encode_seconds', 0) if stats.get('encode_seconds') else float('inf')
+    return raster, encode
+
+
+def describe(stats):
+    raster, encode = stage_rates(stats)
+    busy = stats['raster_seconds'] + stats['copy_seconds'] + stats['blocked_seconds']
+    blocked = stats['blocked_seconds'] / busy if busy else 0
+    bottleneck = 'encoder' if encode < raster else 'rasterizer'
+    return (f"{stats['frames']} frames, rasterizing {raster:.1f} fps, encoding {encode:.1f} fps, "
+            f"renderer blocked on a full ring {blocked:.0%} of the time; the {bottleneck} is the bottleneck")
+
+
+def print_pipeline_table(paths):
+    rows = []
+    for name, path in paths.items():
+        try:
+            rows.append((name, json.loads(Path(path).read_text(encoding='utf-8'))))
+        except (FileNotFoundError, ValueError):
+            continue
+    rows = [(name, stats) for name, stats in rows if stats['frames']]
+    if not rows:
+        return
+    width = max(len(name) for name, _ in rows)
+    print(f"\n{'scene':<{width}} {'frames':>7} {'raster fps':>11} {'encode fps':>11} {'blocked':>8} {'idle':>6}  bottleneck")
+    for name, stats in rows:
+        raster, encode = stage_rates(stats)
+        busy = stats['raster_seconds'] + stats['copy_seconds'] + stats['blocked_seconds']
+        idle = stats.get('idle_seconds', 0) / (stats.get('idle_seconds', 0) + stats.get('encode_seconds', 0) or 1)
+        print(f"{name:<{width}} {stats['frames']:>7} {raster:>11.1f} {encode:>11.1f} "
+              f"{stats['blocked_seconds'] / (busy or 1):>8.0%} {idle:>6.0%}  "
+              f"{'encoder' if encode < raster else 'rasterizer'}")
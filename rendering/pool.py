@@ -0,0 +1,163 @@
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .jobs import JobResult
+from .paths import ROOT
+
+# tqdm progress lines look like "Animation 3: Write(...):  45%|####  | 27/60 ..."
+PROGRESS_RE = re.compile(r'^(?P<label>.*?):\s+(?P<percent>\d+)%\|')
+
+# Keep the tail of stderr around so failures can still be reported in full
+STDERR_TAIL_LINES = 200
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class OutputFilter:
+    # Echoes a job's output lines with the job's name in front, reporting
+    # progress bars only every 25% so parallel jobs stay readable, and keeps
+    # the tail of the non-progress lines for error reports
+    def __init__(self, prefix, tail=None):
+        self.prefix = prefix
+        self.tail = tail
+        self.last_bucket = {}
+
+    def feed(self, line):
+        line = line.rstrip()
+        if not line:
+            return
+        match = PROGRESS_RE.match(line)
+        if not match and self.tail is not None:
+            self.tail.append(line)
+        if match:
+            label = match.group('label')
+            bucket = int(match.group('percent')) // 25
+            if self.last_bucket.get(label) == bucket:
+                return
+            self.last_bucket[label] = bucket
+        log(f"[{self.prefix}] {line}")
+
+
+def _stream(pipe, prefix, tail=None):
+    output = OutputFilter(prefix, tail)
+    for line in pipe:
+        output.feed(line)
+    pipe.close()
+
+
+def run_process(job):
+    # A wide console stops rich from wrapping manim's log lines
+    env = dict(os.environ, COLUMNS='4096', **job.env)
+    process = subprocess.Popen(
+        job.command(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        env=env,
+        cwd=ROOT,
+    )
+
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    readers = [
+        threading.Thread(target=_stream, args=(process.stdout, job.name)),
+        threading.Thread(target=_stream, args=(process.stderr, job.name, stderr_tail)),
+    ]
+    for reader in readers:
+        reader.start()
+    returncode = process.wait()
+    for reader in readers:
+        reader.join()
+    return returncode, '\n'.join(stderr_tail)
+
+
+def run_job(job, execute=run_process):
+    # execute(job) runs manim for the job and returns (returncode, stderr tail)
+    log(f"\nRendering {job.name}...")
+    before = job.snapshot_outputs()
+    start = time.monotonic()
+    if job.prepare:
+        try:
+            job.prepare()
+        except Exception as e:
+            return JobResult(job, 1, time.monotonic() - start, f"{type(e).__name__}: {e}")
+
+    returncode, stderr = execute(job)
+    result = JobResult(job, returncode, time.monotonic() - start, stderr)
+    if result.ok:
+        result.outputs = job.find_outputs(before)
+        if job.finalize:
+            try:
+                job.finalize(result)
+            except Exception as e:
+                result.returncode = 1
+                result.stderr = f"{type(e).__name__}: {e}"
+        result.duration = time.monotonic() - start
+    return result
+
+
+def report(result):
+    if result.ok:
+        log(f"✓ Successfully rendered {result.job.name} ({result.duration:.1f}s)")
+    else:
+        log(f"✗ Failed to render {result.job.name} ({result.duration:.1f}s)\nError: {result.stderr}")
+
+
+def run_jobs(jobs, workers=None, on_result=None, execute=run_process):
+    if not jobs:
+        return []
+    workers = max(1, min(workers or default_workers(), len(jobs)))
+    results = []
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for job in jobs:
+            futures[executor.submit(run_job, job, execute)] = job
+
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # e.g. manim is not on PATH
+                result = JobResult(job, -1, 0.0, str(e))
+            report(result)
+            if on_result:
+                on_result(result)
+            results.append(result)
+
+    # Keep the summary in submission order regardless of completion order
+    order = {id(job): i for i, job in enumerate(jobs)}
+    results.sort(key=lambda r: order[id(r.job)])
+    return results
+
+
+def print_summary(results, wall_time):
+    if not results:
+        return
+    width = max(len(r.job.name) for r in results)
+    log("\nSummary:")
+    for result in results:
+        mark = '✓' if result.ok else '✗'
+        status = 'up to date' if result.skipped else f"{result.duration:7.1f}s"
+        log(f"  {mark} {result.job.name:<{width}}  {status}")
+    busy = sum(r.duration for r in results)
+    failed = sum(not r.ok for r in results)
+    skipped = sum(r.skipped for r in results)
+    log(f"  {len(results) - failed - skipped} rendered, {skipped} up to date, {failed} failed, "
+        f"{wall_time:.1f}s wall ({busy:.1f}s of render time)")
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .pool import default_workers, log
+from .probe import probe_job, report_errors
+
+
+@dataclass
+class PreflightResult:
+    job: object
+    scenes: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def duration(self):
+        return sum(scene['duration'] for scene in self.scenes)
+
+    @property
+    def frames(self):
+        return sum(scene['frames'] for scene in self.scenes)
+
+
+def check(job):
+    # construct() runs with every animation skipped: mobjects are built,
+    # assets loaded and animations set up, but no frame is drawn or written
+    start = time.monotonic()
+    try:
+        report = probe_job(job)
+    except Exception as e:
+        return PreflightResult(job, errors=[str(e)], seconds=time.monotonic() - start)
+    return PreflightResult(job, report['scenes'], report_errors(report), time.monotonic() - start)
+
+
+def preflight(jobs, workers=None):
+    if not jobs:
+        return True, []
+    start = time.monotonic()
+    log(f"Preflight: checking {len(jobs)} jobs without rendering...")
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or default_workers(), len(jobs)))) as executor:
+        results = list(executor.map(check, jobs))
+
+    width = max(len(r.job.name) for r in results)
+    for result in results:
+        if result.ok:
+            scenes = ', '.join(f"{s['scene']} {len(s['plays'])} animations" for s in result.scenes)
+            log(f"  ✓ {result.job.name:<{width}}  {result.duration:6.1f}s of video, "
+                f"{result.frames} frames ({scenes}) checked in {result.seconds:.1f}s")
+        else:
+            log(f"  ✗ {result.job.name:<{width}}  failed after {result.seconds:.1f}s")
+            for error in result.errors:
+                log('      ' + error.replace('\n', '\n      '))
+
+    failed = [r for r in results if not r.ok]
+    total = sum(r.duration for r in results)
+    log(f"Preflight: {len(results) - len(failed)} passed, {len(failed)} failed, "
+        f"{total:.1f}s of video in total, {time.monotonic() - start:.1f}s")
+    return not failed, results
@@ -0,0 +1,151 @@
+import argparse
+import json
+import math
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+from .driver import load_scenes, render_config, scene_caller
+from .paths import ROOT
+
+
+def describe_error(e):
+    # The exception plus the innermost line of the project's own code that
+    # raised it, which is usually the line in the scene to look at
+    message = ''.join(traceback.format_exception_only(type(e), e)).strip()
+    frames = [
+        frame for frame in traceback.extract_tb(e.__traceback__)
+        if Path(frame.filename).resolve().is_relative_to(ROOT)
+        and not Path(frame.filename).resolve().is_relative_to(ROOT / 'rendering')
+    ]
+    if frames:
+        frame = frames[-1]
+        location = Path(frame.filename).resolve().relative_to(ROOT).as_posix()
+        message += f"\n  at {location}:{frame.lineno} in {frame.name}: {frame.line}"
+    return message
+
+
+def probe_scene(scene_class, scene_file, fps):
+    # Run construct() with every animation skipped, recording what each
+    # play() or wait() would render without rasterizing a single frame
+    plays = []
+    scene = scene_class(skip_animations=True)
+    renderer = scene.renderer
+    play = renderer.play
+
+    def record(scene, *args, **kwargs):
+        index = renderer.num_plays
+        start = time.perf_counter()
+        play(scene, *args, **kwargs)
+        plays.append({
+            'index': index,
+            'duration': round(scene.duration, 6),
+            'frames': math.ceil(round(scene.duration * fps, 6)),
+            'method': scene_caller(scene_file),
+            'mobjects': len(scene.mobjects),
+            # A wait with nothing moving renders one frame and repeats it
+            'static': bool(scene.animations) and scene.is_current_animation_frozen_frame(),
+            'seconds': round(time.perf_counter() - start, 6),
+        })
+
+    renderer.play = record
+    start = time.perf_counter()
+    error = None
+    try:
+        scene.render()
+    except Exception as e:
+        error = describe_error(e)
+
+    return {
+        'scene': scene_class.__name__,
+        'plays': plays,
+        'duration': round(sum(p['duration'] for p in plays), 6),
+        'frames': sum(p['frames'] for p in plays),
+        'seconds': round(time.perf_counter() - start, 6),
+        'error': error,
+    }
+
+
+def probe(file, quality='h', scenes=None):
+    from manim import config, tempconfig
+
+    file = Path(file).resolve()
+    options = render_config(file, quality, dry_run=True, verbosity='ERROR', progress_bar='none')
+    with tempconfig(options):
+        fps = config.frame_rate
+        report = {'file': str(file), 'quality': quality, 'fps': fps, 'scenes': [], 'error': None}
+        try:
+            scene_classes = load_scenes(file)
+        except Exception as e:
+            # The file does not even import
+            report['error'] = describe_error(e)
+            return report
+        if scenes:
+            scene_classes = [cls for cls in scene_classes if cls.__name__ in scenes]
+        report['scenes'] = [probe_scene(cls, file, fps) for cls in scene_classes]
+    return report
+
+
+def report_errors(report):
+    errors = [f"import failed: {report['error']}"] if report.get('error') else []
+    return errors + [f"{s['scene']}: {s['error']}" for s in report['scenes'] if s['error']]
+
+
+def probe_file(file, quality='h', scenes=None):
+    # Probe in a fresh interpreter: importing a scene file has side effects
+    # on sys.modules and manim's global config
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'probe.json'
+        result = subprocess.run(
+            [sys.executable, '-m', 'rendering.probe', str(file), *(scenes or []),
+             '-q', quality, '--json', str(output)],
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+        )
+        if not output.exists():
+            # The probe itself crashed; its last line names the exception
+            lines = result.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"probe exited with {result.returncode}")
+        return json.loads(output.read_text(encoding='utf-8'))
+
+
+def probe_job(job):
+    return probe_file(job.file, job.quality, [job.scene] if job.scene else None)
+
+
+def print_report(report):
+    if report['error']:
+        print(f"✗ {report['file']} failed to import: {report['error']}")
+    for scene in report['scenes']:
+        print(f"{scene['scene']}: {len(scene['plays'])} animations, "
+              f"{scene['duration']:.1f}s, {scene['frames']} frames at {report['fps']:g} fps")
+        for play in scene['plays']:
+            print(f"  {play['index']:>4}  {play['method'] or '?':<28} "
+                  f"{play['duration']:6.2f}s {play['frames']:>6} frames {play['mobjects']:>5} mobjects")
+        if scene['error']:
+            print(f"  ✗ construct() failed after animation {len(scene['plays'])}: {scene['error']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List the animations a scene file would render without rendering them."
+    )
+    parser.add_argument('file', type=Path)
+    parser.add_argument('scenes', nargs='*', help="scene classes to probe (default: all)")
+    parser.add_argument('-q', '--quality', default='h', choices=['l', 'm', 'h', 'p', 'k'])
+    parser.add_argument('--json', type=Path, help="write the report to this file instead of printing it")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = probe(args.file, args.quality, args.scenes)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    else:
+        print_report(report)
+    sys.exit(1 if report['error'] or any(s['error'] for s in report['scenes']) else 0)
@@ -0,0 +1,188 @@
+import argparse
+import functools
+import json
+import sys
+import time
+from pathlib import Path
+
+from .driver import scene_caller
+
+try:
+    import resource
+except ImportError:
+    # Windows has no getrusage; peak memory is left out there
+    resource = None
+
+# Where each play()'s wall time goes:
+#   update  Scene.update_to_time, i.e. interpolating animations and updaters
+#   raster  Cairo drawing the frame and reading it back (update_frame, get_frame)
+#   encode  encoding frames; manim does this on a writer thread, so it
+#           overlaps with the other two and is not part of the wall time split
+#   flush   end_animation waiting for that thread to drain and closing the file
+TIMERS = ('update', 'raster', 'encode', 'flush')
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class Profiler:
+    # Worker plugin recording every play() and wait() of every scene the
+    # render runs. Use with --disable_caching, or cached animations show up
+    # with no frames.
+    def __init__(self, output):
+        self.output = Path(output or 'profile.json')
+        self.scenes = []
+        self.timers = dict.fromkeys(TIMERS, 0.0)
+        self.frames = 0
+        self.last_play_end = None
+
+    def timed(self, cls, name, timer):
+        original = getattr(cls, name)
+        timers = self.timers
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                timers[timer] += time.perf_counter() - start
+
+        setattr(cls, name, wrapper)
+
+    def install(self):
+        from manim import Scene
+        from manim.renderer.cairo_renderer import CairoRenderer
+        from manim.scene.scene_file_writer import SceneFileWriter
+
+        self.timed(Scene, 'update_to_time', 'update')
+        self.timed(CairoRenderer, 'update_frame', 'raster')
+        self.timed(CairoRenderer, 'get_frame', 'raster')
+        self.timed(SceneFileWriter, 'encode_and_write_frame', 'encode')
+        self.timed(SceneFileWriter, 'end_animation', 'flush')
+
+        profiler = self
+        render, play, add_frame = Scene.render, CairoRenderer.play, CairoRenderer.add_frame
+
+        @functools.wraps(render)
+        def render_scene(scene, *args, **kwargs):
+            profiler.scenes.append({'scene': type(scene).__name__, 'plays': []})
+            profiler.last_play_end = start = time.perf_counter()
+            try:
+                return render(scene, *args, **kwargs)
+            finally:
+                profiler.scenes[-1]['wall'] = round(time.perf_counter() - start, 4)
+
+        @functools.wraps(play)
+        def profile_play(renderer, scene, *args, **kwargs):
+            profiler.start_play(renderer)
+            play(renderer, scene, *args, **kwargs)
+            profiler.end_play(renderer, scene)
+
+        @functools.wraps(add_frame)
+        def count_frames(renderer, frame, num_frames=1):
+            if not renderer.skip_animations:
+                profiler.frames += num_frames
+            return add_frame(renderer, frame, num_frames)
+
+        Scene.render = render_scene
+        CairoRenderer.play = profile_play
+        CairoRenderer.add_frame = count_frames
+
+    def start_play(self, renderer):
+        now = time.perf_counter()
+        self.play_index = renderer.num_plays
+        # Time spent in construct() since the previous play, building mobjects
+        self.construct = now - self.last_play_end
+        for timer in TIMERS:
+            self.timers[timer] = 0.0
+        self.frames = 0
+        self.play_start = now
+
+    def end_play(self, renderer, scene):
+        now = time.perf_counter()
+        wall = now - self.play_start
+        self.last_play_end = now
+        if renderer.skip_animations:
+            status = 'cached' if renderer.animations_hashes[-1] else 'skipped'
+        else:
+            status = 'rendered'
+
+        from manim import config
+
+        timers = {timer: round(value, 4) for timer, value in self.timers.items()}
+        self.scenes[-1]['plays'].append({
+            'index': self.play_index,
+            'method': scene_caller(config.input_file),
+            'status': status,
+            'frames': self.frames,
+            'wall': round(wall, 4),
+            'construct': round(self.construct, 4),
+            **timers,
+            'other': round(max(wall - timers['update'] - timers['raster'] - timers['flush'], 0), 4),
+            'peak_rss_mb': peak_rss_mb(),
+        })
+
+    def finish(self):
+        from manim import config
+
+        report = {
+            'file': str(config.input_file),
+            'resolution': f"{config.pixel_width}x{config.pixel_height}",
+            'fps': config.frame_rate,
+            'scenes': self.scenes,
+        }
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        self.output.write_text(json.dumps(report, indent=2), encoding='utf-8')
+
+
+def merge_reports(paths, output):
+    reports = [json.loads(Path(p).read_text(encoding='utf-8')) for p in paths if Path(p).exists()]
+    merged = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'files': reports}
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(merged, indent=2), encoding='utf-8')
+    return merged
+
+
+def print_table(report, top=25):
+    rows = [
+        (scene['scene'], play)
+        for file in report['files']
+        for scene in file['scenes']
+        for play in scene['plays']
+    ]
+    if not rows:
+        print("No animations were profiled.")
+        return
+    rows.sort(key=lambda row: row[1]['wall'], reverse=True)
+    total = sum(play['wall'] for _, play in rows) or 1
+
+    width = max(len(f"{scene}.{play['method']}") for scene, play in rows[:top])
+    print(f"\n{'animation':<{width}} {'#':>4} {'frames':>7} {'wall':>8} {'share':>6} "
+          f"{'fps':>6} {'update':>8} {'raster':>8} {'encode':>8} {'flush':>7} {'rss MB':>8}")
+    for scene, play in rows[:top]:
+        fps = play['frames'] / play['wall'] if play['wall'] else 0
+        name = f"{scene}.{play['method']}"
+        print(f"{name:<{width}} {play['index']:>4} {play['frames']:>7} {play['wall']:>7.2f}s "
+              f"{play['wall'] / total:>6.1%} {fps:>6.1f} {play['update']:>7.2f}s {play['raster']:>7.2f}s "
+              f"{play['encode']:>7.2f}s {play['flush']:>6.2f}s {play['peak_rss_mb'] or 0:>8.0f}")
+    if len(rows) > top:
+        print(f"... {len(rows) - top} more in the report")
+    print(f"{len(rows)} animations, {total:.1f}s in play()/wait()")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Show the slowest animations of a profile report.")
+    parser.add_argument('report', type=Path)
+    parser.add_argument('--top', type=int, default=25, help="number of animations to list (default: 25)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    print_table(json.loads(args.report.read_text(encoding='utf-8')), args.top)
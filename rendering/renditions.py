@@ -0,0 +1,186 @@
+import argparse
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .ffmpeg import FFmpegError, run_ffmpeg
+from .fingerprint import Manifest, hash_file, hash_payload, relative
+from .paths import STATE_DIR
+from .pool import default_workers, log
+
+RENDITIONS_MANIFEST = STATE_DIR / 'renditions.json'
+
+# Codec name -> (file suffix, quality arguments for a CRF value)
+CODECS = {
+    'libx264': ('.mp4', lambda crf: ['-crf', str(crf), '-preset', 'medium', '-pix_fmt', 'yuv420p']),
+    'libx265': ('.mp4', lambda crf: ['-crf', str(crf), '-preset', 'medium', '-pix_fmt', 'yuv420p', '-tag:v', 'hvc1']),
+    'libvpx-vp9': ('.webm', lambda crf: ['-crf', str(crf), '-b:v', '0', '-row-mt', '1']),
+}
+AUDIO_CODECS = {'.mp4': 'aac', '.webm': 'libopus'}
+
+# manim names its quality folders <height>p<fps>, and so do renditions
+QUALITY_RE = re.compile(r'^(?P<height>\d+)p(?P<fps>\d+)$')
+
+
+@dataclass(frozen=True)
+class Rendition:
+    height: int
+    fps: int
+    codec: str = 'libx264'
+    crf: int = 23
+
+    @property
+    def name(self):
+        default = self.codec == 'libx264' and self.crf == 23
+        return f"{self.height}p{self.fps}" + ('' if default else f"-{self.codec}-crf{self.crf}")
+
+    @property
+    def suffix(self):
+        return CODECS[self.codec][0]
+
+    def output(self, master):
+        # media/videos/<module>/renditions/<name>/<Scene>.mp4, out of the way
+        # of manim's own <module>/<quality>/ folders
+        return master.parent.parent / 'renditions' / self.name / master.with_suffix(self.suffix).name
+
+    def output_args(self, label):
+        return [
+            '-map', f"[{label}]", '-map', '0:a?',
+            '-c:v', self.codec, *CODECS[self.codec][1](self.crf),
+            '-c:a', AUDIO_CODECS[self.suffix], '-b:a', '128k',
+        ]
+
+
+def parse_rendition(spec):
+    # HEIGHTpFPS[:CODEC[:CRF]], e.g. 720p30, 480p15:libx264:28, 1080p60:libvpx-vp9:31
+    quality, *rest = spec.split(':')
+    match = QUALITY_RE.match(quality)
+    if not match or len(rest) > 2:
+        raise argparse.ArgumentTypeError(f"bad rendition {spec!r}; expected e.g. 720p30 or 720p30:libx264:23")
+    codec = rest[0] if rest else 'libx264'
+    if codec not in CODECS:
+        raise argparse.ArgumentTypeError(f"unknown codec {codec!r}; available: {', '.join(CODECS)}")
+    return Rendition(int(match['height']), int(match['fps']), codec, int(rest[1]) if len(rest) > 1 else 23)
+
+
+def parse_renditions(value):
+    return [parse_rendition(spec.strip()) for spec in value.split(',') if spec.strip()]
+
+
+def master_quality(master):
+    # (height, fps) of a master, read from the folder manim rendered it into
+    match = QUALITY_RE.match(Path(master).parent.name)
+    return (int(match['height']), int(match['fps'])) if match else None
+
+
+def filter_graph(renditions):
+    # One decode of the master, split into a scaled and resampled stream
+    # per rendition
+    labels = [f"v{i}" for i in range(len(renditions))]
+    split = f"[0:v]split={len(renditions)}" + ''.join(f"[s{i}]" for i in range(len(renditions)))
+    chains = [
+        f"[s{i}]fps={r.fps},scale=-2:{r.height}:flags=lanczos[{label}]"
+        for i, (r, label) in enumerate(zip(renditions, labels))
+    ]
+    return ';'.join([split, *chains]), labels
+
+
+def encode_renditions(master, renditions):
+    # Every rendition of one master in a single ffmpeg run: the master is
+    # decoded once and the encoders run side by side
+    graph, labels = filter_graph(renditions)
+    args = ['-i', str(master), '-filter_complex', graph]
+    temps = []
+    for rendition, label in zip(renditions, labels):
+        output = rendition.output(master)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temp = output.with_name(f".{output.stem}.tmp{output.suffix}")
+        temps.append((temp, output))
+        args += [*rendition.output_args(label), '-movflags', '+faststart', str(temp)]
+    try:
+        run_ffmpeg(args)
+        for temp, output in temps:
+            temp.replace(output)
+    finally:
+        for temp, _ in temps:
+            temp.unlink(missing_ok=True)
+    return [output for _, output in temps]
+
+
+def rendition_fingerprint(master_fingerprint, rendition):
+    return hash_payload({'master': master_fingerprint, 'rendition': asdict(rendition)})
+
+
+def plan_master(master, renditions, master_fingerprint, manifest):
+    # The renditions of a master that are missing or were made from an
+    # older master; ones that would upscale it are left out
+    quality = master_quality(master)
+    stale = []
+    for rendition in renditions:
+        if quality and (rendition.height > quality[0] or rendition.fps > quality[1]):
+            log(f"Skipping {rendition.name} of {master.name}: the master is only {quality[0]}p{quality[1]}")
+            continue
+        key = f"{relative(master.resolve())}@{rendition.name}"
+        if not manifest.is_fresh(key, rendition_fingerprint(master_fingerprint, rendition)):
+            stale.append(rendition)
+    return stale
+
+
+def render_renditions(masters, renditions, workers=None, manifest=None):
+    # masters: {path to a rendered video: fingerprint of what produced it}.
+    # A fingerprint of None hashes the video itself.
+    manifest = manifest or Manifest(RENDITIONS_MANIFEST)
+    plans = []
+    for master, fingerprint in masters.items():
+        master = Path(master)
+        fingerprint = fingerprint or hash_file(master)
+        stale = plan_master(master, renditions, fingerprint, manifest)
+        if stale:
+            plans.append((master, fingerprint, stale))
+        else:
+            log(f"✓ Renditions of {master.name} are up to date")
+
+    def run(plan):
+        master, fingerprint, stale = plan
+        start = time.monotonic()
+        outputs = encode_renditions(master, stale)
+        for rendition, output in zip(stale, outputs):
+            key = f"{relative(master.resolve())}@{rendition.name}"
+            manifest.record(key, rendition_fingerprint(fingerprint, rendition), [output])
+        log(f"✓ {master.name}: {', '.join(r.name for r in stale)} in {time.monotonic() - start:.1f}s")
+        return outputs
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or default_workers(), len(plans) or 1))) as executor:
+        for plan, future in [(plan, executor.submit(run, plan)) for plan in plans]:
+            try:
+                future.result()
+            except FFmpegError as e:
+                failures.append(plan[0])
+                log(f"✗ Renditions of {plan[0].name} failed: {e}")
+    return failures
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Encode rendered masters into smaller renditions in one decode pass per master."
+    )
+    parser.add_argument('masters', nargs='+', type=Path, help="rendered videos to derive renditions from")
+    parser.add_argument(
+        '-r', '--renditions',
+        type=parse_renditions,
+        required=True,
+        metavar='HEIGHTpFPS[:CODEC[:CRF]],...',
+        help="e.g. 720p30,480p15 or 720p30:libvpx-vp9:31",
+    )
+    parser.add_argument('-j', '--jobs', type=int, default=default_workers(), help="masters encoded at the same time")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    failed = render_renditions(dict.fromkeys(args.masters), args.renditions, args.jobs)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,208 @@
+import ast
+import json
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .ffmpeg import concat_copy
+from .fingerprint import fingerprint_payload, hash_bytes, hash_payload, relative
+from .paths import STATE_DIR
+
+SEGMENTS_DIR = STATE_DIR / 'segments'
+KEEP_SEGMENT_VERSIONS = 3
+
+# Must match animations/components/sections.py
+SECTIONS_ENV = 'RENDER_SECTIONS'
+
+
+def _section_call(node):
+    # Matches self.section("name") with a literal name
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == 'section'
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == 'self'
+        and node.args
+        and isinstance(node.args[0], ast.Constant)
+        and isinstance(node.args[0].value, str)
+    ):
+        return node.args[0].value
+    return None
+
+
+def _self_calls(node, methods):
+    return {
+        call.func.attr
+        for call in ast.walk(node)
+        if isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Attribute)
+        and isinstance(call.func.value, ast.Name)
+        and call.func.value.id == 'self'
+        and call.func.attr in methods
+    }
+
+
+def _bare_self_call(statement, methods):
+    if not isinstance(statement, ast.Expr):
+        return None
+    call = statement.value
+    if (
+        isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Attribute)
+        and isinstance(call.func.value, ast.Name)
+        and call.func.value.id == 'self'
+        and call.func.attr in methods
+    ):
+        return call.func.attr
+    return None
+
+
+def _closure(names, calls):
+    seen, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in seen:
+            seen.add(name)
+            pending.extend(calls[name])
+    return seen
+
+
+def find_sections(tree, scene=None):
+    # Returns (class node, [(section name, owned method nodes)]) for the first
+    # class whose construct() declares sections, or only for `scene`
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef) or scene not in (None, cls.name):
+            continue
+        methods = {f.name: f for f in cls.body if isinstance(f, ast.FunctionDef)}
+        construct = methods.get('construct')
+        if construct is None:
+            continue
+
+        names = []
+        roots = {None: set()}
+        current = None
+        for statement in construct.body:
+            for node in ast.walk(statement):
+                name = _section_call(node)
+                if name is not None:
+                    if name in names:
+                        raise ValueError(f"{cls.name} declares section {name!r} twice")
+                    names.append(name)
+                    roots[name] = set()
+                    current = name
+            # Only a bare self.method(...) statement hands a method to the
+            # section; calls whose result is kept (network = self.create_network())
+            # build shared state
+            owner = _bare_self_call(statement, methods)
+            if owner is not None and current is not None:
+                roots[current].add(owner)
+                roots[None] |= _self_calls(statement, methods) - {owner}
+            else:
+                roots[None] |= _self_calls(statement, methods)
+        if not names:
+            continue
+
+        # A method belongs to a section when only that section reaches it;
+        # everything else (construct itself, shared helpers) is shared input
+        calls = {name: _self_calls(f, methods) - {name} for name, f in methods.items()}
+        reach = {key: _closure(names_, calls) for key, names_ in roots.items()}
+        sections = []
+        for name in names:
+            others = set().union(*(r for key, r in reach.items() if key != name))
+            owned = sorted(reach[name] - others - {'construct'})
+            sections.append((name, [methods[m] for m in owned]))
+        return cls, sections
+    return None, []
+
+
+def _strip(source, nodes):
+    lines = source.splitlines(keepends=True)
+    for node in nodes:
+        first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        for i in range(first - 1, node.end_lineno):
+            lines[i] = '\n'
+    return ''.join(lines)
+
+
+@dataclass
+class Section:
+    name: str
+    fingerprint: str
+    segment: Path
+
+    @property
+    def cached(self):
+        return self.segment.is_file()
+
+
+@dataclass
+class SectionPlan:
+    scene: str
+    sections: list = field(default_factory=list)
+
+    @property
+    def stale(self):
+        return [s for s in self.sections if not s.cached]
+
+    def output(self, job):
+        return job.output_dir / f"{self.scene}.mp4"
+
+    def apply(self, job):
+        # Render only the stale sections; the rest are executed by manim but
+        # skipped, so the scene state is still right when a stale one starts
+        job.env[SECTIONS_ENV] = ','.join(s.name for s in self.stale)
+        job.run_args.append('--save_sections')
+        job.finalize = lambda result: self.finish(job, result)
+
+    def finish(self, job, result):
+        sections_dir = job.output_dir / 'sections'
+        index = json.loads((sections_dir / f"{self.scene}.json").read_text(encoding='utf-8'))
+        videos = {entry['name']: sections_dir / entry['video'] for entry in index}
+
+        for section in self.stale:
+            if section.name not in videos:
+                raise RuntimeError(f"manim did not write section {section.name!r} of {self.scene}")
+            section.segment.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(videos[section.name], section.segment)
+
+            # Keep a few older versions around so reverting an edit is free
+            versions = sorted(
+                section.segment.parent.glob(f"{self.scene}.{section.name}.*.mp4"),
+                key=lambda p: p.stat().st_mtime_ns,
+                reverse=True,
+            )
+            for old in versions[KEEP_SEGMENT_VERSIONS:]:
+                old.unlink()
+
+        result.outputs = [self.assemble(job)]
+
+    def assemble(self, job):
+        return concat_copy([s.segment for s in self.sections], self.output(job))
+
+
+def plan_sections(job):
+    source = job.file.read_text(encoding='utf-8')
+    cls, sections = find_sections(ast.parse(source, filename=str(job.file)), job.scene)
+    if cls is None:
+        return None
+
+    payload = fingerprint_payload(job)
+    owned = [node for _, nodes in sections for node in nodes]
+    payload['sources'][relative(job.file.resolve())] = hash_bytes(_strip(source, owned).encode())
+
+    segment_dir = SEGMENTS_DIR / job.file.stem / job.output_dir.name
+    plan = SectionPlan(cls.name)
+    previous = None
+    for name, nodes in sections:
+        # A section starts from the scene state the sections before it leave
+        # behind, so its fingerprint chains theirs: editing one section makes
+        # it and every later one stale
+        section_payload = dict(payload, previous=previous, section={
+            'name': name,
+            'code': [ast.get_source_segment(source, node) for node in nodes],
+        })
+        fingerprint = previous = hash_payload(section_payload)
+        segment = segment_dir / f"{cls.name}.{name}.{fingerprint[:16]}.mp4"
+        plan.sections.append(Section(name, fingerprint, segment))
+    return plan
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from .driver import load_scenes, render_config
+from .ffmpeg import concat_copy
+from .journal import animation_journal, record_partial
+from .paths import ROOT
+from .pool import STDERR_TAIL_LINES, log
+from .probe import probe_job
+
+# Only animations at least this long are worth the extra processes, and no
+# slice gets fewer frames than MIN_SLICE_FRAMES
+SLICE_MIN_FRAMES = 120
+MIN_SLICE_FRAMES = 30
+
+
+class StopSlice(Exception):
+    def __init__(self, status, hash_animation=None):
+        super().__init__(status)
+        self.status = status
+        self.hash = hash_animation
+
+
+def slice_bounds(frames, index, count):
+    return frames * index // count, frames * (index + 1) // count
+
+
+def render_slice(file, scene_name, animation, index, count, quality):
+    # Render frames [lo, hi) of one animation into its own partial movie.
+    # Everything before the animation runs skipped, so the scene reaches the
+    # same state a full render would; inside the animation every frame is
+    # still interpolated, but only this slice's frames are rasterized and
+    # encoded. The process stops right after the animation.
+    import numpy as np
+    from manim import config, tempconfig
+
+    file = Path(file).resolve()
+    options = render_config(
+        file, quality, from_animation_number=animation, progress_bar='none', verbosity='WARNING'
+    )
+    with tempconfig(options):
+        scene_class = next(cls for cls in load_scenes(file) if cls.__name__ == scene_name)
+        scene = scene_class()
+        renderer = scene.renderer
+        writer = renderer.file_writer
+        state = {'frame': 0}
+
+        add_partial_movie_file = writer.add_partial_movie_file
+        render = renderer.render
+        play = renderer.play
+
+        def add_slice_file(hash_animation):
+            if renderer.num_plays != animation:
+                return add_partial_movie_file(hash_animation)
+            if renderer.skip_animations:
+                # Either manim already has this animation cached, or its
+                # section is not being rendered
+                cached = hash_animation is not None and writer.is_already_cached(hash_animation)
+                raise StopSlice('cached' if cached else 'skipped', hash_animation)
+            # Same time steps Scene.play_internal walks through
+            frames = len(np.arange(0, scene.duration, 1 / config.frame_rate))
+            state.update(hash=hash_animation, frames=frames, bounds=slice_bounds(frames, index, count))
+            add_partial_movie_file(f"{hash_animation}.slice{index:03}")
+
+        def render_frame(scene, time, moving_mobjects):
+            if renderer.num_plays == animation:
+                frame = state['frame']
+                state['frame'] += 1
+                lo, hi = state['bounds']
+                if not lo <= frame < hi:
+                    return
+            render(scene, time, moving_mobjects)
+
+        def play_until(scene, *args, **kwargs):
+            current = renderer.num_plays
+            play(scene, *args, **kwargs)
+            if current == animation:
+                raise StopSlice('rendered', state['hash'])
+
+        writer.add_partial_movie_file = add_slice_file
+        renderer.render = render_frame
+        renderer.play = play_until
+        try:
+            scene.render()
+        except StopSlice as stop:
+            return {
+                'status': stop.status,
+                'hash': stop.hash,
+                'directory': str(writer.partial_movie_directory),
+                'frames': state.get('frames'),
+                'bounds': state.get('bounds'),
+            }
+        return {'status': 'missing'}
+
+
+def render_animation(job, scene, animation, count):
+    # Render one animation in `count` slices at once and stitch them into the
+    # partial movie manim would have written. The render that follows finds
+    # it in manim's cache and skips the animation.
+    with tempfile.TemporaryDirectory() as tmp:
+        processes = []
+        for index in range(count):
+            output = Path(tmp) / f"{index}.json"
+            command = [
+                sys.executable, '-m', 'rendering.slices', str(job.file), scene,
+                str(animation), str(index), str(count), '-q', job.quality, '--json', str(output),
+            ]
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=dict(os.environ, **job.env),
+                cwd=ROOT,
+            )
+            processes.append((process, output))
+
+        results = []
+        for process, output in processes:
+            _, stderr = process.communicate()
+            if process.returncode != 0 or not output.exists():
+                tail = '\n'.join(stderr.splitlines()[-STDERR_TAIL_LINES:])
+                raise RuntimeError(f"slice of animation {animation} failed:\n{tail}")
+            results.append(json.loads(output.read_text(encoding='utf-8')))
+
+    slices = [
+        Path(r['directory']) / f"{r['hash']}.slice{i:03}.mp4"
+        for i, r in enumerate(results) if r['status'] == 'rendered'
+    ]
+    try:
+        if len(slices) < count:
+            return results[0]['status']
+        if len({r['hash'] for r in results}) != 1:
+            raise RuntimeError(f"slices of animation {animation} disagree on its hash")
+        partial = concat_copy(slices, Path(results[0]['directory']) / f"{results[0]['hash']}.mp4")
+        record_partial(animation_journal(job), partial, animation)
+        return 'rendered'
+    finally:
+        for path in slices:
+            path.unlink(missing_ok=True)
+
+
+def prerender_slices(job, count, min_frames=SLICE_MIN_FRAMES):
+    probed = probe_job(job)
+    for scene in probed['scenes']:
+        if scene['error']:
+            # Let the real render report it
+            continue
+        for play in scene['plays']:
+            if play['static'] or play['frames'] < max(min_frames, 2 * MIN_SLICE_FRAMES):
+                continue
+            slices = min(count, play['frames'] // MIN_SLICE_FRAMES)
+            status = render_animation(job, scene['scene'], play['index'], slices)
+            if status == 'rendered':
+                log(f"[{job.name}] animation {play['index']} ({play['method']}, "
+                    f"{play['frames']} frames) rendered in {slices} slices")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render one slice of one animation of a scene.")
+    parser.add_argument('file', type=Path)
+    parser.add_argument('scene')
+    parser.add_argument('animation', type=int)
+    parser.add_argument('index', type=int)
+    parser.add_argument('count', type=int)
+    parser.add_argument('-q', '--quality', default='h', choices=['l', 'm', 'h', 'p', 'k'])
+    parser.add_argument('--json', type=Path, required=True)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = render_slice(args.file, args.scene, args.animation, args.index, args.count, args.quality)
+    args.json.write_text(json.dumps(result), encoding='utf-8')
@@ -0,0 +1,331 @@
+import argparse
+import ast
+import functools
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from .fingerprint import Manifest, collect_inputs, hash_bytes, hash_payload, manim_version
+from .paths import CONFIG_FILE, ROOT, STATE_DIR
+from .pool import default_workers, log
+
+# Which strings are in manim's text cache (media/texts/<hash>.svg), by the
+# Text(...) call that makes them
+TEXTS_MANIFEST = STATE_DIR / 'texts.json'
+
+TEXT_CLASSES = ('Text', 'MarkupText')
+# Components that build Text from their arguments: constructor ->
+# (argument with the strings, argument with the font size, its default).
+# Keep in step with animations/components.
+COMPONENT_TEXTS = {
+    'NetworkDiagram': ('labels', 'label_font_size', 24),
+    'LargeNetworkDiagram': ('labels', 'label_font_size', 24),
+}
+
+
+class Unresolved(Exception):
+    pass
+
+
+def _values(node, env):
+    # Every value an expression can have, when the source says so: a
+    # literal, a name bound to literals, or a manim constant such as YELLOW
+    if isinstance(node, ast.Name):
+        if node.id in env:
+            return env[node.id]
+        if node.id.isupper():
+            return [{'const': node.id}]
+        raise Unresolved(node.id)
+    try:
+        return [ast.literal_eval(node)]
+    except (ValueError, TypeError, SyntaxError):
+        raise Unresolved(ast.dump(node)) from None
+
+
+def _items(node, env):
+    # What a loop over this iterates, if it is a literal sequence
+    items = []
+    for value in _values(node, env):
+        if not isinstance(value, (list, tuple)):
+            raise Unresolved('not a sequence')
+        items.extend(value)
+    return items
+
+
+def _single(node, env):
+    values = _values(node, env)
+    if len(values) != 1:
+        raise Unresolved('several values')
+    return values[0]
+
+
+def _assignments(function):
+    # Names the function binds to a literal and never to anything else
+    env, blocked = {}, set()
+    for node in ast.walk(function):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            try:
+                env.setdefault(name, []).append(ast.literal_eval(node.value))
+            except (ValueError, TypeError, SyntaxError):
+                blocked.add(name)
+    return {name: values for name, values in env.items() if name not in blocked}
+
+
+def _spec(cls, text, kwargs):
+    return {'class': cls, 'text': text, 'kwargs': kwargs}
+
+
+def _call_specs(call, env):
+    name = getattr(call.func, 'id', getattr(call.func, 'attr', None))
+    keywords = {k.arg: k.value for k in call.keywords if k.arg}
+    if name in TEXT_CLASSES and call.args and len(call.keywords) == len(keywords):
+        kwargs = {key: _single(value, env) for key, value in keywords.items()}
+        return [_spec(name, text, kwargs) for text in _values(call.args[0], env) if isinstance(text, str)]
+    if name in COMPONENT_TEXTS:
+        labels, size, default = COMPONENT_TEXTS[name]
+        if labels not in keywords:
+            return []
+        font_size = _single(keywords[size], env) if size in keywords else default
+        return [_spec('Text', text, {'font_size': font_size}) for text in _items(keywords[labels], env)]
+    return []
+
+
+def _collect(node, env, specs):
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        env = {**env, **_assignments(node)}
+    elif isinstance(node, ast.For) and isinstance(node.target, ast.Name):
+        try:
+            env = {**env, node.target.id: _items(node.iter, env)}
+        except Unresolved:
+            pass
+    elif isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp)):
+        env = dict(env)
+        for generator in node.generators:
+            if isinstance(generator.target, ast.Name):
+                try:
+                    env[generator.target.id] = _items(generator.iter, env)
+                except Unresolved:
+                    pass
+    if isinstance(node, ast.Call):
+        try:
+            specs.extend(_call_specs(node, env))
+        except Unresolved:
+            # Built from something only the running scene knows
+            pass
+    for child in ast.iter_child_nodes(node):
+        _collect(child, env, specs)
+
+
+def spec_key(spec):
+    return hash_payload(spec)[:16]
+
+
+def collect_texts(files):
+    # {key: spec} of every Text the scene files and their helpers build
+    # with arguments written out in the source
+    sources = sorted({source for file in files for source in collect_inputs(file)[0]})
+    texts = {}
+    for source in sources:
+        specs = []
+        _collect(ast.parse(source.read_text(encoding='utf-8'), filename=str(source)), {}, specs)
+        texts.update((spec_key(spec), spec) for spec in specs)
+    return texts
+
+
+def text_fingerprint(spec):
+    # manim.cfg can change the default font
+    config = CONFIG_FILE.read_bytes() if CONFIG_FILE.exists() else b''
+    return hash_payload({'spec': spec, 'manim': manim_version(), 'config': hash_bytes(config)})
+
+
+# Inside manim
+
+def text_kwargs(spec):
+    import manim
+
+    return {
+        key: getattr(manim, value['const']) if isinstance(value, dict) else value
+        for key, value in spec['kwargs'].items()
+    }
+
+
+def watch_text_cache(on_text):
+    # Calls on_text(svg file, whether it was already there, seconds spent)
+    # for every Text and MarkupText built from now on
+    from manim import MarkupText, Text, config
+
+    for cls in (Text, MarkupText):
+        text2svg = cls._text2svg
+
+        @functools.wraps(text2svg)
+        def cached_text2svg(text, color, text2svg=text2svg):
+            svg = Path(config.get_dir('text_dir')) / f"{text._text2hash(color)}.svg"
+            hit = svg.exists()
+            start = time.perf_counter()
+            path = text2svg(text, color)
+            on_text(path, hit, time.perf_counter() - start)
+            return path
+
+        cls._text2svg = cached_text2svg
+
+
+def build_text(spec):
+    # Leaves the text's SVG in manim's text cache and its parsed mobject in
+    # this process's SVG cache
+    import manim
+
+    return getattr(manim, spec['class'])(spec['text'], **text_kwargs(spec))
+
+
+def build_texts(specs):
+    results = []
+    watch_text_cache(lambda path, hit, seconds: results[-1].update(svg=str(path), hit=hit))
+    for key, spec in specs.items():
+        results.append({'key': key})
+        start = time.perf_counter()
+        try:
+            build_text(spec)
+        except Exception as e:
+            results[-1]['error'] = f"{type(e).__name__}: {e}"
+        results[-1]['seconds'] = round(time.perf_counter() - start, 4)
+    return results
+
+
+# Runner side
+
+def prebuild_texts(files, workers=None, manifest=None):
+    # Builds the texts not in the cache yet, split over parallel processes,
+    # before any scene needs them
+    manifest = manifest or Manifest(TEXTS_MANIFEST)
+    texts = collect_texts(files)
+    missing = {key: spec for key, spec in texts.items() if not manifest.is_fresh(key, text_fingerprint(spec))}
+    if not missing:
+        log(f"✓ Text cache: all {len(texts)} texts the scenes spell out are cached")
+        return texts
+    start = time.monotonic()
+    keys = sorted(missing)
+    workers = max(1, min(workers or default_workers(), len(keys)))
+    chunks = [keys[i::workers] for i in range(workers)]
+    built = failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        processes = []
+        for i, chunk in enumerate(chunks):
+            specs, output = Path(tmp) / f"specs-{i}.json", Path(tmp) / f"built-{i}.json"
+            specs.write_text(json.dumps({key: missing[key] for key in chunk}), encoding='utf-8')
+            processes.append((output, subprocess.Popen(
+                [sys.executable, '-m', 'rendering.texts', 'build', str(specs), '--json', str(output)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                cwd=ROOT,
+            )))
+        for output, process in processes:
+            _, stderr = process.communicate()
+            if not output.exists():
+                lines = stderr.strip().splitlines()
+                log(f"✗ Text prebuild worker failed: {lines[-1] if lines else f'exit {process.returncode}'}")
+                continue
+            for result in json.loads(output.read_text(encoding='utf-8')):
+                spec = missing[result['key']]
+                if result.get('error') or not result.get('svg'):
+                    failed += 1
+                    log(f"✗ Could not prebuild {spec['text']!r}: {result.get('error')}")
+                    continue
+                manifest.record(result['key'], text_fingerprint(spec), [result['svg']])
+                built += 1
+    log(f"Text cache: built {built} of {len(texts)} texts in {time.monotonic() - start:.1f}s "
+        f"with {len(chunks)} processes" + (f", {failed} failed" if failed else ''))
+    return texts
+
+
+class TextCacheReport:
+    # Worker plugin counting, per scene, the texts that came from manim's
+    # text cache and the ones Pango had to lay out during the render
+    def __init__(self, output):
+        self.output = Path(output) if output else None
+        self.scenes = []
+
+    def install(self):
+        from manim import Scene
+
+        plugin = self
+        render = Scene.render
+
+        @functools.wraps(render)
+        def render_scene(scene, *args, **kwargs):
+            plugin.scenes.append({'scene': type(scene).__name__, 'hits': 0, 'misses': 0, 'miss_seconds': 0.0})
+            return render(scene, *args, **kwargs)
+
+        def on_text(path, hit, seconds):
+            if not plugin.scenes:
+                return
+            scene = plugin.scenes[-1]
+            if hit:
+                scene['hits'] += 1
+            else:
+                scene['misses'] += 1
+                scene['miss_seconds'] = round(scene['miss_seconds'] + seconds, 4)
+
+        Scene.render = render_scene
+        watch_text_cache(on_text)
+
+    def finish(self):
+        if self.output:
+            self.output.parent.mkdir(parents=True, exist_ok=True)
+            self.output.write_text(json.dumps({'scenes': self.scenes}, indent=2), encoding='utf-8')
+
+
+def print_text_table(paths):
+    rows = []
+    for path in paths:
+        try:
+            rows += json.loads(Path(path).read_text(encoding='utf-8'))['scenes']
+        except (FileNotFoundError, ValueError):
+            continue
+    if not rows:
+        return
+    width = max(len(scene['scene']) for scene in rows)
+    print(f"\n{'scene':<{width}} {'cached':>7} {'built':>6} {'building':>9}")
+    for scene in rows:
+        print(f"{scene['scene']:<{width}} {scene['hits']:>7} {scene['misses']:>6} {scene['miss_seconds']:>8.2f}s")
+    hits = sum(scene['hits'] for scene in rows)
+    total = hits + sum(scene['misses'] for scene in rows)
+    if total:
+        print(f"{hits} of {total} texts ({hits / total:.0%}) came from the text cache")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Lay out the scenes' texts into manim's text cache ahead of rendering.")
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help="build the texts of a JSON file (used by the runner)")
+    build.add_argument('specs', type=Path)
+    build.add_argument('--json', type=Path, required=True, help="where to write what was built")
+    prebuild = commands.add_parser('prebuild', help="build every text the scenes spell out")
+    prebuild.add_argument('-j', '--jobs', type=int, default=default_workers())
+    commands.add_parser('list', help="list the texts found in the scenes")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from .discovery import discover
+
+    args = parse_args()
+    if args.command == 'build':
+        results = build_texts(json.loads(args.specs.read_text(encoding='utf-8')))
+        args.json.write_text(json.dumps(results), encoding='utf-8')
+        sys.exit(0)
+    files = sorted({info.file for info in discover()})
+    if args.command == 'prebuild':
+        prebuild_texts(files, args.jobs)
+    else:
+        manifest = Manifest(TEXTS_MANIFEST)
+        for key, spec in collect_texts(files).items():
+            mark = '✓' if manifest.is_fresh(key, text_fingerprint(spec)) else ' '
+            print(f"{mark} {spec['class']}({spec['text']!r}, {spec['kwargs']})")
+    sys.exit(0)
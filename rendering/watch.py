@@ -0,0 +1,266 @@
+import argparse
+import ast
+import os
+import shutil
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+from . import daemon
+from .discovery import discover, scene_classes
+from .fingerprint import collect_inputs, hash_bytes
+from .jobs import RenderJob
+from .paths import ANIMATIONS_DIR, CONFIG_FILE, MEDIA_DIR
+from .pool import log, report, run_job
+from .sections import plan_sections
+
+# Finished previews, one per scene, replaced in one step when a render is done
+PREVIEW_DIR = MEDIA_DIR / 'preview'
+POLL_SECONDS = 0.25
+# Saves closer together than this are handled as one change
+DEBOUNCE_SECONDS = 0.4
+
+
+def class_digests(file):
+    # {scene: hash of the code that defines it}: the scene class, the
+    # scenes of the file it derives from, and everything in the module
+    # that is not a scene. Editing one scene leaves the others' unchanged.
+    source = file.read_text(encoding='utf-8')
+    tree = ast.parse(source, filename=str(file))
+    scenes = scene_classes(tree)
+    shared = [
+        ast.get_source_segment(source, node) for node in tree.body
+        if not (isinstance(node, ast.ClassDef) and node.name in scenes)
+    ]
+
+    def chain(name, seen=()):
+        node = scenes[name]
+        parts = [ast.get_source_segment(source, node)]
+        for base in node.bases:
+            base = getattr(base, 'id', None)
+            if base in scenes and base not in seen:
+                parts += chain(base, (*seen, name))
+        return parts
+
+    return {name: hash_bytes('\0'.join(shared + chain(name)).encode()) for name in scenes}
+
+
+def publish(output, job):
+    # Players keep the old preview open until the new one is complete
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    preview = PREVIEW_DIR / f"{job.slug}.mp4"
+    tmp = PREVIEW_DIR / f".{job.slug}.{os.getpid()}.tmp.mp4"
+    shutil.copyfile(output, tmp)
+    os.replace(tmp, preview)
+    return preview
+
+
+def discard_partials(job, since):
+    # A killed render can leave a half written partial movie file under the
+    # name manim would look up next time; everything it wrote goes
+    partials = job.output_dir / 'partial_movie_files' / job.scene
+    for path in partials.glob('*') if partials.is_dir() else ():
+        try:
+            if path.stat().st_mtime >= since:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class Preview:
+    # One scene's render, in a thread; cancel() kills it in the daemon
+    def __init__(self, job):
+        self.job = job
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        job = self.job
+        start = time.time()
+        try:
+            plan = plan_sections(job)
+            if plan and plan.stale:
+                log(f"{job.name}: rendering sections {', '.join(s.name for s in plan.stale)}")
+                plan.apply(job)
+            if plan and not plan.stale:
+                outputs = [plan.assemble(job)]
+            else:
+                result = run_job(job, lambda job: daemon.execute(job, self.cancelled))
+                report(result)
+                if not result.ok or not result.outputs:
+                    return
+                outputs = result.outputs
+        except daemon.RenderCancelled:
+            discard_partials(job, start)
+            return
+        except Exception as e:
+            log(f"✗ Preview of {job.name} failed: {type(e).__name__}: {e}")
+            return
+        log(f"▶ {job.name}: {publish(outputs[-1], job)} ({time.time() - start:.1f}s)")
+
+    def cancel(self):
+        self.cancelled.set()
+        self.thread.join()
+
+    @property
+    def running(self):
+        return self.thread.is_alive()
+
+
+class Watcher:
+    def __init__(self, quality='l', include=(), exclude=(), local_daemon=None):
+        self.quality = quality
+        self.local_daemon = local_daemon
+        self.include = include
+        self.exclude = exclude
+        self.scenes = {}
+        self.digests = {}
+        self.inputs = {}
+        self.previews = {}
+
+    def scan(self):
+        # Scenes, what each is made of, and the files worth watching
+        scenes, digests, inputs = {}, {}, {}
+        for file in sorted(ANIMATIONS_DIR.glob('*.py')):
+            try:
+                found = discover([file], self.include, self.exclude)
+                per_class = class_digests(file)
+                sources, assets = collect_inputs(file)
+            except SyntaxError as e:
+                # Mid-edit; its scenes keep their last known state
+                log(f"✗ {file.name}: {e}")
+                for key, info in self.scenes.items():
+                    if info.file == file:
+                        scenes[key], digests[key], inputs[key] = info, self.digests[key], self.inputs[key]
+                continue
+            for info in found:
+                scenes[info.key] = info
+                digests[info.key] = per_class[info.name]
+                inputs[info.key] = {p.resolve() for p in sources + assets}
+        return scenes, digests, inputs
+
+    def watched(self):
+        files = set(ANIMATIONS_DIR.rglob('*.py')) | {CONFIG_FILE}
+        for paths in self.inputs.values():
+            files |= paths
+        return files
+
+    @staticmethod
+    def snapshot(files):
+        state = {}
+        for path in files:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            state[path.resolve()] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def affected(self, changed):
+        # Scenes whose class, module code, helpers or assets changed; the
+        # scene file itself only counts through the class digests
+        previous = self.digests
+        self.scenes, self.digests, self.inputs = self.scan()
+        everything = CONFIG_FILE.resolve() in changed
+        keys = []
+        for key, digest in self.digests.items():
+            own = self.scenes[key].file.resolve()
+            if (
+                everything
+                or previous.get(key) != digest
+                or any(path in changed for path in self.inputs[key] - {own})
+            ):
+                keys.append(key)
+        return keys
+
+    def render(self, keys):
+        # A daemon that loaded manim.cfg or the rendering code before this
+        # change would render with the old ones; it is restarted, and the
+        # renders still running in it start over in the new one
+        restart = self.local_daemon is not None and not self.local_daemon.current()
+        if restart:
+            keys = sorted(set(keys) | {key for key, preview in self.previews.items() if preview.running})
+        for key in keys:
+            running = self.previews.get(key)
+            if running and running.running:
+                log(f"Cancelling the stale render of {key}")
+                running.cancel()
+        if restart:
+            log("Restarting the render daemon")
+            try:
+                self.local_daemon.restart()
+            except daemon.DaemonError as e:
+                log(f"✗ {e}")
+        for key in keys:
+            if key not in self.scenes:
+                continue
+            info = self.scenes[key]
+            job = RenderJob(info.file, quality=self.quality, scene=info.name)
+            self.previews[key] = Preview(job)
+
+    def run(self):
+        self.scenes, self.digests, self.inputs = self.scan()
+        state = self.snapshot(self.watched())
+        log(f"Watching {len(state)} files for {len(self.scenes)} scenes; previews go to {PREVIEW_DIR}")
+        pending, last_change = set(), 0.0
+        while True:
+            time.sleep(POLL_SECONDS)
+            current = self.snapshot(self.watched())
+            changed = {p for p in state.keys() | current.keys() if state.get(p) != current.get(p)}
+            state = current
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+            if not pending or time.monotonic() - last_change < DEBOUNCE_SECONDS:
+                continue
+            names = ', '.join(sorted(Path(p).name for p in pending))
+            keys = self.affected(pending)
+            pending = set()
+            if keys:
+                log(f"\n{names} changed: {', '.join(keys)}")
+                self.render(keys)
+            else:
+                log(f"\n{names} changed: no scene affected")
+            # New imports or assets are watched from now on. Files already
+            # watched keep the state they were last compared at, so a save
+            # that landed while affected() and render() ran is still seen.
+            watched = {path.resolve() for path in self.watched()}
+            state = {
+                **self.snapshot(watched),
+                **{path: value for path, value in state.items() if path in watched},
+            }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Re-render the scenes a saved change affects, at preview quality, in the render daemon."
+    )
+    parser.add_argument('-q', '--quality', default='l', choices=['l', 'm', 'h', 'p', 'k'])
+    parser.add_argument('-j', '--jobs', type=int, help="renders at the same time, if the daemon is started here")
+    parser.add_argument('--scene', action='append', default=[], metavar='PATTERN',
+                        help="only watch scenes matching module:Class, Class or module (glob patterns)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN')
+    return parser.parse_args(argv)
+
+
+def watch(quality='l', include=(), exclude=(), workers=None):
+    # Runs until interrupted; a daemon started here is stopped on the way out
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        local_daemon = daemon.LocalDaemon(workers)
+        with local_daemon:
+            Watcher(quality, include, exclude, local_daemon).run()
+    except daemon.DaemonError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.exit(watch(args.quality, args.scene, args.exclude, args.jobs))
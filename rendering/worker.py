@@ -0,0 +1,110 @@
+import functools
+import importlib
+import sys
+
+# Plugins patch manim's classes before a render starts, to observe or change
+# what it does without the scenes knowing. Each is constructed with the text
+# after "=" in --plugin name=arg and gets install() before and finish() after
+# the render.
+PLUGINS = {
+    'profile': 'rendering.profiler:Profiler',
+    'vfr': 'rendering.encoding:VariableFrameRate',
+    'vfr-cfr': 'rendering.encoding:ConstantFrameRate',
+    'layers': 'rendering.layers:LayeredRendering',
+    'texts': 'rendering.texts:TextCacheReport',
+    'journal': 'rendering.journal:AnimationJournal',
+    'pipeline': 'rendering.pipeline:PipelinedEncoding',
+    'growth': 'rendering.growth:GrowthTracker',
+    'growth-prune': 'rendering.growth:PruningGrowthTracker',
+}
+
+# Plugins that change the video itself; they are part of a job's fingerprint
+OUTPUT_PLUGINS = {'vfr', 'vfr-cfr', 'pipeline', 'growth-prune'}
+# Plugins that only make rendering faster and write no files; farm nodes
+# run them as they are
+SPEED_PLUGINS = {'layers'}
+# Settings of an output plugin that do not change the video
+LOCAL_SETTINGS = {'report', 'depth'}
+
+
+def output_spec(spec):
+    # The part of an output plugin's spec that decides the video: its name
+    # and its encoder settings, but not where it writes its reports
+    name, _, arg = spec.partition('=')
+    if name != 'pipeline':
+        return name
+    settings = sorted(
+        item for item in filter(None, arg.split(','))
+        if item.partition('=')[0] not in LOCAL_SETTINGS
+    )
+    return f"{name}={','.join(settings)}" if settings else name
+
+
+def tag_partial_movies(tag):
+    # manim names a partial movie after its animation alone and, with
+    # flush_cache off, reuses it in every later render. A plugin encoding
+    # partial movies its own way calls this from install(), so its files
+    # are <hash>.<tag>.mp4: neither it nor a plain render picks up the
+    # other's, which could not be stream copied into one movie.
+    from manim.scene.scene_file_writer import SceneFileWriter
+
+    add, cached = SceneFileWriter.add_partial_movie_file, SceneFileWriter.is_already_cached
+
+    def tagged(hash_animation):
+        return None if hash_animation is None else f"{hash_animation}.{tag}"
+
+    @functools.wraps(add)
+    def add_partial_movie_file(writer, hash_animation):
+        return add(writer, tagged(hash_animation))
+
+    @functools.wraps(cached)
+    def is_already_cached(writer, hash_invocation):
+        return cached(writer, tagged(hash_invocation))
+
+    SceneFileWriter.add_partial_movie_file = add_partial_movie_file
+    SceneFileWriter.is_already_cached = is_already_cached
+
+
+def load_plugin(spec):
+    name, _, arg = spec.partition('=')
+    if name not in PLUGINS:
+        raise SystemExit(f"Unknown plugin {name!r}; available: {', '.join(sorted(PLUGINS))}")
+    module, _, attr = PLUGINS[name].partition(':')
+    return getattr(importlib.import_module(module), attr)(arg or None)
+
+
+def plugin_command(plugins, manim_args):
+    # Command line equivalent to `manim *manim_args` with plugins installed
+    command = [sys.executable, '-m', 'rendering.worker']
+    for spec in plugins:
+        command += ['--plugin', spec]
+    return [*command, '--', *manim_args]
+
+
+def run_manim(manim_args, specs=()):
+    plugins = [load_plugin(spec) for spec in specs]
+    for plugin in plugins:
+        plugin.install()
+
+    # manim's own command line, so every flag means what it means to `manim`
+    from manim.__main__ import main as manim_main
+
+    try:
+        manim_main(args=manim_args, prog_name='manim', standalone_mode=False)
+    finally:
+        for plugin in plugins:
+            plugin.finish()
+
+
+def main(argv):
+    # rendering.worker [--plugin name=arg ...] -- <manim arguments>
+    if '--' not in argv:
+        raise SystemExit("usage: python -m rendering.worker [--plugin NAME[=ARG] ...] -- FILE [manim options]")
+    split = argv.index('--')
+    options, manim_args = argv[:split], argv[split + 1:]
+    specs = [value for flag, value in zip(options, options[1:]) if flag == '--plugin']
+    run_manim(manim_args, specs)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])